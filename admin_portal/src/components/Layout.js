@@ -4,6 +4,7 @@ import { Link, useNavigate, useLocation } from 'react-router-dom';
 import { useTranslation } from 'react-i18next'; 
 import './Layout.css'; 
 import LanguageSwitcher from './LanguageSwitcher'; 
+import { API_BASE_URL } from '../config';
 
 const Layout = ({ children }) => {
   const navigate = useNavigate();
@@ -22,6 +23,9 @@ const Layout = ({ children }) => {
   }, [navigate]);
 
   const handleLogout = () => {
+    // 🚩 V242: 通知后端作废 Token (失败也照样退出)
+    const token = localStorage.getItem('staffToken');
+    fetch(`${API_BASE_URL}/api/logout/`, { method: 'POST', headers: { 'Authorization': `Token ${token}` } }).catch(() => {});
     localStorage.clear(); // 清除所有 Token 和 Role
     navigate('/login'); 
   };
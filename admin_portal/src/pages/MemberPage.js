@@ -35,11 +35,17 @@ const MemberPage = () => {
         try {
             // 1. 获取会员详情
             const memberRes = await axios.post(`${API_BASE_URL}/admin/search/`, 
-                { memberId: memberId },
+                { memberId: memberId, vouchers: 'grouped' },
                 { headers: { 'Authorization': `Token ${staffToken}` } }
             );
             setMember(memberRes.data.profile);
-            setVouchers(memberRes.data.vouchers);
+            // 🚩 V248: 同一种券只显示一行 (核销时用最早过期的那张)
+            setVouchers(memberRes.data.voucher_groups.map((g) => ({
+                voucherId: g.nextVoucherId,
+                voucherType: g.voucherType,
+                expiryDate: g.earliestExpiry,
+                count: g.count,
+            })));
         } catch (err) {
             setError('Member not found or error fetching data.');
         }
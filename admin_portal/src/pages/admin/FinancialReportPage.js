@@ -134,7 +134,12 @@ const FinancialReportPage = () => {
                         </div>
                     </div>
 
-                    {/* 3. 详细列表 (按类别) */}
+                    {/* 3. 详细列表 (按类别)，后端最多返回最新的 2000 条 */}
+                    {reportData.rows_truncated && (
+                        <p style={{color:'#f39c12', textAlign:'center'}}>
+                            {t('Showing the latest transactions only. Use the export for the full list.')}
+                        </p>
+                    )}
                     <SectionTitle title={`💰 ${t('Recharges')} (${reportData.recharges.length})`} color="#2ecc71" />
                     <TransactionTable data={reportData.recharges} />
 
@@ -86,7 +86,10 @@ const RedeemTab = ({ member, vouchers, onSuccess }) => {
                             }}
                         >
                             <div style={{display:'flex', justifyContent:'space-between', alignItems:'center'}}>
-                                <div style={{color: '#fff', fontWeight: 'bold', fontSize:'16px'}}>{v.voucherType.name}</div>
+                                <div style={{color: '#fff', fontWeight: 'bold', fontSize:'16px'}}>
+                                    {v.voucherType.name}
+                                    {v.count > 1 && <span style={{marginLeft:'8px', fontSize:'12px', color:'#D4AF37'}}>×{v.count}</span>}
+                                </div>
                                 <div style={{color: '#D4AF37', fontWeight:'bold'}}>
                                     {parseFloat(v.voucherType.value) > 0 ? `$${v.voucherType.value}` : 'FREE'}
                                 </div>
@@ -6,8 +6,9 @@ from django.contrib.auth.forms import UserCreationForm, UserChangeForm
 from .models import (
     Member, Level, Voucher, VoucherType, Transaction, 
     RechargeTier, Reward_Points_Store, Reward_Balance_Store, 
-    Announcement, FinancialLedger
+    Announcement, FinancialLedger, DailyFinancialRollup, OutboundEmail, ImageAsset
 )
+from . import images, outbox
 
 # 1. 自定义表单
 class MemberCreationForm(UserCreationForm):
@@ -68,8 +69,11 @@ class RechargeTierAdmin(admin.ModelAdmin):
 
 @admin.register(Transaction)
 class TransactionAdmin(admin.ModelAdmin):
+    # 🚩 V233: 和公司账本一样只追加 (每日汇总按新增/删除增量更新)，修正请记一笔 SYSTEM_ADJUST
     list_display = ['timestamp', 'member', 'type', 'amount']
     list_filter = ['type']
+    def has_change_permission(self, request, obj=None): return False
+    def has_delete_permission(self, request, obj=None): return False
 
 @admin.register(Reward_Points_Store)
 class PointsStoreAdmin(admin.ModelAdmin):
@@ -88,4 +92,31 @@ class FinancialLedgerAdmin(admin.ModelAdmin):
     list_display = ('timestamp', 'type', 'amount', 'description')
     def has_add_permission(self, request): return False
     def has_change_permission(self, request, obj=None): return False
-    def has_delete_permission(self, request, obj=None): return False
\ No newline at end of file
+    def has_delete_permission(self, request, obj=None): return False
+
+@admin.register(DailyFinancialRollup)
+class DailyFinancialRollupAdmin(admin.ModelAdmin):
+    list_display = ('day', 'source', 'type', 'staff', 'totalAmount', 'txnCount', 'pointsTotal')
+    list_filter = ('source', 'type')
+    def has_add_permission(self, request): return False
+    def has_change_permission(self, request, obj=None): return False
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('createdAt', 'subject', 'recipients', 'status', 'attempts', 'nextAttemptAt', 'sentAt')
+    list_filter = ('status',)
+    readonly_fields = ('subject', 'body', 'fromEmail', 'recipients', 'status', 'attempts', 'nextAttemptAt', 'lastError', 'createdAt', 'sentAt')
+    def has_add_permission(self, request): return False
+
+@admin.register(ImageAsset)
+class ImageAssetAdmin(admin.ModelAdmin):
+    list_display = ('sourcePath', 'kind', 'status', 'attempts', 'processedAt')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('sourcePath', 'kind', 'status', 'variants', 'attempts', 'nextAttemptAt', 'lastError', 'createdAt', 'processedAt')
+    actions = ['reprocess']
+    def has_add_permission(self, request): return False
+
+    @admin.action(description='Regenerate image variants')
+    def reprocess(self, request, queryset):
+        count = images.requeue(queryset)
+        self.message_user(request, f'{count} image(s) queued. Run `manage.py process_images` to process them.')
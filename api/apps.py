@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        # V233: 注册 signals (每日财务汇总等)
+        from . import signals  # noqa: F401
+
+        # nightly_settlement 最后执行的清理任务
+        from . import idempotency, outbox, settlement
+        settlement.register_cleanup('idempotency_keys', idempotency.purge_expired)
+        settlement.register_cleanup('outbox', outbox.purge_old)
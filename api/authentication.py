@@ -0,0 +1,135 @@
+# 这是 api/authentication.py 文件的内容
+
+"""
+V242 蓝图: 带缓存的 Token 认证 + Token 过期
+- 每个 worker 进程里有一个有上限的 LRU (token -> 会员)，命中时不再查 Token JOIN Member。
+- 每条缓存带一个"认证版本号" (放在共享的 Django 缓存里，见 caching.py)。
+  退出登录、重置密码、修改角色/资料 (Member 保存) 时 bump 这个版本号，
+  所有 worker 的旧缓存失效。为了不让每个请求都读一次共享缓存，命中后最多每 AUTH_STAMP_TTL 秒
+  才重新核对一次版本号 (其他 worker 最多晚这么多秒看到变化；本 worker 里退出登录马上生效)。
+- Token 超过 AUTH_TOKEN_TTL 没用过就过期；使用中的 Token 每隔 AUTH_TOKEN_REFRESH_AFTER
+  自动续期 (滑动过期)。
+注意: request.user 是缓存里的副本，积分/余额可能落后 AUTH_CACHE_TTL 秒，
+改钱包必须用 wallet.py (锁行或带条件的 UPDATE)，显示资料时从数据库重新读取。
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from . import caching
+
+AUTH_CACHE_SIZE = getattr(settings, 'AUTH_CACHE_SIZE', 10000)
+AUTH_CACHE_TTL = getattr(settings, 'AUTH_CACHE_TTL', 60)  # 秒
+AUTH_STAMP_TTL = getattr(settings, 'AUTH_STAMP_TTL', 5)  # 秒，多久核对一次认证版本号
+AUTH_TOKEN_TTL = getattr(settings, 'AUTH_TOKEN_TTL', timedelta(days=30))
+AUTH_TOKEN_REFRESH_AFTER = getattr(settings, 'AUTH_TOKEN_REFRESH_AFTER', timedelta(days=1))
+
+_lock = threading.Lock()
+_entries = OrderedDict()  # token key -> {'user', 'created', 'stamp', 'cached_at', 'checked_at'}
+
+
+def _stamp_namespace(member_id):
+    return f'auth:{member_id}'
+
+
+def _is_expired(created, now):
+    return created + AUTH_TOKEN_TTL <= now
+
+
+def _get(key):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry['cached_at'] > AUTH_CACHE_TTL:
+            del _entries[key]
+            return None
+        _entries.move_to_end(key)
+        return entry
+
+
+def _put(key, entry):
+    with _lock:
+        _entries[key] = entry
+        _entries.move_to_end(key)
+        while len(_entries) > AUTH_CACHE_SIZE:
+            _entries.popitem(last=False)
+
+
+def _evict(key):
+    with _lock:
+        _entries.pop(key, None)
+
+
+def invalidate_member(member_id):
+    """ 会员资料/角色/密码变化后调用: 所有 worker 里这个会员的缓存都失效 """
+    caching.bump_version(_stamp_namespace(member_id))
+
+
+def revoke_tokens(member):
+    """ 退出登录 / 重置密码: 删除 Token，并让缓存失效 """
+    for key in Token.objects.filter(user=member).values_list('key', flat=True):
+        _evict(key)
+    Token.objects.filter(user=member).delete()
+    invalidate_member(member.pk)
+
+
+def issue_token(user):
+    """ 登录时取 Token；旧 Token 已过期就换一个新的 """
+    token, created = Token.objects.get_or_create(user=user)
+    if not created and _is_expired(token.created, timezone.now()):
+        _evict(token.key)
+        token.delete()
+        token = Token.objects.create(user=user)
+    return token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    和 DRF 的 TokenAuthentication 一样 (Authorization: Token <key>)，
+    但会员数据来自进程内缓存，并且 Token 会过期。
+    """
+
+    def authenticate_credentials(self, key):
+        now = timezone.now()
+        entry = _get(key)
+        if entry is not None and time.monotonic() - entry['checked_at'] > AUTH_STAMP_TTL:
+            if entry['stamp'] != caching.get_version(_stamp_namespace(entry['user'].pk)):
+                _evict(key)
+                entry = None
+            else:
+                entry['checked_at'] = time.monotonic()
+
+        if entry is None:
+            try:
+                token = self.get_model().objects.select_related('user').get(key=key)
+            except self.get_model().DoesNotExist:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            stamp = caching.get_version(_stamp_namespace(token.user_id))
+            if not token.user.is_active:
+                raise exceptions.AuthenticationFailed('User inactive or deleted.')
+            cached_at = time.monotonic()
+            entry = {'user': token.user, 'created': token.created, 'stamp': stamp, 'cached_at': cached_at, 'checked_at': cached_at}
+            _put(key, entry)
+
+        if _is_expired(entry['created'], now):
+            _evict(key)
+            Token.objects.filter(key=key).delete()
+            raise exceptions.AuthenticationFailed('Token has expired.')
+
+        # 滑动过期: 正在使用的 Token 每天最多续期一次 (一条 UPDATE)
+        if now - entry['created'] > AUTH_TOKEN_REFRESH_AFTER:
+            Token.objects.filter(key=key).update(created=now)
+            entry['created'] = now
+
+        # 每个请求拿一个副本，视图里改 request.user 不会影响缓存
+        user = copy.copy(entry['user'])
+        return (user, key)
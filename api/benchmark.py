@@ -0,0 +1,156 @@
+# 这是 api/benchmark.py 文件的内容
+
+"""
+V252 蓝图: 热点接口基准测试 (`python manage.py benchmark_api`)
+- 在单独的测试数据库里 (SQLite 或本地 PostgreSQL 的 test_<NAME>) 用 api/synthetic.py 生成数据，
+  然后通过 Django 测试客户端 (完整的中间件 + Token 认证) 反复调用每个接口。
+- 每个接口记录: p50 / p95 / 平均 / 最大耗时 (毫秒) 和每次调用的 SQL 条数。
+- 输出 JSON (键固定、排好序)，可以和上一次的结果比较 (--compare)，回归在部署前就能发现。
+"""
+import math
+import platform
+import statistics
+import time
+from decimal import Decimal
+
+import django
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from .metrics import QueryTimer
+from .models import Member, Reward_Points_Store, Transaction
+
+SCHEMA_VERSION = 1
+
+
+def percentile(values, pct):
+    """ 最近秩法 (nearest-rank)，样本少时也稳定 """
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def _client(user):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def build_scenarios():
+    """
+    [(名称, 调用函数)]。调用函数返回 response。
+    写操作 (消费 / 兑换) 轮流使用不同的会员，余额和积分提前加足，每次都会成功。
+    """
+    member = (
+        Member.objects.filter(role='MEMBER')
+        .annotate(n=Count('member_transactions'))
+        .order_by('-n', 'memberId').first()
+    )
+    staff = Member.objects.filter(role__in=['CASHIER', 'STORE_MANAGER']).order_by('memberId').first()
+    writers = list(Member.objects.filter(role='MEMBER').order_by('memberId')[:50])
+    Member.objects.filter(pk__in=[m.pk for m in writers]).update(
+        balance=Decimal('1000000'), loyaltyPoints=10 ** 9,
+    )
+    item = Reward_Points_Store.objects.filter(isActive=True, linkedVoucherType__stockCount__isnull=True).order_by('pointsCost').first()
+
+    member_client = _client(member)
+    staff_client = _client(staff)
+    writer_clients = [_client(m) for m in writers]
+    today = timezone.localdate()
+    month_ago = today - timezone.timedelta(days=30)
+    counter = {'consume': 0, 'redeem': 0}
+
+    def consume():
+        target = writers[counter['consume'] % len(writers)]
+        counter['consume'] += 1
+        return staff_client.post(f'/api/admin/consume/{target.pk}/', {'amount': '12.50'}, format='json')
+
+    def redeem():
+        client = writer_clients[counter['redeem'] % len(writer_clients)]
+        counter['redeem'] += 1
+        return client.post('/api/store/redeem/', {'reward_id': item.pk}, format='json')
+
+    return [
+        ('profile', lambda: member_client.get('/api/profile/')),
+        ('profile_transactions', lambda: member_client.get('/api/profile/transactions/')),
+        ('admin_search', lambda: staff_client.post('/api/admin/search/', {'phone': member.phone}, format='json')),
+        ('admin_consume', consume),
+        ('store_redeem', redeem),
+        ('admin_reports_30d', lambda: staff_client.get(f'/api/admin/reports/?from={month_ago}&to={today}&rows=0')),
+        ('admin_reports_day', lambda: staff_client.get(f'/api/admin/reports/?date={today}')),
+    ]
+
+
+def measure(call, iterations, warmup):
+    for _ in range(warmup):
+        call()
+
+    timings, queries, statuses = [], [], {}
+    for _ in range(iterations):
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = call()
+        timings.append((time.perf_counter() - start) * 1000)
+        queries.append(timer.count)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    return {
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': int(statistics.median(queries)),
+        'queries_max': max(queries),
+        'status': dict(sorted(statuses.items())),
+    }
+
+
+def run(iterations=30, warmup=3, only=None, scale=None):
+    rows = {'transactions': Transaction.objects.count(), 'members': Member.objects.count()}
+    results = {}
+    for name, call in build_scenarios():
+        if only and name not in only:
+            continue
+        results[name] = measure(call, iterations, warmup)
+
+    return {
+        'schema': SCHEMA_VERSION,
+        'meta': {
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'iterations': iterations,
+            'warmup': warmup,
+            'scale': scale or {},
+            'rows': rows,  # 测试开始前的数据量
+        },
+        'results': dict(sorted(results.items())),
+    }
+
+
+def compare(current, baseline, threshold=25.0):
+    """
+    和基准结果比较，返回 (行, 是否有回归)。
+    回归 = p95 变慢超过 threshold%，或者 SQL 条数变多 (SQL 条数是确定的，变多一定是代码改了)。
+    """
+    lines, regressed = [], False
+    for name, now in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if not before:
+            lines.append((name, now, None, 'new'))
+            continue
+        change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] * 100 if before['p95_ms'] else 0.0
+        flags = []
+        if change > threshold:
+            flags.append(f'p95 +{change:.0f}%')
+        if now['queries'] > before['queries']:
+            flags.append(f"queries {before['queries']} -> {now['queries']}")
+        regressed = regressed or bool(flags)
+        lines.append((name, now, change, ', '.join(flags) or 'ok'))
+    return lines, regressed
@@ -0,0 +1,103 @@
+# 这是 api/caching.py 文件的内容
+
+"""
+V239 蓝图: 版本号缓存 + ETag
+- 每个命名空间 (例如 'catalogue') 有一个版本号，数据变化时由 signals 调用 bump_version()，
+  旧版本的缓存自然失效。
+- 缓存里存的是已经渲染好的 JSON 字节 + 强 ETag，客户端带 If-None-Match 时直接回 304。
+"""
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+
+KEY_PREFIX = 'lluvia'
+
+
+def _version_key(namespace):
+    return f'{KEY_PREFIX}:{namespace}:version'
+
+
+def get_version(namespace):
+    """
+    当前版本号。缓存里没有时用当前毫秒时间初始化，
+    这样即使版本号被清掉，也不会退回到旧版本去读到过期数据。
+    """
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """
+    数据变化后调用，让这个命名空间下的所有缓存失效
+    (Redis 的 incr 是原子的；默认的文件缓存不是，并发时可能少加一次)
+    """
+    key = _version_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=None)
+
+
+def make_etag(body):
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+def make_entry(data, built_at=None):
+    """ 渲染 JSON 并计算 ETag """
+    body = JSONRenderer().render(data)
+    return {'body': body, 'etag': make_etag(body), 'built_at': built_at or time.time()}
+
+
+def _cache_key(namespace, key):
+    return f'{KEY_PREFIX}:{namespace}:{get_version(namespace)}:{key}'
+
+
+def cached_data(namespace, key, build, timeout):
+    """ 和 cached_payload 一样按版本号缓存，但存的是 build() 返回的原始数据 (不渲染 JSON) """
+    cache_key = _cache_key(namespace, key)
+    data = cache.get(cache_key)
+    if data is None:
+        data = build()
+        cache.set(cache_key, data, timeout)
+    return data
+
+
+def cached_payload(namespace, key, build, timeout):
+    """
+    取缓存的 JSON (不存在就调用 build() 生成数据并渲染)。
+    返回 {'body': bytes, 'etag': str, 'built_at': float}
+    timeout 可以是数字，也可以是 callable(data) -> 秒数
+    """
+    cache_key = _cache_key(namespace, key)
+    entry = cache.get(cache_key)
+    if entry is None:
+        data = build()
+        entry = make_entry(data)
+        cache.set(cache_key, entry, timeout(data) if callable(timeout) else timeout)
+    return entry
+
+
+def etag_response(request, entry, last_modified=None):
+    """ 返回缓存的 JSON；If-None-Match 命中时返回 304 (无内容) """
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH', '')
+    tags = [tag.strip() for tag in if_none_match.split(',') if tag.strip()]
+
+    if entry['etag'] in tags or '*' in tags:
+        response = HttpResponse(status=304)
+    else:
+        response = HttpResponse(entry['body'], content_type='application/json')
+
+    response['ETag'] = entry['etag']
+    # 每次都要向服务器确认 (便宜的 304)，保证后台改完马上生效
+    response['Cache-Control'] = 'private, no-cache'
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,235 @@
+# 这是 api/cashier.py 文件的内容
+
+"""
+V254 蓝图: 收银操作 (充值 / 余额消费 / 现金消费 / 核销代金券)
+- 单个操作的四个视图和批量接口 (POST /api/admin/cashier/batch/) 都走 run()，业务规则只有一份。
+- 一批操作在同一个数据库事务里执行:
+  1. 先按主键顺序锁住涉及的代金券，再按主键顺序锁住涉及的会员 (SELECT ... FOR UPDATE)，
+     所有收银机都按同样的顺序加锁，不会互相死锁；
+  2. 按顺序在内存里逐个执行，每个操作单独成功或失败 (先检查、后修改，失败的操作不留下任何改动)；
+  3. 最后统一写入: 每个会员一次 UPDATE，核销的券一次 UPDATE，交易记录和新发的券各一次 bulk_create。
+- 返回和操作一一对应的 [(HTTP 状态码, 响应内容)]。
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import rollups
+from .levels import get_ladder, get_level
+from .models import Member, RechargeTier, Transaction, Voucher
+from .wallet import get_points_for_spend, save_wallet, update_member_level
+
+OPS = ('recharge', 'consume', 'track', 'redeem_voucher')
+MAX_OPERATIONS = 200
+
+# 充值福利: 金额 >= X 直接升到对应等级 (只升不降)
+RECHARGE_LEVELS = ((1000, 'Platinum'), (500, 'Gold'), (300, 'Silver'))
+
+
+class OpError(Exception):
+    """ 单个操作失败 (只影响这一个操作) """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class _Batch:
+    """ 一批操作的内存状态，最后由 flush() 一次写入 """
+
+    def __init__(self, staff, members, vouchers, tiers):
+        self.staff = staff
+        self.now = timezone.now()
+        self.members = members
+        self.vouchers = vouchers
+        self.tiers = tiers
+        self.dirty = {}  # memberId -> 需要写入的字段
+        self.claimed = []
+        self.expired = []
+        self.transactions = []
+        self.granted = []
+
+    def member(self, member_id, message):
+        member = self.members.get(member_id)
+        if member is None:
+            raise OpError(message, 404)
+        return member
+
+    def touch(self, member, *fields):
+        # 和 Member.save() 一样先结算等级，后面的操作 (积分倍率) 看到的是最新等级
+        member.update_member_level()
+        self.dirty.setdefault(member.pk, set()).update(fields)
+
+    def record(self, member, type, amount, points=0, voucher=None):
+        self.transactions.append(Transaction(
+            member=member, staff=self.staff, type=type, amount=amount,
+            pointsEarned=points, relatedVoucher=voucher,
+        ))
+
+    def earn(self, member, spend):
+        """ 消费 spend (float) 加积分和经验值，返回获得的积分 """
+        points = get_points_for_spend(member, spend)
+        member.loyaltyPoints += points
+        member.lifetimePoints += int(spend)
+        update_member_level(member)
+        return points
+
+    # --- 四种操作 (先检查，全部通过后再修改) ---
+
+    def recharge(self, op):
+        tier = self.tiers.get(op['tier_id'])
+        if tier is None:
+            raise OpError('Data not found.', 404)
+        member = self.member(op.get('memberId'), 'Data not found.')
+
+        member.balance += tier.amount
+        member.balanceExpiryDate = self.now + timezone.timedelta(days=365)
+
+        promo_message = ''
+        target_name = next((name for amount, name in RECHARGE_LEVELS if tier.amount >= amount), None)
+        target_level = get_ladder().by_name(target_name) if target_name else None
+        if target_level:
+            current_level = get_level(member.level_id)
+            current_min_points = current_level.minPoints if current_level else 0
+            if target_level.minPoints > current_min_points:
+                member.level = target_level
+                # 🚩 升级福利：有效期设为 1 年后
+                member.levelExpiryDate = timezone.localdate() + timezone.timedelta(days=365)
+                member.lifetimePoints = 0
+                promo_message = f' (UPGRADED to {target_name}!)'
+
+        self.touch(member, 'balance', 'balanceExpiryDate')
+        self.record(member, 'RECHARGE', tier.amount)
+        if tier.grantVoucherType and tier.grantVoucherCount > 0:
+            expiry_date = tier.grantVoucherType.get_voucher_expiry(self.now)
+            self.granted += [
+                Voucher(member=member, voucherType=tier.grantVoucherType, expiryDate=expiry_date)
+                for _ in range(tier.grantVoucherCount)
+            ]
+        return {'success': f'Successfully recharged ${tier.amount}.{promo_message}'}
+
+    def consume(self, op):
+        actual_spend = Decimal(str(op['amount']))
+        member = self.member(op.get('memberId'), 'Member not found.')
+        if member.balance < actual_spend:
+            raise OpError(f'Insufficient balance. Need ${actual_spend}.')
+
+        points_earned = self.earn(member, float(actual_spend))
+        member.balance -= actual_spend
+        self.touch(member, 'balance', 'loyaltyPoints')
+        self.record(member, 'CONSUME_BALANCE', -actual_spend, points_earned)
+        return {
+            'success': f'Successfully consumed ${actual_spend}',
+            'points_earned': points_earned,
+            'new_balance': member.balance,
+        }
+
+    def track(self, op):
+        spend_amount = float(op['amount'])
+        member = self.member(op.get('memberId'), 'Member not found.')
+
+        points_earned = self.earn(member, spend_amount)
+        self.touch(member, 'loyaltyPoints')
+        self.record(member, 'CONSUME_CASH', -Decimal(str(spend_amount)), points_earned)
+        return {
+            'success': f'Tracked successfully. Earned {points_earned} pts.',
+            'points_earned': points_earned,
+            'new_total_points': member.loyaltyPoints,
+        }
+
+    def redeem_voucher(self, op):
+        voucher = self.vouchers.get(op['voucher_id'])
+        if voucher is None:
+            raise OpError('Voucher not found.', 404)
+        product = voucher.voucherType
+
+        if voucher.status == 'used':
+            raise OpError('Voucher already used.')
+        if voucher.expiryDate and voucher.expiryDate < self.now:
+            # 顺便更新状态 (即使这个操作失败也会写入)
+            if voucher.status != 'expired':
+                voucher.status = 'expired'
+                self.expired.append(voucher.pk)
+            raise OpError('Voucher is expired.')
+
+        # --- A. 产品券 (免费)：只核销，不记账 ---
+        if product.value == 0 and product.costOfGoods is not None and product.costOfGoods >= 0:
+            self.claim(voucher)
+            return {'success': f'{product.name} redeemed.', 'points_earned': 0}
+
+        # --- B. 现金券 ($50 Off) ---
+        bill_amount = Decimal(str(op.get('bill_amount') or 0))
+        if bill_amount <= 0:
+            raise OpError('Bill amount required for discount vouchers.')
+        if bill_amount < product.threshold:
+            raise OpError(f'Min spend ${product.threshold} required.')
+        member = self.member(voucher.member_id, 'Member not found.')
+
+        # 计算尾款，有尾款才加积分
+        cash_payment = bill_amount - product.value
+        points_earned = self.earn(member, float(cash_payment)) if cash_payment > 0 else 0
+        self.claim(voucher)
+        self.touch(member, 'loyaltyPoints')
+        self.record(member, 'CONSUME_VOUCHER', -product.value, voucher=voucher)
+        if cash_payment > 0:
+            self.record(member, 'CONSUME_CASH', -cash_payment, points_earned)
+        return {'success': f'Redeemed {product.name}. Paid extra: ${cash_payment}', 'points_earned': points_earned}
+
+    def claim(self, voucher):
+        voucher.status = 'used'
+        voucher.usedDate = self.now
+        self.claimed.append(voucher.pk)
+
+    def flush(self):
+        if self.claimed:
+            # 券已经被锁住，这里的 status='unused' 只是多一层保险
+            Voucher.objects.filter(pk__in=self.claimed, status='unused').update(status='used', usedDate=self.now)
+        if self.expired:
+            Voucher.objects.filter(pk__in=self.expired).update(status='expired')
+        for member_id in sorted(self.dirty):
+            save_wallet(self.members[member_id], *self.dirty[member_id])
+        if self.transactions:
+            Transaction.objects.bulk_create(self.transactions)
+            rollups.record_transactions(self.transactions)
+        if self.granted:
+            Voucher.objects.bulk_create(self.granted)
+
+
+def _lock(operations):
+    """ 读取档位，按主键顺序锁住代金券和会员 """
+    tier_ids = {op['tier_id'] for op in operations if op['op'] == 'recharge'}
+    tiers = RechargeTier.objects.select_related('grantVoucherType').in_bulk(tier_ids) if tier_ids else {}
+
+    voucher_ids = {op['voucher_id'] for op in operations if op['op'] == 'redeem_voucher'}
+    vouchers = {}
+    if voucher_ids:
+        vouchers = {
+            v.pk: v for v in
+            Voucher.objects.select_for_update(of=('self',)).select_related('voucherType')
+            .filter(pk__in=voucher_ids).order_by('pk')
+        }
+
+    member_ids = {op['memberId'] for op in operations if op.get('memberId')}
+    member_ids |= {v.member_id for v in vouchers.values() if v.member_id}
+    members = {}
+    if member_ids:
+        members = {m.pk: m for m in Member.objects.select_for_update().filter(pk__in=member_ids).order_by('pk')}
+    return members, vouchers, tiers
+
+
+def run(staff, operations):
+    """
+    按顺序执行 operations (已经通过验证的 dict: op + 对应验证器的字段)，
+    返回 [(状态码, 响应内容)]。数据库错误会让整批回滚并抛出异常。
+    """
+    results = []
+    with transaction.atomic():
+        batch = _Batch(staff, *_lock(operations))
+        for op in operations:
+            try:
+                results.append((200, getattr(batch, op['op'])(op)))
+            except OpError as e:
+                results.append((e.status, {'error': str(e)}))
+        batch.flush()
+    return results
@@ -0,0 +1,126 @@
+# 这是 api/idempotency.py 文件的内容
+
+"""
+V255 蓝图: Idempotency-Key (扣款/发券类 POST 接口可以安全重试)
+- 客户端给每个操作生成一个 Key (例如 UUID)，放在 `Idempotency-Key` 请求头里；超时重试时用同一个 Key。
+- 第一次请求: 在同一个数据库事务里先插入 (用户, 接口, Key) 占位行，再执行视图，最后把响应写进这一行。
+  视图失败回滚 (5xx 或抛出异常) 时占位行也一起回滚，客户端可以用同一个 Key 重试。
+- 重复请求: 直接返回保存的响应 (加上 `Idempotent-Replayed: true`)，不会再修改数据库。
+  同时到达的两个相同请求: 第二个在唯一约束上等第一个提交，然后返回第一个的结果。
+- 同一个 Key 用在不同的请求内容上 -> 422；不带请求头的请求和以前完全一样。
+- Key 保存 IDEMPOTENCY_KEY_TTL (默认 24 小时)，过期的由 nightly_settlement 清理 (apps.py 里注册)。
+"""
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+DEFAULT_TTL = timezone.timedelta(hours=24)
+
+
+def get_ttl():
+    return getattr(settings, 'IDEMPOTENCY_KEY_TTL', DEFAULT_TTL)
+
+
+def request_hash(request):
+    """ 路径 + 请求内容 (键排好序，和 JSON 的空格/顺序无关) """
+    data = request.data
+    if hasattr(data, 'lists'):  # QueryDict (表单提交)
+        data = dict(data.lists())
+    payload = json.dumps([request.path, data], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _replay(record, fingerprint):
+    if record.requestHash != fingerprint:
+        return Response(
+            {'error': f'{HEADER} was already used for a different request.'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    if record.statusCode is None:
+        return Response({'error': 'A request with this Idempotency-Key is still in progress.'}, status=status.HTTP_409_CONFLICT)
+    return Response(record.responseBody, status=record.statusCode, headers={REPLAYED_HEADER: 'true'})
+
+
+def _execute(view_method, view, request, args, kwargs, lookup, fingerprint):
+    """ 占位 + 执行 + 保存响应 (一个事务)。Key 已经存在时返回 None """
+    with transaction.atomic():
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    **lookup, requestHash=fingerprint, expiresAt=timezone.now() + get_ttl(),
+                )
+        except IntegrityError:
+            return None
+
+        response = view_method(view, request, *args, **kwargs)
+        if response.status_code >= 500:
+            # 服务器错误不保存 (连同占位行一起回滚)，允许重试
+            transaction.set_rollback(True)
+            return response
+
+        # 保存渲染后的 JSON (Decimal 等类型和第一次返回的完全一样)
+        record.statusCode = response.status_code
+        record.responseBody = json.loads(JSONRenderer().render(response.data) or b'null')
+        record.save(update_fields=['statusCode', 'responseBody'])
+        return response
+
+
+def idempotent(view_method):
+    """ 装饰视图的 post() 方法 """
+
+    @functools.wraps(view_method)
+    def wrapper(view, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view_method(view, request, *args, **kwargs)
+
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return Response({'error': f'{HEADER} must be 1-{MAX_KEY_LENGTH} characters.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        lookup = {'user': request.user, 'endpoint': request.resolver_match.view_name, 'key': key}
+        fingerprint = request_hash(request)
+        for _ in range(2):
+            response = _execute(view_method, view, request, args, kwargs, lookup, fingerprint)
+            if response is not None:
+                return response
+
+            record = IdempotencyKey.objects.filter(**lookup).first()
+            if record is None:
+                continue  # 另一个相同的请求刚刚回滚了，重新执行
+            if record.expiresAt <= timezone.now():
+                record.delete()  # 过期的 Key 当作新的
+                continue
+            return _replay(record, fingerprint)
+        return Response({'error': 'A request with this Idempotency-Key is still in progress.'}, status=status.HTTP_409_CONFLICT)
+
+    return wrapper
+
+
+def purge_expired(now=None, chunk_size=1000, dry_run=False, progress=None):
+    """ 删除过期的 Key (每批一个短事务) """
+    now = now or timezone.now()
+    pending = IdempotencyKey.objects.filter(expiresAt__lte=now)
+    if dry_run:
+        return pending.count()
+
+    done = 0
+    while True:
+        ids = list(pending.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return done
+        done += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
+        if progress:
+            progress('idempotency_keys', done)
@@ -0,0 +1,218 @@
+# 这是 api/images.py 文件的内容
+
+"""
+V245 蓝图: 图片处理流水线
+- 上传接口保存原图后调用 enqueue()，只写一行 ImageAsset (不在请求里处理图片)。
+- `python manage.py process_images` 在后台生成 thumb / card / full 的 WebP + JPEG:
+  按 EXIF 方向摆正 -> 等比缩小 (不放大) -> 重新编码 (不带 EXIF/GPS 信息)。
+- 序列化器用 variant_map() 输出 {"thumb": {"webp": url, "jpeg": url, "width", "height"}, ...}，
+  前端用 <picture>/srcset 按屏幕大小只下载需要的尺寸。还没处理好时返回 None，继续用原图。
+"""
+import os
+from datetime import timedelta
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .models import ImageAsset
+
+# (名称, 最长边像素)
+VARIANTS = {
+    'content': [('thumb', 320), ('card', 800), ('full', 1600)],
+    'avatar': [('thumb', 128), ('card', 400)],
+}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+DERIVATIVE_DIR = 'derivatives'
+SOURCE_DIRS = {'announcements': 'content', 'store_points': 'content', 'store_balance': 'content', 'avatars': 'avatar'}
+LEASE_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def _storage():
+    return FileSystemStorage(location=settings.MEDIA_ROOT)
+
+
+def url_origin(url):
+    """ 'https://lluvia.app/media/x.png' -> 'https://lluvia.app' (相对 URL 返回 '') """
+    parts = urlparse(url or '')
+    return f'{parts.scheme}://{parts.netloc}' if parts.netloc else ''
+
+
+def source_path_from_url(url):
+    """ '/media/store_points/x.jpg' 或 'https://lluvia.app/media/avatars/x.png' -> 'store_points/x.jpg' """
+    if not url:
+        return None
+    path = urlparse(url).path
+    if not path.startswith(settings.MEDIA_URL):
+        return None
+    return path[len(settings.MEDIA_URL):] or None
+
+
+def enqueue(source_path, kind='content'):
+    """ 登记一张需要处理的原图 (已经登记过就不重复登记) """
+    if not source_path:
+        return None
+    asset, _ = ImageAsset.objects.get_or_create(sourcePath=source_path, defaults={'kind': kind})
+    return asset
+
+
+def requeue(queryset):
+    """ 重新处理 (后台 action 用，例如调整了尺寸或质量之后) """
+    return queryset.update(status='PENDING', attempts=0, nextAttemptAt=timezone.now(), lastError='')
+
+
+def backfill():
+    """ 把 MEDIA_ROOT 里已有但还没登记的原图全部登记 (返回新登记的数量) """
+    storage = _storage()
+    known = set(ImageAsset.objects.values_list('sourcePath', flat=True))
+    new_assets = []
+    for folder, kind in SOURCE_DIRS.items():
+        if not storage.exists(folder):
+            continue
+        for name in storage.listdir(folder)[1]:
+            path = f'{folder}/{name}'
+            if path not in known:
+                new_assets.append(ImageAsset(sourcePath=path, kind=kind))
+    ImageAsset.objects.bulk_create(new_assets, batch_size=500, ignore_conflicts=True)
+    return len(new_assets)
+
+
+def _flatten(image):
+    """ JPEG 不支持透明: 透明背景铺白色 """
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        return background
+    return image.convert('RGB')
+
+
+def render_variants(asset):
+    """ 生成所有尺寸，返回写入 ImageAsset.variants 的 dict """
+    storage = _storage()
+    base = f'{DERIVATIVE_DIR}/{asset.sourcePath}'
+    variants = {}
+
+    with Image.open(storage.path(asset.sourcePath)) as original:
+        original = ImageOps.exif_transpose(original)  # 手机照片按 EXIF 方向摆正
+        has_alpha = original.mode in ('RGBA', 'LA') or (original.mode == 'P' and 'transparency' in original.info)
+        source = original.convert('RGBA' if has_alpha else 'RGB')
+
+        for name, size in VARIANTS.get(asset.kind, VARIANTS['content']):
+            image = source.copy()
+            image.thumbnail((size, size), Image.Resampling.LANCZOS)  # 只缩小，不放大
+
+            webp_name = f'{base}/{name}.webp'
+            jpeg_name = f'{base}/{name}.jpg'
+            os.makedirs(os.path.dirname(storage.path(webp_name)), exist_ok=True)
+            # 不传 exif= 参数，新文件里就不会有 EXIF (包括 GPS)
+            image.save(storage.path(webp_name), 'WEBP', quality=WEBP_QUALITY, method=4)
+            _flatten(image).save(storage.path(jpeg_name), 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+
+            variants[name] = {'width': image.width, 'height': image.height, 'webp': webp_name, 'jpeg': jpeg_name}
+    return variants
+
+
+def claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            ImageAsset.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', nextAttemptAt__lte=now)
+            .order_by('nextAttemptAt', 'id')[:batch_size]
+        )
+        if batch:
+            ImageAsset.objects.filter(pk__in=[a.pk for a in batch]).update(
+                nextAttemptAt=now + timedelta(seconds=LEASE_SECONDS),
+            )
+    return batch
+
+
+def process_pending(batch_size=20, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """ 处理所有等待中的图片，返回 {'ready': n, 'retry': n, 'failed': n} """
+    from .caching import bump_version
+
+    stats = {'ready': 0, 'retry': 0, 'failed': 0}
+    while True:
+        batch = claim_batch(batch_size)
+        if not batch:
+            break
+        for asset in batch:
+            asset.attempts += 1
+            try:
+                asset.variants = render_variants(asset)
+            except Exception as e:
+                asset.lastError = f'{type(e).__name__}: {e}'
+                if asset.attempts >= max_attempts:
+                    asset.status = 'FAILED'
+                    stats['failed'] += 1
+                else:
+                    asset.nextAttemptAt = timezone.now() + timedelta(seconds=60 * asset.attempts)
+                    stats['retry'] += 1
+            else:
+                asset.status = 'READY'
+                asset.lastError = ''
+                asset.processedAt = timezone.now()
+                stats['ready'] += 1
+            asset.save(update_fields=['attempts', 'variants', 'status', 'lastError', 'nextAttemptAt', 'processedAt'])
+
+    if stats['ready']:
+        # 缓存的商城/公告/画廊 JSON 要带上新的图片尺寸
+        for namespace in ('catalogue', 'announcements', 'gallery'):
+            bump_version(namespace)
+    return stats
+
+
+def load_variants(paths):
+    """ 一次查询取多张图的 variants: {sourcePath: variants} (只包含已处理好的) """
+    paths = [p for p in paths if p]
+    if not paths:
+        return {}
+    return dict(
+        ImageAsset.objects.filter(sourcePath__in=paths, status='READY').values_list('sourcePath', 'variants')
+    )
+
+
+def variant_urls(variants, request=None, origin=''):
+    """
+    把相对路径换成 (绝对) URL。
+    origin: 没有 request 时用的 'https://host' 前缀 (例如从头像的绝对 URL 里取)
+    """
+    if not variants:
+        return None
+
+    def url(name):
+        relative = settings.MEDIA_URL + name
+        return request.build_absolute_uri(relative) if request else origin + relative
+
+    return {
+        name: {'width': v['width'], 'height': v['height'], 'webp': url(v['webp']), 'jpeg': url(v['jpeg'])}
+        for name, v in variants.items()
+    }
+
+
+def variant_map(serializer, obj, get_path):
+    """
+    给序列化器的 SerializerMethodField 用。
+    many=True 时第一次调用就把整个列表的图片一次查出来 (避免 N+1)，结果放在 context 里。
+    """
+    path = get_path(obj)
+    if not path:
+        return None
+
+    found = serializer.context.setdefault('_image_variants', {})
+    if path not in found:
+        paths = {path}
+        instances = getattr(getattr(serializer, 'parent', None), 'instance', None)
+        if isinstance(instances, (list, tuple, QuerySet)):
+            paths.update(get_path(o) for o in instances)
+        loaded = load_variants(paths)
+        for p in paths:
+            found[p] = loaded.get(p)
+    return variant_urls(found[path], serializer.context.get('request'))
@@ -0,0 +1,76 @@
+# 这是 api/levels.py 文件的内容
+
+"""
+V235 蓝图: 进程内缓存的等级阶梯 (Level Ladder)
+- Level 表很小、几乎不变，但 Member.save() 每次都要用到它。
+- 这里把所有等级按 minPoints 排好序缓存在进程里，用 bisect 查找 (O(log n)，0 次查询)。
+- Level 保存/删除时由 signals 调用 invalidate()；
+  其他 worker 进程最多在 LADDER_TTL 秒后自动刷新。
+"""
+import bisect
+import threading
+import time
+
+from .models import Level
+
+LADDER_TTL = 300  # 秒
+
+_lock = threading.Lock()
+_ladder = None
+_loaded_at = 0.0
+
+
+class LevelLadder:
+    """ 按 minPoints 升序排列的等级列表 """
+
+    def __init__(self, levels):
+        self.levels = sorted(levels, key=lambda lvl: lvl.minPoints)
+        self.min_points = [lvl.minPoints for lvl in self.levels]
+        self._by_id = {lvl.levelId: lvl for lvl in self.levels}
+        self._by_name = {lvl.levelName: lvl for lvl in self.levels}
+
+    def lowest(self):
+        return self.levels[0] if self.levels else None
+
+    def by_id(self, level_id):
+        return self._by_id.get(level_id)
+
+    def by_name(self, name):
+        return self._by_name.get(name)
+
+    def for_points(self, points):
+        """ 积分能达到的最高等级 (minPoints <= points)，一个都达不到返回 None """
+        index = bisect.bisect_right(self.min_points, points) - 1
+        return self.levels[index] if index >= 0 else None
+
+
+def get_ladder():
+    """ 取缓存的等级阶梯 (过期或被清空时从数据库重新加载一次) """
+    global _ladder, _loaded_at
+    ladder = _ladder
+    if ladder is not None and time.monotonic() - _loaded_at < LADDER_TTL:
+        return ladder
+    with _lock:
+        if _ladder is None or time.monotonic() - _loaded_at >= LADDER_TTL:
+            _ladder = LevelLadder(Level.objects.all())
+            _loaded_at = time.monotonic()
+        return _ladder
+
+
+def get_level(level_id):
+    """
+    按 ID 取等级。缓存里没有 (例如别的进程刚新建了等级) 就强制刷新一次。
+    """
+    if level_id is None:
+        return None
+    level = get_ladder().by_id(level_id)
+    if level is None:
+        invalidate()
+        level = get_ladder().by_id(level_id)
+    return level
+
+
+def invalidate():
+    global _ladder
+    with _lock:
+        _ladder = None
@@ -0,0 +1,97 @@
+import json
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from api import benchmark, synthetic
+
+
+class Command(BaseCommand):
+    """
+    V252: 热点接口基准测试 (在单独的测试数据库里运行，不会碰正式数据)
+    用法:
+      python manage.py benchmark_api --output bench.json
+      python manage.py benchmark_api --compare bench.json            (p95 变慢 >25% 或 SQL 变多时失败)
+      python manage.py benchmark_api --members 20000 --transactions 500000 --keepdb
+    SQLite 用内存测试库；PostgreSQL 用 test_<NAME> (需要建库权限)。
+    """
+    help = 'Seed a synthetic dataset in a test database and measure p50/p95 latency and queries of hot endpoints.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=2000)
+        parser.add_argument('--transactions', type=int, default=50000)
+        parser.add_argument('--vouchers', type=int, default=5000)
+        parser.add_argument('--years', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--only', help='comma-separated scenario names')
+        parser.add_argument('--output', help='write JSON results to this file')
+        parser.add_argument('--compare', help='baseline JSON file to compare against')
+        parser.add_argument('--threshold', type=float, default=25.0, help='allowed p95 slowdown in percent')
+        parser.add_argument('--keepdb', action='store_true', help='reuse the test database (and its data) between runs')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare']) as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read baseline: {e}')
+
+        scale = {k: options[k] for k in ('members', 'transactions', 'vouchers', 'years', 'seed')}
+        only = {s.strip() for s in options['only'].split(',')} if options['only'] else None
+
+        # 独立的缓存目录 + 进程内限流: 不影响正在运行的服务
+        cache_dir = tempfile.mkdtemp(prefix='lluvia-bench-cache-')
+        caches = {'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir,
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }}
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        try:
+            with override_settings(CACHES=caches, THROTTLE_BACKEND='local', METRICS_BACKEND='local'):
+                connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+                try:
+                    from api.models import Transaction
+                    if not Transaction.objects.exists():
+                        self.stdout.write(f'Seeding {scale} ...')
+                        counts = synthetic.seed(
+                            members=scale['members'], transactions=scale['transactions'],
+                            vouchers=scale['vouchers'], years=scale['years'], seed=scale['seed'],
+                        )
+                        self.stdout.write(f'Seeded {counts}')
+                    report = benchmark.run(options['iterations'], options['warmup'], only, scale)
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+        finally:
+            teardown_test_environment()
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+        self.print_table(report, baseline, options['threshold'])
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f'Wrote {options["output"]}'))
+
+        if baseline is not None:
+            _, regressed = benchmark.compare(report, baseline, options['threshold'])
+            if regressed:
+                raise CommandError('Benchmark regression detected.')
+
+    def print_table(self, report, baseline, threshold):
+        self.stdout.write(f"{'scenario':<22}{'p50 ms':>10}{'p95 ms':>10}{'queries':>9}  status")
+        rows = benchmark.compare(report, baseline, threshold)[0] if baseline else [
+            (name, result, None, '') for name, result in report['results'].items()
+        ]
+        for name, result, change, note in rows:
+            line = f"{name:<22}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['queries']:>9}  {result['status']}"
+            if baseline:
+                delta = f'{change:+.0f}%' if change is not None else ''
+                line += f'  {delta} {note}'
+            self.stdout.write(self.style.WARNING(line) if note not in ('', 'ok', 'new') else line)
@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework import serializers
+
+from api import exports
+
+
+class Command(BaseCommand):
+    """
+    V249: 流式导出交易 / 公司账本 (内存占用固定，一年的数据也可以)
+    用法:
+      python manage.py export_ledger transactions --from 2025-01-01 --to 2025-12-31 -o txns.csv
+      python manage.py export_ledger ledger --from 2025-01-01 --format jsonl --gzip -o ledger.jsonl.gz
+      python manage.py export_ledger transactions --type RECHARGE,CONSUME_CASH --staff <uuid>
+    不写 -o 就输出到 stdout。
+    """
+    help = 'Stream Transaction or FinancialLedger rows to CSV/JSONL (optionally gzipped).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(exports.EXPORTS))
+        parser.add_argument('--from', dest='from', help='YYYY-MM-DD (inclusive)')
+        parser.add_argument('--to', dest='to', help='YYYY-MM-DD (inclusive)')
+        parser.add_argument('--type', help='comma-separated transaction/ledger types')
+        parser.add_argument('--staff', help='staff member UUID')
+        parser.add_argument('--member', help='member UUID')
+        parser.add_argument('--format', dest='fmt', choices=exports.FORMATS, default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--chunk-size', type=int, default=exports.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('-o', '--output', help='file path (default: stdout)')
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        try:
+            filters = exports.parse_filters(kind, options)
+        except serializers.ValidationError as e:
+            raise CommandError('; '.join(f'{field}: {error}' for field, error in e.detail.items()))
+
+        chunks = exports.iter_export(
+            kind, options['fmt'], options['gzip'], chunk_size=options['chunk_size'], **filters,
+        )
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        written = 0
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+                written += len(chunk)
+        finally:
+            if options['output']:
+                out.close()
+            else:
+                out.flush()
+
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f'Wrote {written} bytes to {options["output"]}.'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from api import storage
+
+
+class Command(BaseCommand):
+    """
+    V246: 清理没有被任何记录引用的媒体文件 (media/cas/ 里的孤儿文件)
+    用法:
+      python manage.py gc_media --dry-run      (只统计，不删除)
+      python manage.py gc_media                (删除超过 24 小时的孤儿文件及其缩略图)
+    引用关系见 api/storage.py 的 MEDIA_REFERENCES。
+    """
+    help = 'Delete content-addressed media files that no database row references.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true')
+        parser.add_argument('--grace-hours', type=float, default=storage.GC_GRACE_SECONDS / 3600,
+                            help='keep unreferenced files younger than this (uploads not yet saved to an item)')
+
+    def handle(self, *args, **options):
+        stats = storage.collect_garbage(dry_run=options['dry_run'], grace_seconds=options['grace_hours'] * 3600)
+        verb = 'Would delete' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {stats['checked']} file(s). {verb} {stats['deleted']} orphan(s), {stats['bytes'] / 1024:.1f} KB."
+        ))
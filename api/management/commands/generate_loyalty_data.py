@@ -0,0 +1,130 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from api import rollups, synthetic
+from api.models import Member
+
+
+def _split(total, parts):
+    """ 把 total 尽量平均分成 parts 份 """
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+class Command(BaseCommand):
+    """
+    V253: 大量模拟数据 (压测报表和搜索用)
+    用法:
+      python manage.py generate_loyalty_data --members 1000000 --transactions 10000000 --workers 8
+      python manage.py generate_loyalty_data --members 5000 --transactions 100000 --seed 7
+    - PostgreSQL 默认用 COPY + 多进程；SQLite 只能单进程 bulk_create。
+    - 所有会员的密码都是 synthetic.SHARED_PASSWORD (哈希只算一次)。
+    - 再次运行会接着已有的模拟会员往后编号，不会冲突。
+    只在压测 / 开发数据库上运行！
+    """
+    help = 'Generate millions of synthetic members, transactions, ledger rows and vouchers quickly.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=10000)
+        parser.add_argument('--staff', type=int, default=20)
+        parser.add_argument('--transactions', type=int, default=200000)
+        parser.add_argument('--vouchers', type=int, default=20000)
+        parser.add_argument('--years', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--method', choices=['auto', 'copy', 'bulk'], default='auto')
+        parser.add_argument('--fast', action='store_true', help='PostgreSQL: synchronous_commit=off while loading')
+        parser.add_argument('--skip-rollup', action='store_true', help='do not rebuild DailyFinancialRollup afterwards')
+
+    def handle(self, *args, **options):
+        method = options['method']
+        if method == 'auto':
+            method = 'copy' if synthetic.copy_supported() else 'bulk'
+        elif method == 'copy' and not synthetic.copy_supported():
+            raise CommandError('COPY needs PostgreSQL; use --method bulk.')
+
+        workers = max(1, options['workers'])
+        if connection.vendor == 'sqlite' and workers > 1:
+            self.stdout.write(self.style.WARNING('SQLite allows one writer at a time; using --workers 1.'))
+            workers = 1
+
+        seed, batch_size, fast = options['seed'], options['batch_size'], options['fast']
+        started = time.monotonic()
+
+        # 1. 目录数据和员工 (很少，主进程直接写)
+        synthetic.ensure_catalogue()
+        password_hash = make_password(synthetic.SHARED_PASSWORD)
+        offset = synthetic.existing_synthetic_members()
+        staff_ids = list(
+            Member.objects.filter(email__endswith=f'@{synthetic.LOADTEST_DOMAIN}')
+            .exclude(role='MEMBER').values_list('memberId', flat=True)
+        )
+        if not staff_ids and options['staff']:
+            staff_rows = synthetic.build_staff(synthetic.Generator(seed, shard='staff'), options['staff'], password_hash)
+            synthetic.write_rows(Member, staff_rows, 'bulk')
+            staff_ids = [m.memberId for m in staff_rows]
+
+        if options['members']:
+            member_range = (offset, offset + options['members'])
+        elif offset:
+            member_range = (0, offset)  # 只给已有的模拟会员加交易
+        else:
+            raise CommandError('No synthetic members exist yet; pass --members.')
+
+        # 子进程各自建立数据库连接 (不能共用父进程的连接)
+        connections.close_all()
+        context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            # 2. 会员
+            jobs, start = [], offset
+            for shard, size in enumerate(_split(options['members'], workers)):
+                if size:
+                    jobs.append(pool.submit(
+                        synthetic.generate_members, seed, f'{offset}-{shard}', start, start + size,
+                        password_hash, method, batch_size, fast,
+                    ))
+                start += size
+            members = sum(job.result() for job in jobs)
+            self.report('members', members, started)
+
+            # 3. 交易 + 公司账本 / 代金券 (同时进行)
+            txn_jobs = [
+                pool.submit(
+                    synthetic.generate_transactions, seed, f'{offset}-{shard}', size, member_range,
+                    staff_ids, options['years'], method, batch_size, fast,
+                )
+                for shard, size in enumerate(_split(options['transactions'], workers)) if size
+            ]
+            voucher_jobs = [
+                pool.submit(
+                    synthetic.generate_vouchers, seed, f'{offset}-{shard}', size, member_range,
+                    method, batch_size, fast,
+                )
+                for shard, size in enumerate(_split(options['vouchers'], workers)) if size
+            ]
+            results = [job.result() for job in txn_jobs]
+            self.report('transactions', sum(t for t, _ in results), started)
+            self.report('ledger entries', sum(l for _, l in results), started)
+            self.report('vouchers', sum(job.result() for job in voucher_jobs), started)
+
+        # 4. 统计信息和每日汇总
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+        if not options['skip_rollup']:
+            rows = rollups.rebuild()
+            self.report('rollup rows', rows, started)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Done in {time.monotonic() - started:.1f}s ({method}, {workers} worker(s), seed {seed}).'
+        ))
+
+    def report(self, label, count, started):
+        self.stdout.write(f'  {label}: {count} ({time.monotonic() - started:.1f}s)')
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import settlement
+
+
+class Command(BaseCommand):
+    """
+    V247: 每晚结算 (代金券过期 / 等级结算 / 余额过期，再加上其他模块注册的清理任务)
+    用法 (cron 每天凌晨跑一次):
+      python manage.py nightly_settlement
+      python manage.py nightly_settlement --dry-run              (只统计需要处理的数量)
+      python manage.py nightly_settlement --only vouchers,levels
+    中途中断可以直接重新运行，会从没处理的继续。
+    """
+    help = 'Expire vouchers, settle member levels and expire balances in chunked set-based updates.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', help=f'comma-separated steps ({", ".join(settlement.all_steps())})')
+        parser.add_argument('--chunk-size', type=int, default=settlement.DEFAULT_CHUNK_SIZE)
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        steps = settlement.all_steps()
+        if options['only']:
+            steps = tuple(s.strip() for s in options['only'].split(',') if s.strip())
+            unknown = set(steps) - set(settlement.all_steps())
+            if unknown:
+                raise CommandError(f'Unknown step(s): {", ".join(sorted(unknown))}')
+
+        def progress(step, done):
+            self.stdout.write(f'  {step}: {done} processed...')
+
+        results = settlement.run(
+            steps=steps, chunk_size=options['chunk_size'], dry_run=options['dry_run'], progress=progress,
+        )
+        verb = 'to process' if options['dry_run'] else 'processed'
+        for step, count in results.items():
+            self.stdout.write(self.style.SUCCESS(f'{step}: {count} {verb}.'))
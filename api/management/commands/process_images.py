@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import images
+
+
+class Command(BaseCommand):
+    """
+    V245: 生成上传图片的缩略图/压缩版本 (ImageAsset)
+    用法:
+      python manage.py process_images --backfill   (第一次: 登记 media/ 里已有的图片并处理)
+      python manage.py process_images              (处理队列后退出，适合 cron)
+      python manage.py process_images --loop       (常驻，每 --interval 秒检查一次)
+    """
+    help = 'Generate resized, EXIF-stripped WebP/JPEG variants for uploaded images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true', help='register existing files under MEDIA_ROOT first')
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument('--max-attempts', type=int, default=images.DEFAULT_MAX_ATTEMPTS)
+        parser.add_argument('--loop', action='store_true', help='keep running')
+        parser.add_argument('--interval', type=float, default=5.0, help='seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            count = images.backfill()
+            self.stdout.write(f'Registered {count} existing image(s).')
+
+        while True:
+            stats = images.process_pending(batch_size=options['batch_size'], max_attempts=options['max_attempts'])
+            if any(stats.values()) or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Images: {stats['ready']} ready, {stats['retry']} to retry, {stats['failed']} failed."
+                ))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
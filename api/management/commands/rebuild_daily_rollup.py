@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api import rollups
+
+
+class Command(BaseCommand):
+    """
+    V233: 重建每日财务汇总 (DailyFinancialRollup)
+    用法:
+      python manage.py rebuild_daily_rollup                      (全部历史)
+      python manage.py rebuild_daily_rollup --from 2025-11-01 --to 2025-11-30
+    """
+    help = 'Rebuild DailyFinancialRollup rows from Transaction and FinancialLedger for a date range.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='YYYY-MM-DD (inclusive)')
+        parser.add_argument('--to', dest='date_to', help='YYYY-MM-DD (inclusive)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        date_from = self.parse_date(options['date_from'])
+        date_to = self.parse_date(options['date_to'])
+        if date_from and date_to and date_from > date_to:
+            raise CommandError("--from must be on or before --to")
+
+        count = rollups.rebuild(date_from, date_to, batch_size=options['batch_size'])
+        label = f"{date_from or 'beginning'} -> {date_to or 'today'}"
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} rollup rows ({label}).'))
+
+    def parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return timezone.datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date: {value}. Use YYYY-MM-DD')
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api import reconciliation
+
+
+class Command(BaseCommand):
+    """
+    V250: 会员账本 (Transaction) 和公司账本 (FinancialLedger) 对账
+    用法 (可以每晚跑一次全部历史):
+      python manage.py reconcile_ledger
+      python manage.py reconcile_ledger --from 2025-11-01 --to 2025-11-30
+      python manage.py reconcile_ledger --fail-on-issues   (有问题时退出码为 1，方便 cron 报警)
+    """
+    help = 'Report missing or mismatched FinancialLedger entries per day and transaction type.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='YYYY-MM-DD (inclusive)')
+        parser.add_argument('--to', dest='date_to', help='YYYY-MM-DD (inclusive)')
+        parser.add_argument('--all', action='store_true', help='also list days without issues')
+        parser.add_argument('--fail-on-issues', action='store_true')
+
+    def handle(self, *args, **options):
+        date_from = self.parse_date(options['date_from'])
+        date_to = self.parse_date(options['date_to'])
+        if date_from and date_to and date_from > date_to:
+            raise CommandError("--from must be on or before --to")
+
+        report = reconciliation.reconcile(date_from, date_to, include_clean=options['all'])
+
+        for rule in report['rules']:
+            line = (
+                f"{rule['type']:<14} -> {rule['ledger_type']:<16} "
+                f"txns={rule['txn_count']} missing={rule['missing']} mismatched={rule['mismatched']} "
+                f"expected={rule['expected_total']} ledger={rule['ledger_total']}"
+            )
+            ok = not (rule['missing'] or rule['mismatched'])
+            self.stdout.write(self.style.SUCCESS(line) if ok else self.style.WARNING(line))
+
+        for day in report['days']:
+            self.stdout.write(
+                f"  {day['date']} {day['type']} -> {day['ledger_type']}: "
+                f"missing={day['missing']} mismatched={day['mismatched']} "
+                f"expected={day['expected_total']} ledger={day['ledger_total']}"
+            )
+        for orphan in report['orphans']:
+            self.stdout.write(self.style.WARNING(
+                f"  {orphan['date']} {orphan['ledger_type']}: {orphan['count']} entries without a transaction "
+                f"(total {orphan['total']})"
+            ))
+
+        if report['ok']:
+            self.stdout.write(self.style.SUCCESS('Ledgers reconcile.'))
+        elif options['fail_on_issues']:
+            raise CommandError('Ledger reconciliation found issues.')
+
+    def parse_date(self, value):
+        if not value:
+            return None
+        try:
+            return timezone.datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Invalid date: {value}. Use YYYY-MM-DD')
@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import outbox
+
+
+class Command(BaseCommand):
+    """
+    V244: 发送发件箱里的邮件 (OutboundEmail)
+    用法:
+      python manage.py send_outbox                 (发完所有到期的邮件就退出，适合 cron 每分钟跑一次)
+      python manage.py send_outbox --loop          (常驻，每 --interval 秒检查一次)
+      python manage.py send_outbox --backend django.core.mail.backends.console.EmailBackend   (本地调试)
+    """
+    help = 'Send pending OutboundEmail rows over one reused connection, with retry/backoff and dead-lettering.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--max-attempts', type=int, default=outbox.DEFAULT_MAX_ATTEMPTS)
+        parser.add_argument('--backoff', type=int, default=outbox.DEFAULT_BACKOFF, help='seconds before the first retry (doubles each time)')
+        parser.add_argument('--backend', help='email backend to use instead of EMAIL_BACKEND')
+        parser.add_argument('--loop', action='store_true', help='keep running')
+        parser.add_argument('--interval', type=float, default=5.0, help='seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                stats = outbox.drain(
+                    batch_size=options['batch_size'],
+                    max_attempts=options['max_attempts'],
+                    backoff=options['backoff'],
+                    backend=options['backend'],
+                )
+            except Exception as e:
+                # 例如 SMTP 连不上: 已领取的邮件会在租约到期后重新发送
+                self.stderr.write(self.style.ERROR(f'Outbox drain failed: {e}'))
+                if not options['loop']:
+                    raise
+            else:
+                if any(stats.values()) or not options['loop']:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Outbox: {stats['sent']} sent, {stats['retry']} to retry, {stats['dead']} dead."
+                    ))
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,209 @@
+# 这是 api/metrics.py 文件的内容
+
+"""
+V251 蓝图: 每个接口的性能指标 (Prometheus 格式)
+- MetricsMiddleware 给每个请求记录: 耗时、SQL 条数、SQL 耗时、响应大小，
+  标签是 (URL 名称, 方法, 状态码)。SQL 用 connection.execute_wrapper 统计，不开 DEBUG。
+- 数据先记在进程内 (一把锁 + 几个加法，开销很小)；
+  backend='cache' 时每个 worker 每 PUBLISH_SECONDS 秒把自己的快照写进共享缓存，
+  /api/admin/metrics 把所有 worker 的快照加起来输出 (backend='local' 只看当前进程)。
+- 流式响应 (导出文件) 的大小不统计。
+- 发布失败 (缓存服务器连不上等) 只记日志，不影响请求本身。
+"""
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'lluvia:metrics'
+PUBLISH_SECONDS = 10
+WORKER_TTL = 300  # 超过 5 分钟没更新的 worker (已经退出) 不再计入
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# 每组标签一行: [请求数, 耗时合计, SQL 条数合计, SQL 耗时合计, 响应字节合计, 耗时桶..., SQL 条数桶...]
+_COUNT, _DURATION, _QUERIES, _DB_TIME, _BYTES = range(5)
+_FIXED = 5
+
+
+def _bucket_index(buckets, value):
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            return i
+    return len(buckets)  # +Inf
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+        self._published = 0
+
+    def observe(self, labels, duration, queries, db_time, size):
+        d = _bucket_index(DURATION_BUCKETS, duration)
+        q = _bucket_index(QUERY_BUCKETS, queries)
+        with self._lock:
+            row = self._series.get(labels)
+            if row is None:
+                row = self._series[labels] = [0] * (_FIXED + len(DURATION_BUCKETS) + 1 + len(QUERY_BUCKETS) + 1)
+            row[_COUNT] += 1
+            row[_DURATION] += duration
+            row[_QUERIES] += queries
+            row[_DB_TIME] += db_time
+            row[_BYTES] += size
+            row[_FIXED + d] += 1
+            row[_FIXED + len(DURATION_BUCKETS) + 1 + q] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: list(row) for labels, row in self._series.items()}
+
+    def maybe_publish(self, force=False):
+        """ 把本进程的快照写进共享缓存 (最多每 PUBLISH_SECONDS 秒一次) """
+        now = time.time()
+        if not force and now - self._published < PUBLISH_SECONDS:
+            return
+        self._published = now
+        pid = os.getpid()
+        cache.set(f'{KEY_PREFIX}:{pid}', self.snapshot(), WORKER_TTL)
+        # worker 列表: 读-改-写不是原子的，最坏情况是某个 worker 下次发布时才重新出现
+        workers = cache.get(f'{KEY_PREFIX}:workers') or {}
+        workers = {p: t for p, t in workers.items() if now - t < WORKER_TTL}
+        workers[pid] = now
+        cache.set(f'{KEY_PREFIX}:workers', workers, WORKER_TTL)
+
+
+registry = Registry()
+
+
+def get_backend():
+    return getattr(settings, 'METRICS_BACKEND', 'cache')
+
+
+def collect():
+    """ 所有 worker 的数据加在一起 ({labels: row}) """
+    if get_backend() != 'cache':
+        return registry.snapshot()
+
+    registry.maybe_publish(force=True)
+    workers = cache.get(f'{KEY_PREFIX}:workers') or {}
+    snapshots = cache.get_many([f'{KEY_PREFIX}:{pid}' for pid in workers])
+    merged = {}
+    for snapshot in snapshots.values():
+        for labels, row in snapshot.items():
+            total = merged.get(labels)
+            if total is None or len(total) != len(row):
+                merged[labels] = list(row)
+            else:
+                merged[labels] = [a + b for a, b in zip(total, row)]
+    return merged
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(view, method, status, **extra):
+    pairs = [('view', view), ('method', method), ('status', status)] + list(extra.items())
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _histogram(lines, name, labels, buckets, counts, total, count):
+    view, method, status = labels
+    cumulative = 0
+    for bound, n in zip(list(buckets) + ['+Inf'], counts):
+        cumulative += n
+        lines.append(f'{name}_bucket{_labels(view, method, status, le=bound)} {cumulative}')
+    lines.append(f'{name}_sum{_labels(view, method, status)} {total}')
+    lines.append(f'{name}_count{_labels(view, method, status)} {count}')
+
+
+def render(series):
+    """ Prometheus text exposition format (version 0.0.4) """
+    d_start = _FIXED
+    q_start = _FIXED + len(DURATION_BUCKETS) + 1
+    items = sorted(series.items())
+
+    lines = [
+        '# HELP lluvia_http_request_duration_seconds Request latency by view, method and status.',
+        '# TYPE lluvia_http_request_duration_seconds histogram',
+    ]
+    for labels, row in items:
+        _histogram(lines, 'lluvia_http_request_duration_seconds', labels, DURATION_BUCKETS,
+                   row[d_start:q_start], round(row[_DURATION], 6), row[_COUNT])
+
+    lines += [
+        '# HELP lluvia_http_db_queries Database queries per request.',
+        '# TYPE lluvia_http_db_queries histogram',
+    ]
+    for labels, row in items:
+        _histogram(lines, 'lluvia_http_db_queries', labels, QUERY_BUCKETS,
+                   row[q_start:], row[_QUERIES], row[_COUNT])
+
+    lines += [
+        '# HELP lluvia_http_db_time_seconds_total Time spent in database queries.',
+        '# TYPE lluvia_http_db_time_seconds_total counter',
+    ]
+    lines += [f'lluvia_http_db_time_seconds_total{_labels(*labels)} {round(row[_DB_TIME], 6)}' for labels, row in items]
+
+    lines += [
+        '# HELP lluvia_http_response_bytes_total Response body bytes (streaming responses excluded).',
+        '# TYPE lluvia_http_response_bytes_total counter',
+    ]
+    lines += [f'lluvia_http_response_bytes_total{_labels(*labels)} {row[_BYTES]}' for labels, row in items]
+    return '\n'.join(lines) + '\n'
+
+
+class QueryTimer:
+    """ connection.execute_wrapper: 统计这个请求的 SQL 条数和耗时 """
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """ 放在 MIDDLEWARE 最前面，耗时包含其他所有中间件 """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+
+    def __call__(self, request):
+        if not self.enabled:
+            return self.get_response(request)
+
+        timer = QueryTimer()
+        start = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match.route) if match else 'unmatched'
+        size = 0 if response.streaming else len(response.content)
+        registry.observe((view, request.method, str(response.status_code)), duration, timer.count, timer.seconds, size)
+
+        if get_backend() == 'cache':
+            try:
+                registry.maybe_publish()
+            except Exception:
+                # 🚩 指标只是附带的，缓存出问题时请求照常返回 (PUBLISH_SECONDS 秒后再试)
+                logger.exception('Failed to publish metrics')
+        return response
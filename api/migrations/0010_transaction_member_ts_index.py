@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_member_levelexpirydate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['member', '-timestamp', '-transactionId'], name='txn_member_ts_idx'),
+        ),
+    ]
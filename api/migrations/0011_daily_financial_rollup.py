@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:59
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_transaction_member_ts_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyFinancialRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('source', models.CharField(choices=[('TRANSACTION', '会员交易 (Transaction)'), ('LEDGER', '公司账本 (FinancialLedger)')], max_length=20)),
+                ('type', models.CharField(max_length=20)),
+                ('totalAmount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('absAmount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('txnCount', models.IntegerField(default=0)),
+                ('pointsTotal', models.BigIntegerField(default=0)),
+                ('staff', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['source', 'day', 'type'], name='rollup_source_day_idx')],
+            },
+        ),
+    ]
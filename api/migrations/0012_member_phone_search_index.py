@@ -0,0 +1,80 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:03
+
+import re
+
+from django.db import NotSupportedError, OperationalError, ProgrammingError, migrations, models, transaction
+
+
+def backfill_phone_normalized(apps, schema_editor):
+    # V238: 已有会员的 phoneNormalized (只保留数字)
+    Member = apps.get_model('api', 'Member')
+    batch = []
+    for member in Member.objects.only('memberId', 'phone').iterator(chunk_size=2000):
+        member.phoneNormalized = re.sub(r'\D', '', member.phone or '')
+        batch.append(member)
+        if len(batch) >= 2000:
+            Member.objects.bulk_update(batch, ['phoneNormalized'])
+            batch = []
+    if batch:
+        Member.objects.bulk_update(batch, ['phoneNormalized'])
+
+
+# 42501 = insufficient_privilege, 58P01 = undefined_file (没装 contrib), 0A000 = feature_not_supported
+SKIPPABLE_SQLSTATES = {'42501', '58P01', '0A000'}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # V238 (可选): Postgres 上用 pg_trgm GIN 索引支持电话/邮箱/昵称的模糊搜索 (LIKE '%...%')
+    # 没有权限安装扩展或服务器上没有这个扩展时跳过并打印警告，搜索会退回普通查询；其他错误照常报出来
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic():
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            schema_editor.execute(
+                'CREATE INDEX IF NOT EXISTS member_phone_trgm_idx ON api_member '
+                'USING gin ("phoneNormalized" gin_trgm_ops)'
+            )
+            schema_editor.execute(
+                'CREATE INDEX IF NOT EXISTS member_email_trgm_idx ON api_member '
+                'USING gin ((UPPER("email"::text)) gin_trgm_ops)'
+            )
+            schema_editor.execute(
+                'CREATE INDEX IF NOT EXISTS member_nickname_trgm_idx ON api_member '
+                'USING gin ((UPPER("nickname"::text)) gin_trgm_ops)'
+            )
+    except (ProgrammingError, OperationalError, NotSupportedError) as e:
+        # psycopg 3 是 sqlstate，psycopg2 是 pgcode
+        sqlstate = getattr(e.__cause__, 'sqlstate', None) or getattr(e.__cause__, 'pgcode', None)
+        if sqlstate not in SKIPPABLE_SQLSTATES:
+            raise
+        print(f'\n  ⚠️ pg_trgm indexes skipped ({type(e).__name__}: {e}). Member search falls back to plain LIKE queries.')
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in ('member_phone_trgm_idx', 'member_email_trgm_idx', 'member_nickname_trgm_idx'):
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_daily_financial_rollup'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='member',
+            name='phoneNormalized',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+        migrations.RunPython(backfill_phone_normalized, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(fields=['phoneNormalized'], name='member_phone_norm_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:06
+
+from django.db import migrations, models
+
+
+def opt_in_agreed_members(apps, schema_editor):
+    # 条款第 3 条: 同意条款即同意在社交画廊公开展示
+    Member = apps.get_model('api', 'Member')
+    Member.objects.filter(isTermsAgreed=True, socialOptIn=False).update(socialOptIn=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_member_phone_search_index'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(opt_in_agreed_members, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='member',
+            index=models.Index(condition=models.Q(('socialOptIn', True), models.Q(('avatarUrl', ''), _negated=True)), fields=['-loyaltyPoints'], name='member_gallery_rank_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_member_gallery_rank_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboundEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('subject', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('fromEmail', models.CharField(blank=True, max_length=255)),
+                ('recipients', models.TextField()),
+                ('status', models.CharField(choices=[('PENDING', '等待发送'), ('SENT', '已发送'), ('DEAD', '发送失败 (已放弃)')], default='PENDING', max_length=10)),
+                ('attempts', models.IntegerField(default=0)),
+                ('nextAttemptAt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('lastError', models.TextField(blank=True)),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('sentAt', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'nextAttemptAt'], name='outbox_due_idx')],
+            },
+        ),
+    ]
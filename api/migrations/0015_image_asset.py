@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_outbound_email'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sourcePath', models.CharField(max_length=512, unique=True)),
+                ('kind', models.CharField(default='content', max_length=20)),
+                ('status', models.CharField(choices=[('PENDING', '等待处理'), ('READY', '已生成'), ('FAILED', '处理失败')], default='PENDING', max_length=10)),
+                ('variants', models.JSONField(blank=True, default=dict)),
+                ('attempts', models.IntegerField(default=0)),
+                ('nextAttemptAt', models.DateTimeField(default=django.utils.timezone.now)),
+                ('lastError', models.TextField(blank=True)),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('processedAt', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'nextAttemptAt'], name='imageasset_due_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:16
+
+import api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_image_asset'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='announcement',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=api.storage.media_storage, upload_to='announcements/'),
+        ),
+    ]
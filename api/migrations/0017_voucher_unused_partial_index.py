@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_announcement_cas_storage'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='voucher',
+            index=models.Index(condition=models.Q(('status', 'unused')), fields=['member', 'expiryDate'], name='voucher_unused_member_exp_idx'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_voucher_unused_partial_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='financialledger',
+            index=models.Index(fields=['timestamp', 'ledgerId'], name='ledger_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['timestamp', 'transactionId'], name='txn_ts_idx'),
+        ),
+    ]
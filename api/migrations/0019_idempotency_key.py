@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_export_timestamp_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('endpoint', models.CharField(max_length=100)),
+                ('key', models.CharField(max_length=255)),
+                ('requestHash', models.CharField(max_length=64)),
+                ('statusCode', models.PositiveSmallIntegerField(null=True)),
+                ('responseBody', models.JSONField(null=True)),
+                ('createdAt', models.DateTimeField(auto_now_add=True)),
+                ('expiresAt', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expiresAt'], name='idempotency_expires_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'endpoint', 'key'), name='idempotency_user_endpoint_key_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.8 on 2026-10-18 09:12
+
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, DecimalField, Sum, Value
+from django.db.models.functions import Abs, Coalesce, TruncDate
+
+
+def _aggregate(queryset, staff_field, points_field):
+    return (
+        queryset.annotate(day=TruncDate('timestamp'))
+        .order_by()
+        .values('day', 'type', staff_field)
+        .annotate(
+            total=Coalesce(Sum('amount'), Value(Decimal('0')), output_field=DecimalField()),
+            abs_total=Coalesce(Sum(Abs('amount')), Value(Decimal('0')), output_field=DecimalField()),
+            count=Count('pk'),
+            points=Coalesce(Sum(points_field), Value(0)) if points_field else Value(0),
+        )
+    )
+
+
+def backfill_daily_rollup(apps, schema_editor):
+    # V233: 0011 只建了表，之前的历史账本要汇总一次 (和 rollups.rebuild() 一样的 GROUP BY)
+    # 0011 之后由 signals 写入的汇总行也一起重建，重复运行结果不变
+    Transaction = apps.get_model('api', 'Transaction')
+    FinancialLedger = apps.get_model('api', 'FinancialLedger')
+    DailyFinancialRollup = apps.get_model('api', 'DailyFinancialRollup')
+
+    rows = []
+    for row in _aggregate(Transaction.objects.all(), 'staff', 'pointsEarned'):
+        rows.append(DailyFinancialRollup(
+            day=row['day'], source='TRANSACTION', type=row['type'], staff_id=row['staff'],
+            totalAmount=row['total'], absAmount=row['abs_total'],
+            txnCount=row['count'], pointsTotal=row['points'],
+        ))
+    for row in _aggregate(FinancialLedger.objects.all(), 'relatedTransaction__staff', None):
+        rows.append(DailyFinancialRollup(
+            day=row['day'], source='LEDGER', type=row['type'], staff_id=row['relatedTransaction__staff'],
+            totalAmount=row['total'], absAmount=row['abs_total'],
+            txnCount=row['count'], pointsTotal=0,
+        ))
+
+    DailyFinancialRollup.objects.all().delete()
+    DailyFinancialRollup.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_rollup, migrations.RunPython.noop),
+    ]
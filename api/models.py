@@ -3,6 +3,8 @@ from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, Permis
 from django.utils import timezone
 import uuid
 
+from .storage import media_storage
+
 # 
 # 1. 身份与权限 (V7)
 #
@@ -42,6 +44,8 @@ class Member(AbstractBaseUser, PermissionsMixin):
     memberId = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     email = models.EmailField(unique=True) 
     phone = models.CharField(max_length=50, unique=True) 
+    # 🚩 V238: 只含数字的电话 (save() 自动维护)，收银台按前缀搜索走索引
+    phoneNormalized = models.CharField(max_length=50, blank=True, editable=False)
     nickname = models.CharField(max_length=100, blank=True)
     dob = models.DateField(null=True, blank=True) 
 
@@ -81,6 +85,17 @@ class Member(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = 'email' 
     REQUIRED_FIELDS = ['phone', 'nickname'] 
+
+    class Meta:
+        indexes = [
+            # V238: 电话前缀搜索 (LIKE '9123%')；Postgres 用 varchar_pattern_ops 才能走索引
+            models.Index(fields=['phoneNormalized'], name='member_phone_norm_idx', opclasses=['varchar_pattern_ops']),
+            # V241: 社交画廊排行 (只索引有头像并且公开展示的会员)
+            models.Index(
+                fields=['-loyaltyPoints'], name='member_gallery_rank_idx',
+                condition=models.Q(socialOptIn=True) & ~models.Q(avatarUrl=''),
+            ),
+        ]
     
     # -----------------------------------------------
     # 🚩 V180 核心逻辑: 升级、保级与降级
@@ -89,8 +104,8 @@ class Member(AbstractBaseUser, PermissionsMixin):
     # api/models.py -> Member 类 -> update_member_level
 
     def update_member_level(self):
-        from .models import Level 
-        from django.utils import timezone
+        # 🚩 V235: 等级全部从进程内缓存的阶梯读取 (api/levels.py)，不再查询数据库
+        from .levels import get_ladder, get_level
         import datetime
 
         # 0. 员工不参与等级
@@ -99,45 +114,30 @@ class Member(AbstractBaseUser, PermissionsMixin):
             return
 
         today = timezone.now().date()
+        ladder = get_ladder()
+        current_level = get_level(self.level_id)
         
         # 初始化等级
-        if not self.level:
-            try:
-                self.level = Level.objects.get(levelName='Bronze')
-                self.levelExpiryDate = today + datetime.timedelta(days=365)
-            except Level.DoesNotExist:
+        if not current_level:
+            current_level = ladder.by_name('Bronze')
+            if not current_level:
                 return
-
-        all_levels = list(Level.objects.all().order_by('minPoints'))
+            self.level = current_level
+            self.levelExpiryDate = today + datetime.timedelta(days=365)
 
         # --- A. 检查过期 (结算日) ---
         if self.levelExpiryDate and today > self.levelExpiryDate:
-            # 结算：按当前分数值定级，然后清零
-            new_level = all_levels[0] # 默认 Bronze
-            for lvl in all_levels:
-                if self.lifetimePoints >= lvl.minPoints:
-                    new_level = lvl
-            
-            self.level = new_level
+            # 结算：按当前分数值定级 (达不到任何等级就是最低级 Bronze)，然后清零
+            self.level = ladder.for_points(self.lifetimePoints) or ladder.lowest()
             self.levelExpiryDate = today + datetime.timedelta(days=365)
             self.lifetimePoints = 0 # 结算日归零
             return 
 
         # --- B. 检查升级 (消费攒分升级) ---
-        # 逻辑：找出比当前等级高的级别中，目前积分能达到的最高级别
-        
-        current_level_points = self.level.minPoints
-        target_level = None
-
-        for lvl in all_levels:
-            # 只看比当前高级的
-            if lvl.minPoints > current_level_points:
-                # 如果手里的经验值够买这个等级
-                if self.lifetimePoints >= lvl.minPoints:
-                    target_level = lvl
-                # 注意：循环继续，以便找到能达到的最高级 (比如直接从 Bronze 跳到 Gold)
-
-        if target_level:
+        # 逻辑：目前积分能达到的最高级别，如果比当前等级高就升级
+        # (比如直接从 Bronze 跳到 Gold)
+        target_level = ladder.for_points(self.lifetimePoints)
+        if target_level and target_level.minPoints > current_level.minPoints:
             # 执行升级
             self.level = target_level
             self.levelExpiryDate = today + datetime.timedelta(days=365)
@@ -159,9 +159,27 @@ class Member(AbstractBaseUser, PermissionsMixin):
             self.is_staff = False
         elif self.role in ['CASHIER', 'STORE_MANAGER', 'ACCOUNT_MANAGER']:
             self.is_staff = True
+
+        # V238: 同步搜索用的电话号码
+        from .utils import normalize_phone
+        self.phoneNormalized = normalize_phone(self.phone)
         
         self.update_member_level() 
         super().save(*args, **kwargs)
+
+    # 🚩 V237 修复: 记住从数据库读出来时的等级字段，wallet.save_wallet() 只写入真正变化的等级字段
+    LEVEL_STATE_FIELDS = ('level_id', 'levelExpiryDate', 'lifetimePoints')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_level_state()
+        return instance
+
+    def remember_level_state(self):
+        loaded = self.__dict__
+        if all(f in loaded for f in self.LEVEL_STATE_FIELDS):  # .only() 没读的字段不算
+            self._level_state = {f: loaded[f] for f in self.LEVEL_STATE_FIELDS}
 # 
 # 2. 忠诚度与社交 (V11/V12)
 #
@@ -219,6 +237,13 @@ class VoucherType(models.Model):
         default=None 
     )
 
+    def get_voucher_expiry(self, now=None):
+        """ V236: 按模板计算新代金券的过期时间 (0 天 = 365 天) """
+        now = now or timezone.now()
+        if self.expiryDays <= 0:
+            return now + timezone.timedelta(days=365)
+        return now + timezone.timedelta(days=self.expiryDays)
+
     def __str__(self):
         return self.name
 
@@ -239,6 +264,15 @@ class Voucher(models.Model):
     
     usedDate = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            # V248: 会员钱包只看未使用的券 (部分索引，已用/过期的券不占索引空间)
+            models.Index(
+                fields=['member', 'expiryDate'], name='voucher_unused_member_exp_idx',
+                condition=models.Q(status='unused'),
+            ),
+        ]
+
     # 🚩 修复 V6 save() 逻辑和语法
     def save(self, *args, **kwargs):
         # 自动化 V7 蓝图 (0 天 = 365 天)
@@ -247,17 +281,8 @@ class Voucher(models.Model):
             try:
                 # 1. 强制从数据库获取 VoucherType (避免缓存)
                 voucher_type_instance = VoucherType.objects.get(pk=self.voucherType_id)
-                expiry_days = voucher_type_instance.expiryDays
-                
-                # 🚩 
-                # 🚩 终极修复：0 = 365
-                # 🚩
-                if expiry_days <= 0:
-                    # 2. 如果天数为 0 (或更少)，则设为 365 天
-                    self.expiryDate = timezone.now() + timezone.timedelta(days=365)
-                else:
-                    # 3. 否则 (例如 90)，则计算 90 天
-                    self.expiryDate = timezone.now() + timezone.timedelta(days=expiry_days)
+                # 2. 🚩 0 = 365 的规则统一放在 VoucherType.get_voucher_expiry() (V236)
+                self.expiryDate = voucher_type_instance.get_voucher_expiry()
             
             except VoucherType.DoesNotExist:
                 # (备用方案：如果模板被删了，默认给 90 天)
@@ -294,6 +319,14 @@ class Transaction(models.Model):
 
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # 🚩 V231: 会员交易记录游标分页 (member, timestamp, transactionId)
+            models.Index(fields=['member', '-timestamp', '-transactionId'], name='txn_member_ts_idx'),
+            # 🚩 V249: 按时间范围流式导出 / 报表明细
+            models.Index(fields=['timestamp', 'transactionId'], name='txn_ts_idx'),
+        ]
+
 #
 # 4. 商城 (V15)
 #
@@ -348,7 +381,8 @@ class Announcement(models.Model):
     
     # 🚩 V46 修复: 改用 ImageField，支持文件上传
     # (注意: 之前是 imageUrl = CharField, 现在删掉了)
-    image = models.ImageField(upload_to='announcements/', blank=True, null=True)
+    # 🚩 V246: 按内容寻址存储 (cas/ab/cd/<sha256>.jpg)，同一张图只存一份
+    image = models.ImageField(upload_to='announcements/', storage=media_storage, blank=True, null=True)
     
     # 🚩 V64 新增: 详情内容 (TextField 可以写很多字)
     content = models.TextField(blank=True, help_text="如果不填 Action URL，点击横幅将显示此内容")
@@ -406,5 +440,142 @@ class FinancialLedger(models.Model):
         blank=True
     )
 
+    class Meta:
+        indexes = [
+            # 🚩 V249: 按时间范围流式导出
+            models.Index(fields=['timestamp', 'ledgerId'], name='ledger_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"[{self.type}] {self.amount}"
+
+#
+# 7. 财务日报汇总 (V233)
+#
+class DailyFinancialRollup(models.Model):
+    """
+    V233 蓝图: 每日财务汇总表
+    按 (日期, 来源, 类型, 员工) 预先累加金额、笔数和积分。
+    - 写入 Transaction / FinancialLedger 时由 signals 增量更新
+    - `python manage.py rebuild_daily_rollup` 可以重建任意日期范围
+    报表读这里的几百行，而不是扫描整个账本。
+    (同一个 key 理论上可能出现多行，读取时一律用 SUM 聚合)
+    """
+    SOURCE_CHOICES = [
+        ('TRANSACTION', '会员交易 (Transaction)'),
+        ('LEDGER', '公司账本 (FinancialLedger)'),
+    ]
+
+    day = models.DateField()  # 当地日期 (TIME_ZONE)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)
+    type = models.CharField(max_length=20)  # Transaction.type 或 FinancialLedger.type
+    staff = models.ForeignKey(Member, on_delete=models.SET_NULL, null=True, blank=True, related_name='daily_rollups')
+
+    totalAmount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    absAmount = models.DecimalField(max_digits=14, decimal_places=2, default=0)  # 绝对值之和 (例如现金收入)
+    txnCount = models.IntegerField(default=0)
+    pointsTotal = models.BigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['source', 'day', 'type'], name='rollup_source_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"[{self.day}] {self.source}/{self.type} {self.totalAmount}"
+
+
+class OutboundEmail(models.Model):
+    """
+    V244 蓝图: 邮件发件箱 (Outbox)
+    视图只把邮件写进这张表就返回；`python manage.py send_outbox` 负责真正发送
+    (复用一个 SMTP 连接，失败按指数退避重试，超过次数进入 DEAD)。
+    SENT / DEAD 之后正文会被清空，旧行由 nightly_settlement 删除。
+    """
+    STATUS_CHOICES = [
+        ('PENDING', '等待发送'),
+        ('SENT', '已发送'),
+        ('DEAD', '发送失败 (已放弃)'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    fromEmail = models.CharField(max_length=255, blank=True)  # 空 = DEFAULT_FROM_EMAIL
+    recipients = models.TextField()  # 多个收件人用逗号分隔
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.IntegerField(default=0)
+    nextAttemptAt = models.DateTimeField(default=timezone.now)  # 下次可以尝试的时间 (也用来"领取")
+    lastError = models.TextField(blank=True)
+
+    createdAt = models.DateTimeField(auto_now_add=True)
+    sentAt = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'nextAttemptAt'], name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"[{self.status}] {self.subject} -> {self.recipients}"
+
+
+class ImageAsset(models.Model):
+    """
+    V245 蓝图: 上传图片的缩略图/压缩版本 (图片处理流水线)
+    每张上传的原图 (MEDIA_ROOT 里的相对路径) 一行；`python manage.py process_images` 在后台生成
+    thumb / card / full 三种尺寸的 WebP + JPEG (去掉 EXIF)，结果写在 variants 里:
+      {"thumb": {"width": 200, "height": 150, "webp": "derivatives/...webp", "jpeg": "derivatives/...jpg"}, ...}
+    """
+    STATUS_CHOICES = [
+        ('PENDING', '等待处理'),
+        ('READY', '已生成'),
+        ('FAILED', '处理失败'),
+    ]
+
+    sourcePath = models.CharField(max_length=512, unique=True)  # 相对 MEDIA_ROOT，例如 announcements/IMG_0002.JPG
+    kind = models.CharField(max_length=20, default='content')  # 'content' (横幅/商品) 或 'avatar'
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    variants = models.JSONField(default=dict, blank=True)
+    attempts = models.IntegerField(default=0)
+    nextAttemptAt = models.DateTimeField(default=timezone.now)
+    lastError = models.TextField(blank=True)
+
+    createdAt = models.DateTimeField(auto_now_add=True)
+    processedAt = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'nextAttemptAt'], name='imageasset_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"[{self.status}] {self.sourcePath}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    V255 蓝图: Idempotency-Key (客户端超时后可以放心重试)
+    每个 (用户, 接口, Key) 一行，和操作本身在同一个数据库事务里写入；
+    同一个 Key 再次请求时直接返回这里保存的响应，不再修改数据库。
+    过期的行由 `manage.py nightly_settlement` 清理。
+    """
+    user = models.ForeignKey(Member, on_delete=models.CASCADE, related_name='idempotency_keys')
+    endpoint = models.CharField(max_length=100)  # URL 名称，例如 admin-consume-balance
+    key = models.CharField(max_length=255)
+    requestHash = models.CharField(max_length=64)  # 同一个 Key 只能用于同一个请求 (路径 + 内容)
+    statusCode = models.PositiveSmallIntegerField(null=True)  # null = 还在处理中
+    responseBody = models.JSONField(null=True)
+    createdAt = models.DateTimeField(auto_now_add=True)
+    expiresAt = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'endpoint', 'key'], name='idempotency_user_endpoint_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['expiresAt'], name='idempotency_expires_idx'),
+        ]
+
     def __str__(self):
-        return f"[{self.type}] {self.amount}"
\ No newline at end of file
+        return f"{self.endpoint} {self.key} -> {self.statusCode}"
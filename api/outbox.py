@@ -0,0 +1,152 @@
+# 这是 api/outbox.py 文件的内容
+
+"""
+V244 蓝图: 邮件发件箱
+- enqueue(): 视图调用，只写一行 OutboundEmail，马上返回 (不连 SMTP)。
+- drain(): 由 `python manage.py send_outbox` 调用
+  1. 领取一批到期的邮件 (把 nextAttemptAt 往后推 LEASE_SECONDS，其他 worker 就不会重复领取)
+  2. 用同一个 SMTP 连接逐封发送
+  3. 成功 -> SENT；失败 -> attempts+1，按 backoff * 2^(attempts-1) 秒后重试；
+     达到 max_attempts -> DEAD
+- 邮件正文可能带敏感内容 (例如密码重置链接)，到 SENT / DEAD 就清空正文；
+  超过 OUTBOX_RETENTION (默认 30 天) 的 SENT / DEAD 行由 nightly_settlement 删除 (apps.py 里注册)。
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+LEASE_SECONDS = 300  # 领取后 5 分钟内没处理完 (例如 worker 崩溃)，会被重新领取
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF = 60  # 第一次重试等 60 秒，之后翻倍
+DEFAULT_RETENTION = timedelta(days=30)
+
+
+def get_retention():
+    return getattr(settings, 'OUTBOX_RETENTION', DEFAULT_RETENTION)
+
+
+def enqueue(subject, body, recipients, from_email=None):
+    """ 把邮件放进发件箱 (在当前数据库事务里，事务回滚时邮件也不会发出) """
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    return OutboundEmail.objects.create(
+        subject=subject,
+        body=body,
+        fromEmail=from_email or '',
+        recipients=','.join(recipients),
+    )
+
+
+def claim_batch(batch_size):
+    """ 领取一批到期的 PENDING 邮件 """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            OutboundEmail.objects.select_for_update(skip_locked=True)
+            .filter(status='PENDING', nextAttemptAt__lte=now)
+            .order_by('nextAttemptAt', 'id')[:batch_size]
+        )
+        if batch:
+            OutboundEmail.objects.filter(pk__in=[m.pk for m in batch]).update(
+                nextAttemptAt=now + timedelta(seconds=LEASE_SECONDS),
+            )
+    return batch
+
+
+def _to_message(item, connection):
+    return EmailMessage(
+        subject=item.subject,
+        body=item.body,
+        from_email=item.fromEmail or settings.DEFAULT_FROM_EMAIL,
+        to=[r for r in item.recipients.split(',') if r],
+        connection=connection,
+    )
+
+
+def _fail(item, error, max_attempts, backoff, stats):
+    """ 记一次失败: 还能重试就按退避时间重新排队，否则 DEAD """
+    item.attempts += 1
+    item.lastError = f'{type(error).__name__}: {error}'
+    if item.attempts >= max_attempts:
+        item.status = 'DEAD'
+        item.body = ''  # 🚩 放弃发送: 不再保留正文 (重置链接等)
+        stats['dead'] += 1
+    else:
+        item.nextAttemptAt = timezone.now() + timedelta(seconds=backoff * 2 ** (item.attempts - 1))
+        stats['retry'] += 1
+    item.save(update_fields=['attempts', 'lastError', 'status', 'nextAttemptAt', 'body'])
+
+
+def _close(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass  # 连接本来就坏了
+
+
+def drain(batch_size=50, max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=DEFAULT_BACKOFF, backend=None):
+    """
+    发送所有到期的邮件，返回 {'sent': n, 'retry': n, 'dead': n}
+    backend: 可以临时换成别的邮件后端 (例如 'django.core.mail.backends.console.EmailBackend')
+    连不上 SMTP 时，这一批剩下的邮件都记一次失败 (按退避时间重试)，然后停止，不再领取新的。
+    """
+    stats = {'sent': 0, 'retry': 0, 'dead': 0}
+    connection = None
+    try:
+        while True:
+            batch = claim_batch(batch_size)
+            if not batch:
+                break
+
+            for index, item in enumerate(batch):
+                if connection is None:
+                    # 有邮件要发时才连接 SMTP，之后复用这一个连接 (发送失败后重新连接)
+                    try:
+                        connection = get_connection(backend=backend, fail_silently=False)
+                        connection.open()
+                    except Exception as e:
+                        connection = None
+                        for rest in batch[index:]:
+                            _fail(rest, e, max_attempts, backoff, stats)
+                        return stats
+
+                try:
+                    connection.send_messages([_to_message(item, connection)])
+                except Exception as e:
+                    _fail(item, e, max_attempts, backoff, stats)
+                    # 连接可能已经坏了，下一封之前重新连接
+                    _close(connection)
+                    connection = None
+                else:
+                    item.status = 'SENT'
+                    item.attempts += 1
+                    item.sentAt = timezone.now()
+                    item.body = ''  # 🚩 已发送: 不再保留正文 (重置链接等)
+                    item.save(update_fields=['status', 'attempts', 'sentAt', 'body'])
+                    stats['sent'] += 1
+    finally:
+        if connection is not None:
+            _close(connection)
+    return stats
+
+
+def purge_old(now=None, chunk_size=1000, dry_run=False, progress=None):
+    """ 删除超过保留期的 SENT / DEAD 邮件 (每批一个短事务) """
+    now = now or timezone.now()
+    pending = OutboundEmail.objects.filter(status__in=('SENT', 'DEAD'), createdAt__lte=now - get_retention())
+    if dry_run:
+        return pending.count()
+
+    done = 0
+    while True:
+        ids = list(pending.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return done
+        done += OutboundEmail.objects.filter(pk__in=ids).delete()[0]
+        if progress:
+            progress('outbox', done)
@@ -0,0 +1,17 @@
+# 这是 api/pagination.py 文件的内容
+
+from rest_framework.pagination import CursorPagination
+
+
+class TransactionCursorPagination(CursorPagination):
+    """
+    V231 蓝图: 会员交易记录的游标分页 (Keyset)
+    - 按 (timestamp, transactionId) 倒序翻页，配合 Transaction 上的复合索引，
+      无论会员有多少条记录，每一页的代价都一样。
+    - 前端用返回的 'next' 链接继续加载下一页。
+    """
+    page_size = 20
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    # 🚩 transactionId 作为同一时间戳下的稳定排序依据
+    ordering = ('-timestamp', '-transactionId')
@@ -0,0 +1,132 @@
+# 这是 api/reconciliation.py 文件的内容
+
+"""
+V250 蓝图: 会员账本 (Transaction) 和公司账本 (FinancialLedger) 对账
+每一类"应该有公司账本"的交易写成一条 RULE:
+    RECHARGE      -> REVENUE_BALANCE  金额 = 充值金额
+    REDEEM_MERCH  -> REVENUE_STORE    金额 = 实付余额
+    REDEEM_MERCH  -> COST_OF_GOODS    金额 = -商品成本 (只有成本 > 0 的商品)
+    REWARD_ISSUE  -> COST_OF_GOODS    金额 = -商品成本 (只有成本 > 0 的商品)
+每条规则一次 GROUP BY 查询 (按当地日期)，在数据库里完成:
+  - missing:    没有对应类型公司账本的交易 (EXISTS 反连接)
+  - mismatched: 有账本，但账本金额合计 != 应有金额
+  - 应有金额合计 vs 实际账本金额合计
+另外一次查询找出没有关联交易的公司账本 (orphans)。
+注意: 成本按商品模板"现在"的 costOfGoods 计算，改过成本的商品旧交易会显示为 mismatched。
+"""
+from decimal import Decimal
+
+from django.db.models import (
+    Count, DecimalField, Exists, ExpressionWrapper, F, OuterRef, Q, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import FinancialLedger, Transaction
+from .utils import start_of_day
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+ZERO = Value(Decimal('0'), output_field=MONEY)
+EXAMPLE_LIMIT = 20
+
+# (交易类型, 公司账本类型, 应有金额表达式, 额外过滤条件)
+RULES = [
+    ('RECHARGE', 'REVENUE_BALANCE', F('amount'), Q()),
+    ('REDEEM_MERCH', 'REVENUE_STORE', -F('amount'), Q()),
+    ('REDEEM_MERCH', 'COST_OF_GOODS', -F('relatedVoucher__voucherType__costOfGoods'),
+     Q(relatedVoucher__voucherType__costOfGoods__gt=0)),
+    ('REWARD_ISSUE', 'COST_OF_GOODS', -F('relatedVoucher__voucherType__costOfGoods'),
+     Q(relatedVoucher__voucherType__costOfGoods__gt=0)),
+]
+
+
+def _date_range(queryset, date_from, date_to):
+    if date_from:
+        queryset = queryset.filter(timestamp__gte=start_of_day(date_from))
+    if date_to:
+        queryset = queryset.filter(timestamp__lt=start_of_day(date_to + timezone.timedelta(days=1)))
+    return queryset
+
+
+def _rule_queryset(txn_type, ledger_type, expected, condition, date_from, date_to):
+    """ 这条规则涉及的交易，每笔带上: 是否有账本 / 账本金额合计 / 应有金额 """
+    entries = FinancialLedger.objects.filter(relatedTransaction=OuterRef('pk'), type=ledger_type)
+    ledger_total = (
+        entries.order_by().values('relatedTransaction')
+        .annotate(total=Sum('amount')).values('total')
+    )
+    return (
+        _date_range(Transaction.objects.filter(condition, type=txn_type), date_from, date_to)
+        .annotate(
+            has_entry=Exists(entries),
+            ledger_amount=Coalesce(Subquery(ledger_total, output_field=MONEY), ZERO),
+            expected_amount=ExpressionWrapper(expected, output_field=MONEY),
+        )
+    )
+
+
+def _problem_filter():
+    return Q(has_entry=False) | ~Q(ledger_amount=F('expected_amount'))
+
+
+def reconcile(date_from=None, date_to=None, include_clean=False, examples=True):
+    """
+    返回:
+      {'from', 'to', 'ok', 'rules': [...汇总], 'days': [...按日期+规则], 'orphans': [...]}
+    include_clean=False 时 days 里只保留有问题的行。
+    """
+    rules, days = [], []
+    for txn_type, ledger_type, expected, condition in RULES:
+        qs = _rule_queryset(txn_type, ledger_type, expected, condition, date_from, date_to)
+        rows = list(
+            qs.annotate(day=TruncDate('timestamp'))
+            .order_by()
+            .values('day')
+            .annotate(
+                txn_count=Count('pk'),
+                missing=Count('pk', filter=Q(has_entry=False)),
+                mismatched=Count('pk', filter=Q(has_entry=True) & ~Q(ledger_amount=F('expected_amount'))),
+                expected_total=Coalesce(Sum('expected_amount'), ZERO),
+                ledger_total=Coalesce(Sum('ledger_amount'), ZERO),
+            )
+            .order_by('day')
+        )
+
+        summary = {
+            'type': txn_type,
+            'ledger_type': ledger_type,
+            'txn_count': sum(r['txn_count'] for r in rows),
+            'missing': sum(r['missing'] for r in rows),
+            'mismatched': sum(r['mismatched'] for r in rows),
+            'expected_total': sum((r['expected_total'] for r in rows), Decimal('0')),
+            'ledger_total': sum((r['ledger_total'] for r in rows), Decimal('0')),
+        }
+        if examples and (summary['missing'] or summary['mismatched']):
+            # 只取几个交易 ID 方便排查 (完整清单用 export_ledger 导出)
+            summary['examples'] = [
+                str(pk) for pk in qs.filter(_problem_filter())
+                .order_by('timestamp').values_list('pk', flat=True)[:EXAMPLE_LIMIT]
+            ]
+        rules.append(summary)
+
+        for r in rows:
+            if include_clean or r['missing'] or r['mismatched']:
+                days.append({'date': r['day'], 'type': txn_type, 'ledger_type': ledger_type, **{
+                    k: r[k] for k in ('txn_count', 'missing', 'mismatched', 'expected_total', 'ledger_total')
+                }})
+
+    # 规则覆盖的账本类型里，没有关联任何交易的记录
+    ledger_types = sorted({ledger_type for _, ledger_type, _, _ in RULES})
+    orphans = list(
+        _date_range(FinancialLedger.objects.filter(type__in=ledger_types, relatedTransaction__isnull=True), date_from, date_to)
+        .annotate(day=TruncDate('timestamp'))
+        .order_by()
+        .values('day', 'type')
+        .annotate(count=Count('pk'), total=Coalesce(Sum('amount'), ZERO))
+        .order_by('day', 'type')
+    )
+    orphans = [{'date': o['day'], 'ledger_type': o['type'], 'count': o['count'], 'total': o['total']} for o in orphans]
+
+    days.sort(key=lambda d: (d['date'], d['type'], d['ledger_type']))
+    ok = not orphans and not any(r['missing'] or r['mismatched'] for r in rules)
+    return {'from': date_from, 'to': date_to, 'ok': ok, 'rules': rules, 'days': days, 'orphans': orphans}
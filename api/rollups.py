@@ -0,0 +1,122 @@
+# 这是 api/rollups.py 文件的内容
+
+"""
+V233 蓝图: 每日财务汇总 (DailyFinancialRollup) 的增量更新与重建
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum, Count, Value, DecimalField, F
+from django.db.models.functions import Abs, Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import Transaction, FinancialLedger, DailyFinancialRollup
+from .utils import start_of_day
+
+
+def _add(day, source, type, staff_id, amount, points=0, count=1, abs_amount=None):
+    """ 把一笔 (或 count 笔) 记录累加到对应的汇总行 (不存在就新建) """
+    amount = Decimal(str(amount or 0))
+    abs_amount = abs(amount) if abs_amount is None else Decimal(str(abs_amount))
+    updated = DailyFinancialRollup.objects.filter(
+        day=day, source=source, type=type, staff_id=staff_id,
+    ).update(
+        totalAmount=F('totalAmount') + amount,
+        absAmount=F('absAmount') + abs_amount,
+        txnCount=F('txnCount') + count,
+        pointsTotal=F('pointsTotal') + (points or 0),
+    )
+    if not updated:
+        DailyFinancialRollup.objects.create(
+            day=day, source=source, type=type, staff_id=staff_id,
+            totalAmount=amount, absAmount=abs_amount, txnCount=count, pointsTotal=points or 0,
+        )
+
+
+def record_transaction(txn, sign=1):
+    """ 新的 Transaction 写入后调用 (与交易在同一个数据库事务里)；sign=-1 = 删除时扣回 """
+    amount = Decimal(str(txn.amount or 0))
+    _add(
+        timezone.localdate(txn.timestamp), 'TRANSACTION', txn.type,
+        txn.staff_id, sign * amount, sign * (txn.pointsEarned or 0), count=sign, abs_amount=sign * abs(amount),
+    )
+
+
+def record_transactions(txns):
+    """
+    V247: bulk_create 不会触发 post_save，批量写入的 Transaction 用这个汇总
+    (同一天/类型/员工合并成一次 UPDATE)
+    """
+    groups = {}
+    for txn in txns:
+        key = (timezone.localdate(txn.timestamp), txn.type, txn.staff_id)
+        total, abs_total, points, count = groups.get(key, (Decimal('0'), Decimal('0'), 0, 0))
+        amount = Decimal(str(txn.amount or 0))
+        groups[key] = (total + amount, abs_total + abs(amount), points + (txn.pointsEarned or 0), count + 1)
+    for (day, type, staff_id), (total, abs_total, points, count) in groups.items():
+        _add(day, 'TRANSACTION', type, staff_id, total, points, count=count, abs_amount=abs_total)
+
+
+def record_ledger(entry, sign=1):
+    """ 新的 FinancialLedger 写入后调用 (员工取自关联的 Transaction)；sign=-1 = 删除时扣回 """
+    staff_id = entry.relatedTransaction.staff_id if entry.relatedTransaction_id else None
+    amount = Decimal(str(entry.amount or 0))
+    _add(
+        timezone.localdate(entry.timestamp), 'LEDGER', entry.type, staff_id,
+        sign * amount, count=sign, abs_amount=sign * abs(amount),
+    )
+
+
+def _aggregate(queryset, staff_field, points_field):
+    """ 按 (当地日期, 类型, 员工) 分组聚合原始账本 """
+    return (
+        queryset.annotate(day=TruncDate('timestamp'))
+        .order_by()
+        .values('day', 'type', staff_field)
+        .annotate(
+            total=Coalesce(Sum('amount'), Value(Decimal('0')), output_field=DecimalField()),
+            abs_total=Coalesce(Sum(Abs('amount')), Value(Decimal('0')), output_field=DecimalField()),
+            count=Count('pk'),
+            points=Coalesce(Sum(points_field), Value(0)) if points_field else Value(0),
+        )
+    )
+
+
+def rebuild(date_from=None, date_to=None, batch_size=1000):
+    """
+    重建 [date_from, date_to] 范围内的汇总 (None = 不限)。
+    先删除该范围的汇总行，再用一次 GROUP BY 查询重新生成。
+    返回写入的汇总行数。
+    """
+    txn_qs = Transaction.objects.all()
+    ledger_qs = FinancialLedger.objects.all()
+    rollup_qs = DailyFinancialRollup.objects.all()
+
+    if date_from:
+        txn_qs = txn_qs.filter(timestamp__gte=start_of_day(date_from))
+        ledger_qs = ledger_qs.filter(timestamp__gte=start_of_day(date_from))
+        rollup_qs = rollup_qs.filter(day__gte=date_from)
+    if date_to:
+        end = start_of_day(date_to + timezone.timedelta(days=1))
+        txn_qs = txn_qs.filter(timestamp__lt=end)
+        ledger_qs = ledger_qs.filter(timestamp__lt=end)
+        rollup_qs = rollup_qs.filter(day__lte=date_to)
+
+    rows = []
+    for row in _aggregate(txn_qs, 'staff', 'pointsEarned'):
+        rows.append(DailyFinancialRollup(
+            day=row['day'], source='TRANSACTION', type=row['type'], staff_id=row['staff'],
+            totalAmount=row['total'], absAmount=row['abs_total'],
+            txnCount=row['count'], pointsTotal=row['points'],
+        ))
+    for row in _aggregate(ledger_qs, 'relatedTransaction__staff', None):
+        rows.append(DailyFinancialRollup(
+            day=row['day'], source='LEDGER', type=row['type'], staff_id=row['relatedTransaction__staff'],
+            totalAmount=row['total'], absAmount=row['abs_total'],
+            txnCount=row['count'], pointsTotal=0,
+        ))
+
+    with transaction.atomic():
+        rollup_qs.delete()
+        DailyFinancialRollup.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
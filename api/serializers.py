@@ -4,6 +4,8 @@ from django.utils import timezone # 🚩 1. 确保文件顶部有这一行导入
 from rest_framework import serializers
 # 🚩 V15 修复: 导入所有我们需要的模型
 from .models import Member, Level, Voucher, VoucherType, Transaction, RechargeTier, Reward_Points_Store, Reward_Balance_Store, Announcement 
+from .images import source_path_from_url, variant_map
+from .cashier import MAX_OPERATIONS
 # 🚩 1. 添加这一行新导入！
 
 #
@@ -33,7 +35,9 @@ class MemberRegisterSerializer(serializers.ModelSerializer):
         user = Member.objects.create_user(
             **validated_data,
             isTermsAgreed=True,
-            termsAgreedTime=timezone.now()
+            termsAgreedTime=timezone.now(),
+            # 🚩 V241: 条款第 3 条同意在社交画廊公开展示 (会员可以在资料里关闭)
+            socialOptIn=True
         )
         return user
 
@@ -94,6 +98,14 @@ class VoucherSerializer(serializers.ModelSerializer):
         model = Voucher
         fields = ['voucherId', 'voucherType', 'status', 'expiryDate']
 
+class VoucherGroupSerializer(serializers.Serializer):
+    """ V248: 代金券钱包汇总 (按模板分组，数据来自 vouchers.voucher_groups()) """
+    voucherTypeId = serializers.IntegerField(allow_null=True)
+    voucherType = VoucherTypeSerializer(allow_null=True)
+    count = serializers.IntegerField()
+    earliestExpiry = serializers.DateTimeField(allow_null=True)
+    nextVoucherId = serializers.UUIDField()
+
 class TransactionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Transaction
@@ -135,7 +147,32 @@ class AdminRedeemVoucherSerializer(serializers.Serializer):
         decimal_places=2, 
         required=False, # ⬅️ 不再必需
         default=0       # ⬅️ 默认为 0
-    ) 
+    )
+
+# 🚩 V254: 批量收银操作 (每种操作复用上面单个接口的验证器)
+CASHIER_OP_SERIALIZERS = {
+    'recharge': AdminRechargeSerializer,
+    'consume': AdminConsumeSerializer,
+    'track': AdminTrackSpendSerializer,
+    'redeem_voucher': AdminRedeemVoucherSerializer,
+}
+
+class CashierOperationSerializer(serializers.Serializer):
+    op = serializers.ChoiceField(choices=list(CASHIER_OP_SERIALIZERS))
+    memberId = serializers.UUIDField(required=False)
+    ref = serializers.CharField(max_length=64, required=False, allow_blank=True)
+
+    def validate(self, data):
+        fields = CASHIER_OP_SERIALIZERS[data['op']](data=self.initial_data)
+        fields.is_valid(raise_exception=True)
+        if data['op'] != 'redeem_voucher' and not data.get('memberId'):
+            raise serializers.ValidationError({'memberId': 'This field is required.'})
+        return {**data, **fields.validated_data}
+
+class CashierBatchSerializer(serializers.Serializer):
+    operations = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=MAX_OPERATIONS,
+    )
 
 class RechargeTierSerializer(serializers.ModelSerializer):
     """ V4 蓝图: 只读的充值档位 (用于前端显示) """
@@ -155,10 +192,15 @@ class PointsStoreItemSerializer(serializers.ModelSerializer):
     
     # 🚩 1. 覆盖 imageUrl 字段
     imageUrl = serializers.SerializerMethodField()
+    # 🚩 V245: 缩略图/压缩版本 {thumb, card, full} (还没生成时为 null)
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Reward_Points_Store
-        fields = ['id', 'name', 'description', 'imageUrl', 'pointsCost'] 
+        fields = ['id', 'name', 'description', 'imageUrl', 'images', 'pointsCost'] 
+
+    def get_images(self, obj):
+        return variant_map(self, obj, lambda o: source_path_from_url(o.imageUrl))
 
     # 🚩 2. 添加 'get' 方法
     def get_imageUrl(self, obj):
@@ -298,10 +340,15 @@ class RewardBalanceStoreAdminSerializer(serializers.ModelSerializer):
 # 1. 给会员用的 (只读，把图片转成链接)
 class AnnouncementSerializer(serializers.ModelSerializer):
     imageUrl = serializers.SerializerMethodField()
+    # 🚩 V245: 缩略图/压缩版本 {thumb, card, full} (还没生成时为 null)
+    images = serializers.SerializerMethodField()
 
     class Meta:
         model = Announcement
-        fields = ['id', 'title', 'content', 'imageUrl', 'actionUrl', 'displayOrder']
+        fields = ['id', 'title', 'content', 'imageUrl', 'images', 'actionUrl', 'displayOrder']
+
+    def get_images(self, obj):
+        return variant_map(self, obj, lambda o: o.image.name if o.image else None)
 
     def get_imageUrl(self, obj):
         if obj.image:
@@ -355,6 +402,8 @@ class BalanceStoreItemSerializer(serializers.ModelSerializer):
     
     # 🚩 1. 覆盖 imageUrl 字段
     imageUrl = serializers.SerializerMethodField()
+    # 🚩 V245: 缩略图/压缩版本 {thumb, card, full} (还没生成时为 null)
+    images = serializers.SerializerMethodField()
     
     class Meta:
         model = Reward_Balance_Store
@@ -363,6 +412,7 @@ class BalanceStoreItemSerializer(serializers.ModelSerializer):
             'name', 
             'description', 
             'imageUrl', # ⬅️ 现在是 SerializerMethodField
+            'images',
             'balancePrice',
             'linkedVoucherType_name',
             'isActive'
@@ -375,4 +425,7 @@ class BalanceStoreItemSerializer(serializers.ModelSerializer):
             if request:
                 return request.build_absolute_uri(obj.imageUrl)
             return obj.imageUrl
-        return None
\ No newline at end of file
+        return None
+
+    def get_images(self, obj):
+        return variant_map(self, obj, lambda o: source_path_from_url(o.imageUrl))
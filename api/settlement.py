@@ -0,0 +1,144 @@
+# 这是 api/settlement.py 文件的内容
+
+"""
+V247 蓝图: 每晚结算 (`python manage.py nightly_settlement`)
+1. 代金券过期: expiryDate 已过的 unused 券 -> expired
+2. 等级结算: levelExpiryDate 已过的会员按 lifetimePoints 重新定级，经验值清零，有效期再加一年
+   (规则和 Member.update_member_level() 的"结算日"分支一样)
+3. 余额过期: balanceExpiryDate 已过的余额清零，并记一笔 SYSTEM_ADJUST 交易 (报表可以对账)
+最后执行其他模块用 register_cleanup() 注册的清理任务 (例如过期的 Idempotency-Key)。
+
+每一步都是按条件分批的 UPDATE (每批一个数据库事务)，条件本身就是"还没处理的"，
+所以中途中断后重新运行会从剩下的继续，重复运行也不会重复处理。
+改过的会员会调用 invalidate_member()，各个 worker 缓存的 request.user 不会停留在结算前的余额/等级。
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Case, When, Value, IntegerField
+from django.utils import timezone
+
+from . import rollups
+from .authentication import invalidate_member
+from .caching import bump_version
+from .levels import get_ladder
+from .models import Member, Transaction, Voucher
+
+DEFAULT_CHUNK_SIZE = 1000
+STEPS = ('vouchers', 'levels', 'balances')
+
+# 其他模块的清理任务 {名称: runner(now, chunk_size, dry_run, progress) -> 数量}，在 AppConfig.ready() 里注册
+CLEANUPS = {}
+
+
+def register_cleanup(name, runner):
+    CLEANUPS[name] = runner
+
+
+def all_steps():
+    return STEPS + tuple(CLEANUPS)
+
+
+def _chunks(queryset, chunk_size):
+    """ 反复取"还没处理的"前 chunk_size 个主键，直到没有为止 """
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids
+
+
+def expire_vouchers(now=None, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, progress=None):
+    now = now or timezone.now()
+    pending = Voucher.objects.filter(status='unused', expiryDate__lt=now)
+    if dry_run:
+        return pending.count()
+
+    done = 0
+    for ids in _chunks(pending, chunk_size):
+        with transaction.atomic():
+            done += Voucher.objects.filter(pk__in=ids, status='unused').update(status='expired')
+        if progress:
+            progress('vouchers', done)
+    return done
+
+
+def settle_levels(today=None, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, progress=None):
+    today = today or timezone.now().date()
+    pending = Member.objects.filter(role='MEMBER', levelExpiryDate__lt=today)
+    if dry_run:
+        return pending.count()
+
+    ladder = get_ladder()
+    lowest = ladder.lowest()
+    if lowest is None:
+        return 0
+
+    # 按 lifetimePoints 定级: 从高到低第一个达到 minPoints 的等级，都达不到就是最低级
+    new_level = Case(
+        *[When(lifetimePoints__gte=level.minPoints, then=Value(level.pk)) for level in reversed(ladder.levels)],
+        default=Value(lowest.pk),
+        output_field=IntegerField(),
+    )
+
+    done = 0
+    for ids in _chunks(pending, chunk_size):
+        with transaction.atomic():
+            done += Member.objects.filter(pk__in=ids, levelExpiryDate__lt=today).update(
+                level=new_level,
+                levelExpiryDate=today + datetime.timedelta(days=365),
+                lifetimePoints=0,
+            )
+        for pk in ids:
+            invalidate_member(pk)
+        if progress:
+            progress('levels', done)
+
+    if done:
+        bump_version('gallery')  # 画廊显示等级名称
+    return done
+
+
+def expire_balances(today=None, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, progress=None):
+    today = today or timezone.now().date()
+    pending = Member.objects.filter(balance__gt=0, balanceExpiryDate__lt=today)
+    if dry_run:
+        return pending.count()
+
+    done = 0
+    for ids in _chunks(pending, chunk_size):
+        with transaction.atomic():
+            # 锁住这一批，读取要清零的金额 (期间收银机充值/消费会等这批结束)
+            rows = list(
+                Member.objects.select_for_update()
+                .filter(pk__in=ids, balance__gt=0, balanceExpiryDate__lt=today)
+                .values_list('pk', 'balance')
+            )
+            if not rows:
+                continue
+            Member.objects.filter(pk__in=[pk for pk, _ in rows]).update(balance=0, balanceExpiryDate=None)
+            txns = Transaction.objects.bulk_create([
+                Transaction(member_id=pk, type='SYSTEM_ADJUST', amount=-balance, pointsEarned=0)
+                for pk, balance in rows
+            ])
+            rollups.record_transactions(txns)
+            done += len(rows)
+        for pk, _ in rows:
+            invalidate_member(pk)
+        if progress:
+            progress('balances', done)
+    return done
+
+
+def run(steps=None, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False, progress=None):
+    """ 按顺序执行各个步骤 (默认全部)，返回 {step: 数量} """
+    steps = all_steps() if steps is None else steps
+    now = timezone.now()
+    runners = {
+        'vouchers': lambda: expire_vouchers(now, chunk_size, dry_run, progress),
+        'levels': lambda: settle_levels(now.date(), chunk_size, dry_run, progress),
+        'balances': lambda: expire_balances(now.date(), chunk_size, dry_run, progress),
+    }
+    for name, runner in CLEANUPS.items():
+        runners[name] = lambda runner=runner: runner(now, chunk_size, dry_run, progress)
+    return {step: runners[step]() for step in all_steps() if step in steps}
@@ -0,0 +1,78 @@
+# 这是 api/signals.py 文件的内容
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import (
+    Member, Level, Transaction, FinancialLedger, VoucherType, Reward_Points_Store, Reward_Balance_Store,
+    Announcement,
+)
+from . import authentication, caching, images, levels, rollups
+
+
+# 🚩 V233: 新的账本记录写入时，增量更新每日汇总
+# (在同一个数据库事务里执行，交易回滚时汇总也一起回滚)
+@receiver(post_save, sender=Transaction)
+def transaction_rollup(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.record_transaction(instance)
+
+
+@receiver(post_save, sender=FinancialLedger)
+def ledger_rollup(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.record_ledger(instance)
+
+
+# 🚩 删除账本记录时从汇总里扣回 (账本在后台只读，不能修改金额，见 admin.py)
+@receiver(post_delete, sender=Transaction)
+def transaction_rollup_delete(sender, instance, **kwargs):
+    rollups.record_transaction(instance, sign=-1)
+
+
+@receiver(post_delete, sender=FinancialLedger)
+def ledger_rollup_delete(sender, instance, **kwargs):
+    rollups.record_ledger(instance, sign=-1)
+
+
+# 🚩 V235: 等级规则变化时，清空进程内的等级阶梯缓存
+@receiver(post_save, sender=Level)
+@receiver(post_delete, sender=Level)
+def level_ladder_invalidate(sender, **kwargs):
+    levels.invalidate()
+
+
+# 🚩 V239: 商城商品或代金券模板变化时，让商城缓存失效
+# (兑换时只改库存 stockCount，商城页面不显示库存，不需要失效)
+@receiver(post_save, sender=Reward_Points_Store)
+@receiver(post_save, sender=Reward_Balance_Store)
+@receiver(post_save, sender=VoucherType)
+@receiver(post_delete, sender=Reward_Points_Store)
+@receiver(post_delete, sender=Reward_Balance_Store)
+@receiver(post_delete, sender=VoucherType)
+def catalogue_invalidate(sender, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'stockCount'}:
+        return
+    caching.bump_version('catalogue')
+
+
+# 🚩 V240: 公告变化时，让会员端的公告缓存失效
+@receiver(post_save, sender=Announcement)
+@receiver(post_delete, sender=Announcement)
+def announcement_invalidate(sender, **kwargs):
+    caching.bump_version('announcements')
+
+
+# 🚩 V245: 后台上传的横幅图片 (Announcement.image) 登记到图片处理队列
+@receiver(post_save, sender=Announcement)
+def announcement_image_enqueue(sender, instance, raw=False, **kwargs):
+    if instance.image and not raw:
+        images.enqueue(instance.image.name)
+
+
+# 🚩 V242: 会员资料/角色/密码变化时，让所有 worker 的认证缓存失效
+@receiver(post_save, sender=Member)
+@receiver(post_delete, sender=Member)
+def member_auth_invalidate(sender, instance, raw=False, **kwargs):
+    if not raw:
+        authentication.invalidate_member(instance.pk)
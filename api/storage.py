@@ -0,0 +1,161 @@
+# 这是 api/storage.py 文件的内容
+
+"""
+V246 蓝图: 按内容寻址的媒体存储 (去重)
+- 上传时一边读一边算 SHA-256，文件名就是内容的哈希:
+    cas/ab/cd/abcdef...1234.jpg
+  同一张图片上传多少次都只存一份，文件名永远不会指向别的内容，
+  所以可以用 Cache-Control: immutable 长期缓存。
+- 哪些字段引用了媒体文件写在 MEDIA_REFERENCES 里；
+  `python manage.py gc_media` 找出没有任何引用的文件 (孤儿) 并删除。
+- 旧的 announcements/ store_points/ ... 文件保持原样，不会被清理。
+"""
+import hashlib
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.views.static import serve
+
+CAS_DIR = 'cas'
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+GC_GRACE_SECONDS = 60 * 60 * 24  # 刚上传还没保存到商品/公告里的文件，一天内不清理
+
+# (app_label.Model, 字段名, 字段里存的是 URL 还是相对路径)
+MEDIA_REFERENCES = [
+    ('api.Announcement', 'image', 'path'),
+    ('api.Reward_Points_Store', 'imageUrl', 'url'),
+    ('api.Reward_Balance_Store', 'imageUrl', 'url'),
+    ('api.Member', 'avatarUrl', 'url'),
+]
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """ 文件名 = 内容的 SHA-256 (只保留原来的扩展名) """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('location', settings.MEDIA_ROOT)
+        kwargs.setdefault('base_url', settings.MEDIA_URL)
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def hashed_name(digest, ext):
+        return f'{CAS_DIR}/{digest[:2]}/{digest[2:4]}/{digest}{ext}'
+
+    def save(self, name, content, max_length=None):
+        ext = os.path.splitext(name or '')[1].lower()[:10]
+        tmp_dir = self.path(f'{CAS_DIR}/.tmp')
+        os.makedirs(tmp_dir, exist_ok=True)
+
+        # 边写临时文件边算哈希 (大文件也不会整个读进内存)
+        sha = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                if hasattr(content, 'seek'):
+                    content.seek(0)
+                for chunk in content.chunks():
+                    sha.update(chunk)
+                    tmp.write(chunk)
+
+            final_name = self.hashed_name(sha.hexdigest(), ext)
+            final_path = self.path(final_name)
+            if os.path.exists(final_path):
+                # 已经有一模一样的文件: 不再存第二份
+                os.remove(tmp_path)
+                os.utime(final_path)  # 刷新时间，避免被 GC 当成旧的孤儿文件
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                if self.file_permissions_mode is not None:
+                    os.chmod(tmp_path, self.file_permissions_mode)
+                os.replace(tmp_path, final_path)  # 同一个文件系统内是原子操作
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return final_name
+
+
+def media_storage():
+    """ 上传接口和 Announcement.image 使用的存储 """
+    return ContentAddressedStorage()
+
+
+def _relative_path(value, kind):
+    if not value:
+        return None
+    if kind == 'path':
+        return str(value)
+    from .images import source_path_from_url
+    return source_path_from_url(value)
+
+
+def referenced_paths():
+    """ 数据库里所有被引用的媒体文件 (相对 MEDIA_ROOT 的路径) """
+    from django.apps import apps
+
+    paths = set()
+    for model_label, field, kind in MEDIA_REFERENCES:
+        model = apps.get_model(model_label)
+        for value in model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).values_list(field, flat=True).iterator():
+            path = _relative_path(value, kind)
+            if path:
+                paths.add(path)
+    return paths
+
+
+def collect_garbage(dry_run=False, grace_seconds=GC_GRACE_SECONDS):
+    """
+    删除 cas/ 里没有被任何记录引用、并且超过 grace_seconds 的文件，
+    以及它们的缩略图 (derivatives/) 和 ImageAsset 记录。
+    返回 {'checked', 'deleted', 'bytes'}
+    """
+    from .images import DERIVATIVE_DIR
+    from .models import ImageAsset
+
+    storage = media_storage()
+    referenced = referenced_paths()
+    cutoff = time.time() - grace_seconds
+    stats = {'checked': 0, 'deleted': 0, 'bytes': 0}
+    orphans = []
+
+    root = storage.path(CAS_DIR)
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d != '.tmp']
+        for filename in filenames:
+            full_path = os.path.join(dirpath, filename)
+            name = os.path.relpath(full_path, settings.MEDIA_ROOT).replace(os.sep, '/')
+            stats['checked'] += 1
+            if name in referenced or os.path.getmtime(full_path) > cutoff:
+                continue
+            orphans.append(name)
+            stats['deleted'] += 1
+            stats['bytes'] += os.path.getsize(full_path)
+
+    if not dry_run:
+        for name in orphans:
+            storage.delete(name)
+            derivative_dir = storage.path(f'{DERIVATIVE_DIR}/{name}')
+            if os.path.isdir(derivative_dir):
+                for f in os.listdir(derivative_dir):
+                    os.remove(os.path.join(derivative_dir, f))
+                os.rmdir(derivative_dir)
+        ImageAsset.objects.filter(sourcePath__in=orphans).delete()
+
+        # 上传中断留下的临时文件
+        tmp_dir = storage.path(f'{CAS_DIR}/.tmp')
+        if os.path.isdir(tmp_dir):
+            for f in os.listdir(tmp_dir):
+                tmp_path = os.path.join(tmp_dir, f)
+                if os.path.getmtime(tmp_path) < cutoff:
+                    os.remove(tmp_path)
+    return stats
+
+
+def serve_immutable(request, path, document_root=None, show_indexes=False):
+    """ 开发服务器用: 内容寻址的文件永远不会变，浏览器可以缓存一年 """
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    response['Cache-Control'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return response
@@ -0,0 +1,378 @@
+# 这是 api/synthetic.py 文件的内容
+
+"""
+V252 蓝图: 可复现的模拟数据 (压测 / 基准测试用)
+- 同一个 seed 生成的数据完全一样 (UUID 也由随机数生成)，不同次的测试结果才能对比。
+- 全部 bulk_create: 不走 create_user / Member.save() (不逐个算密码哈希、不逐个查等级)，
+  所有会员共用一个预先算好的密码哈希 (SHARED_PASSWORD)。
+- 交易时间分布在过去 years 年里；bulk_create 不触发 signals，最后统一重建每日财务汇总。
+只能在空的 / 测试用的数据库里运行，不要对生产库执行。
+
+V253: 大数据量 (`python manage.py generate_loyalty_data`)
+- 会员的 UUID / 电话 / email 只由 (seed, 序号) 决定，所以数据可以分片给多个进程并行生成，
+  每个分片用自己的随机数 (seed + 分片号)，各进程不需要共享会员列表。
+- PostgreSQL 上用 COPY 写入 (write_rows)，比 bulk_create 的 INSERT 快很多；其他数据库用 bulk_create。
+"""
+import contextlib
+import datetime
+import hashlib
+import io
+import itertools
+import operator
+import random
+import uuid
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.utils import timezone
+
+from . import levels, rollups
+from .models import (
+    FinancialLedger, Level, Member, RechargeTier, Reward_Balance_Store, Reward_Points_Store,
+    Transaction, Voucher, VoucherType,
+)
+
+SHARED_PASSWORD = 'loadtest123!'
+DEFAULT_LEVELS = [('Bronze', 0, '1.0'), ('Silver', 500, '1.2'), ('Gold', 1500, '1.5'), ('Platinum', 5000, '2.0')]
+STAFF_ROLES = ['CASHIER', 'CASHIER', 'STORE_MANAGER', 'ACCOUNT_MANAGER']
+
+# 交易类型的大致比例 (现场消费为主)
+TXN_MIX = [
+    ('CONSUME_CASH', 40), ('CONSUME_BALANCE', 25), ('RECHARGE', 10),
+    ('CONSUME_VOUCHER', 10), ('REWARD_ISSUE', 8), ('REDEEM_MERCH', 7),
+]
+_TXN_TYPES = [t for t, _ in TXN_MIX]
+_TXN_CUM_WEIGHTS = list(itertools.accumulate(w for _, w in TXN_MIX))
+CASHIER_TYPES = {'CONSUME_CASH', 'CONSUME_BALANCE', 'RECHARGE', 'CONSUME_VOUCHER'}
+
+# 电话号码用 0 开头 (真实号码不会以 0 开头)，不会和已有会员冲突
+MEMBER_PHONE_PREFIX = '09'
+STAFF_PHONE_PREFIX = '08'
+LOADTEST_DOMAIN = 'loadtest.lluvia.app'
+
+
+def member_uuid(seed, index, prefix='m'):
+    """ 第 index 个模拟会员的 UUID (任何进程算出来都一样) """
+    digest = hashlib.blake2b(f'{seed}:{prefix}:{index}'.encode(), digest_size=16).digest()
+    return uuid.UUID(bytes=digest, version=4)
+
+
+class Generator:
+    """ 所有随机数都来自同一个 random.Random(seed)；shard 不同的生成器互不重复 """
+
+    def __init__(self, seed=42, now=None, shard=None):
+        self.seed = seed
+        self.rng = random.Random(seed if shard is None else f'{seed}:{shard}')
+        self.now = now or timezone.now()
+
+    def uuid(self):
+        return uuid.UUID(int=self.rng.getrandbits(128), version=4)
+
+    def money(self, low, high):
+        return Decimal(self.rng.randint(low * 100, high * 100)) / 100
+
+    def past(self, days):
+        """ 过去 days 天里的随机时间 """
+        return self.now - datetime.timedelta(seconds=self.rng.randint(0, days * 86400))
+
+    def points(self):
+        """ 积分是长尾分布: 大部分人很少，少数人很多 """
+        return int(min(self.rng.paretovariate(1.2) * 80, 50000))
+
+    def txn_type(self):
+        return self.rng.choices(_TXN_TYPES, cum_weights=_TXN_CUM_WEIGHTS)[0]
+
+
+@contextlib.contextmanager
+def backdating(*models):
+    """ 暂时关掉 auto_now_add，bulk_create 才能写入过去的时间 """
+    fields = [f for model in models for f in model._meta.concrete_fields if getattr(f, 'auto_now_add', False)]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def ensure_catalogue():
+    """ 等级、代金券模板、商城商品、充值档位 (已经有就直接用) """
+    if not Level.objects.exists():
+        Level.objects.bulk_create([
+            Level(levelName=name, minPoints=points, pointMultiplier=Decimal(mult))
+            for name, points, mult in DEFAULT_LEVELS
+        ])
+        levels.invalidate()
+
+    if not VoucherType.objects.exists():
+        VoucherType.objects.bulk_create([
+            VoucherType(name='$10 Off', value=10, threshold=50, expiryDays=90, costOfGoods=0),
+            VoucherType(name='$25 Off', value=25, threshold=100, expiryDays=90, costOfGoods=0),
+            VoucherType(name='Free Cocktail', value=0, threshold=0, expiryDays=30, costOfGoods=Decimal('4.50')),
+            VoucherType(name='T-Shirt', value=0, threshold=0, expiryDays=0, costOfGoods=Decimal('12.00')),
+        ])
+    voucher_types = list(VoucherType.objects.order_by('id'))
+    merch = [vt for vt in voucher_types if vt.costOfGoods and vt.costOfGoods > 0] or voucher_types
+
+    if not Reward_Points_Store.objects.exists():
+        Reward_Points_Store.objects.bulk_create([
+            Reward_Points_Store(name=f'{vt.name} (points)', pointsCost=200 * (i + 1), linkedVoucherType=vt)
+            for i, vt in enumerate(voucher_types)
+        ])
+    if not Reward_Balance_Store.objects.exists():
+        Reward_Balance_Store.objects.bulk_create([
+            Reward_Balance_Store(name=f'{vt.name} (shop)', balancePrice=Decimal(20 + 10 * i), linkedVoucherType=vt)
+            for i, vt in enumerate(merch)
+        ])
+    if not RechargeTier.objects.exists():
+        RechargeTier.objects.bulk_create([
+            RechargeTier(amount=amount, grantVoucherType=voucher_types[0], grantVoucherCount=count)
+            for amount, count in [(300, 3), (500, 5), (1000, 10)]
+        ])
+    return voucher_types
+
+
+def build_members(gen, indexes, ladder, password_hash, prefix='m'):
+    """ 序号在 indexes 里的会员 (不写数据库)。电话号码按序号生成，保证唯一 """
+    members = []
+    for i in indexes:
+        lifetime = gen.points()
+        level = ladder.for_points(lifetime) or ladder.lowest()
+        phone = f"{MEMBER_PHONE_PREFIX if prefix == 'm' else STAFF_PHONE_PREFIX}{i:08d}"
+        created = gen.past(3 * 365)
+        members.append(Member(
+            memberId=member_uuid(gen.seed, i, prefix),
+            email=f'{prefix}{i}@{LOADTEST_DOMAIN}',
+            phone=phone,
+            phoneNormalized=phone,
+            nickname=f'{"Member" if prefix == "m" else "Staff"} {i}',
+            password=password_hash,
+            role='MEMBER',
+            level=level,
+            levelExpiryDate=(gen.now + datetime.timedelta(days=gen.rng.randint(1, 365))).date(),
+            loyaltyPoints=gen.points(),
+            lifetimePoints=lifetime,
+            balance=gen.money(0, 800) if gen.rng.random() < 0.6 else Decimal('0'),
+            balanceExpiryDate=(gen.now + datetime.timedelta(days=365)).date(),
+            isTermsAgreed=True,
+            termsAgreedTime=created,
+            socialOptIn=gen.rng.random() < 0.3,
+            createdAt=created,
+        ))
+    return members
+
+
+def build_staff(gen, count, password_hash):
+    staff = build_members(gen, range(count), levels.LevelLadder([]), password_hash, prefix='s')
+    for i, member in enumerate(staff):
+        member.role = STAFF_ROLES[i % len(STAFF_ROLES)]
+        member.is_staff = True
+        member.level = None
+        member.loyaltyPoints = member.lifetimePoints = 0
+        member.balance = Decimal('0')
+    return staff
+
+
+def build_transaction(gen, member_id, staff_ids, voucher_types, days):
+    """ 一笔交易 + 它应有的公司账本 (列表) """
+    txn_type = gen.txn_type()
+    voucher_type = gen.rng.choice(voucher_types)
+    amount, points, ledger = Decimal('0'), 0, []
+    if txn_type == 'RECHARGE':
+        amount = Decimal(gen.rng.choice([300, 500, 1000]))
+    elif txn_type in ('CONSUME_CASH', 'CONSUME_BALANCE'):
+        amount = -gen.money(8, 250)
+        points = int(-amount)
+    elif txn_type == 'CONSUME_VOUCHER':
+        amount = -gen.money(50, 200)
+    elif txn_type == 'REWARD_ISSUE':
+        points = -200 * gen.rng.randint(1, 4)
+    elif txn_type == 'REDEEM_MERCH':
+        amount = -Decimal(gen.rng.choice([20, 30, 40]))
+        points = int(-amount)
+
+    txn = Transaction(
+        transactionId=gen.uuid(),
+        member_id=member_id,
+        type=txn_type,
+        amount=amount,
+        pointsEarned=points,
+        staff_id=gen.rng.choice(staff_ids) if txn_type in CASHIER_TYPES and staff_ids else None,
+        timestamp=gen.past(days),
+    )
+    # 和视图写入的规则一致 (见 api/reconciliation.py)
+    if txn_type == 'REDEEM_MERCH':
+        ledger.append(FinancialLedger(
+            ledgerId=gen.uuid(), type='REVENUE_STORE', amount=-amount, timestamp=txn.timestamp,
+            description='Revenue (synthetic)', relatedTransaction_id=txn.transactionId,
+        ))
+    if txn_type in ('REDEEM_MERCH', 'REWARD_ISSUE') and voucher_type.costOfGoods:
+        ledger.append(FinancialLedger(
+            ledgerId=gen.uuid(), type='COST_OF_GOODS', amount=-voucher_type.costOfGoods,
+            timestamp=txn.timestamp, description='Cost (synthetic)',
+            relatedMember_id=member_id, relatedTransaction_id=txn.transactionId,
+        ))
+    return txn, ledger
+
+
+def build_voucher(gen, member_id, voucher_type):
+    issued = gen.past(365)
+    expiry = issued + datetime.timedelta(days=voucher_type.expiryDays if voucher_type.expiryDays > 0 else 365)
+    status = gen.rng.choices(['unused', 'used', 'expired'], weights=[50, 40, 10])[0]
+    if status == 'unused' and expiry < gen.now:
+        status = 'expired'
+    return Voucher(
+        voucherId=gen.uuid(), member_id=member_id, voucherType=voucher_type, status=status,
+        issueDate=issued, expiryDate=expiry, usedDate=issued if status == 'used' else None,
+    )
+
+
+def seed(members=1000, staff=8, transactions=20000, vouchers=3000, years=2, seed=42, batch_size=2000):
+    """
+    生成一套完整的数据，返回各表写入的行数。
+    (更大的数据量用 `python manage.py generate_loyalty_data`)
+    """
+    gen = Generator(seed)
+    voucher_types = ensure_catalogue()
+    ladder = levels.get_ladder()
+    password_hash = make_password(SHARED_PASSWORD)  # 只算一次
+
+    staff_rows = build_staff(gen, staff, password_hash)
+    member_rows = build_members(gen, range(members), ladder, password_hash)
+    with backdating(Member, Transaction, FinancialLedger, Voucher):
+        Member.objects.bulk_create(staff_rows + member_rows, batch_size=batch_size)
+        member_ids = [m.memberId for m in member_rows]
+        staff_ids = [m.memberId for m in staff_rows]
+
+        txn_count = ledger_count = 0
+        for start in range(0, transactions, batch_size):
+            txns, ledger = [], []
+            for _ in range(min(batch_size, transactions - start)):
+                txn, entries = build_transaction(gen, gen.rng.choice(member_ids), staff_ids, voucher_types, years * 365)
+                txns.append(txn)
+                ledger.extend(entries)
+            Transaction.objects.bulk_create(txns, batch_size=batch_size)
+            FinancialLedger.objects.bulk_create(ledger, batch_size=batch_size)
+            txn_count += len(txns)
+            ledger_count += len(ledger)
+
+        voucher_rows = [build_voucher(gen, gen.rng.choice(member_ids), gen.rng.choice(voucher_types)) for _ in range(vouchers)]
+        Voucher.objects.bulk_create(voucher_rows, batch_size=batch_size)
+
+    rollups.rebuild()
+    return {
+        'members': len(member_rows), 'staff': len(staff_rows), 'transactions': txn_count,
+        'ledger': ledger_count, 'vouchers': len(voucher_rows),
+    }
+
+
+# -----------------------------------------------
+# V253: 大数据量写入 (COPY / bulk_create) 和分片
+# -----------------------------------------------
+
+def copy_supported():
+    return connection.vendor == 'postgresql'
+
+
+def _copy_text(value):
+    """ psycopg2 的 COPY ... CSV: NULL 不加引号，其他值都加引号 """
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        value = 't' if value else 'f'
+    return '"' + str(value).replace('"', '""') + '"'
+
+
+def write_rows(model, objs, method='bulk', batch_size=5000):
+    """ 把一批模型实例写入数据库: method='copy' (PostgreSQL COPY) 或 'bulk' (bulk_create) """
+    if not objs:
+        return 0
+    if method != 'copy':
+        model.objects.bulk_create(objs, batch_size=batch_size)
+        return len(objs)
+
+    fields = model._meta.concrete_fields
+    columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+    sql = f'COPY {connection.ops.quote_name(model._meta.db_table)} ({columns}) FROM STDIN'
+    # 模拟数据只有 UUID / Decimal / datetime / str / int / bool，驱动可以直接转换，
+    # 不逐个字段调用 get_db_prep_save (每行能省几十微秒)
+    row_of = operator.attrgetter(*[f.attname for f in fields])
+    rows = (row_of(obj) for obj in objs)
+
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        if hasattr(raw, 'copy'):  # psycopg 3
+            with raw.copy(sql) as copy:
+                for row in rows:
+                    copy.write_row(row)
+        else:  # psycopg2
+            buffer = io.StringIO()
+            for row in rows:
+                buffer.write(','.join(_copy_text(v) for v in row) + '\n')
+            buffer.seek(0)
+            raw.copy_expert(sql + ' WITH (FORMAT csv)', buffer)
+    return len(objs)
+
+
+def _prepare_worker(fast):
+    """ 每个分片开始前: PostgreSQL 上关掉同步提交 (模拟数据丢了可以重新生成) """
+    if fast and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SET synchronous_commit TO OFF')
+
+
+def generate_members(seed, shard, start, stop, password_hash, method, batch_size, fast=False):
+    """ 分片: 序号 [start, stop) 的会员 """
+    _prepare_worker(fast)
+    gen = Generator(seed, shard=f'm{shard}')
+    ladder = levels.get_ladder()
+    written = 0
+    with backdating(Member):
+        for batch_start in range(start, stop, batch_size):
+            rows = build_members(gen, range(batch_start, min(stop, batch_start + batch_size)), ladder, password_hash)
+            written += write_rows(Member, rows, method, batch_size)
+    return written
+
+
+def generate_transactions(seed, shard, count, member_range, staff_ids, years, method, batch_size, fast=False):
+    """ 分片: count 笔交易 (和对应的公司账本)，会员从 member_range 里随机选 """
+    _prepare_worker(fast)
+    gen = Generator(seed, shard=f't{shard}')
+    voucher_types = list(VoucherType.objects.order_by('id'))
+    first, last = member_range
+    txn_count = ledger_count = 0
+    with backdating(Transaction, FinancialLedger):
+        for batch_start in range(0, count, batch_size):
+            txns, ledger = [], []
+            for _ in range(min(batch_size, count - batch_start)):
+                member_id = member_uuid(seed, gen.rng.randrange(first, last))
+                txn, entries = build_transaction(gen, member_id, staff_ids, voucher_types, years * 365)
+                txns.append(txn)
+                ledger.extend(entries)
+            txn_count += write_rows(Transaction, txns, method, batch_size)
+            ledger_count += write_rows(FinancialLedger, ledger, method, batch_size)
+    return txn_count, ledger_count
+
+
+def generate_vouchers(seed, shard, count, member_range, method, batch_size, fast=False):
+    """ 分片: count 张代金券 """
+    _prepare_worker(fast)
+    gen = Generator(seed, shard=f'v{shard}')
+    voucher_types = list(VoucherType.objects.order_by('id'))
+    first, last = member_range
+    written = 0
+    with backdating(Voucher):
+        for batch_start in range(0, count, batch_size):
+            rows = [
+                build_voucher(gen, member_uuid(seed, gen.rng.randrange(first, last)), gen.rng.choice(voucher_types))
+                for _ in range(min(batch_size, count - batch_start))
+            ]
+            written += write_rows(Voucher, rows, method, batch_size)
+    return written
+
+
+def existing_synthetic_members():
+    """ 已经生成过的模拟会员数量 (再次运行时从这个序号往后接着生成) """
+    return Member.objects.filter(role='MEMBER', email__endswith=f'@{LOADTEST_DOMAIN}').count()
@@ -1,3 +1,488 @@
-from django.test import TestCase
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import authentication, caching, cashier, idempotency, metrics, outbox, settlement, throttling, wallet
+from .models import (
+    DailyFinancialRollup, IdempotencyKey, Level, Member, OutboundEmail, RechargeTier, Transaction, Voucher, VoucherType,
+)
+from .vouchers import issue_vouchers
+
+
+@override_settings(THROTTLE_BACKEND='local', THROTTLE_RATES={
+    'password_reset.ip': '2/hour',
+    'password_reset.account': '50/hour',
+    'password_reset.endpoint': '10/hour',
+})
+class ThrottleTests(TestCase):
+    """ V243: 令牌桶限流 """
+
+    def setUp(self):
+        throttling.get_store()._buckets.clear()
+        self.client = APIClient()
+
+    def reset(self, ip, email='someone@example.com'):
+        return self.client.post('/api/auth/password/reset/', {'email': email}, format='json', REMOTE_ADDR=ip)
+
+    def test_ip_limit(self):
+        self.assertEqual(self.reset('10.0.0.1').status_code, 200)
+        self.assertEqual(self.reset('10.0.0.1').status_code, 200)
+        response = self.reset('10.0.0.1')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response.headers)
+
+    def test_ip_throttled_client_cannot_drain_endpoint_bucket(self):
+        # 100 次请求里只有 2 次通过 IP 桶；被拒绝的 98 次不能扣共用的接口桶 (10/hour)
+        statuses = [self.reset('10.0.0.1').status_code for _ in range(100)]
+        self.assertEqual(statuses.count(200), 2)
+        self.assertEqual(statuses.count(429), 98)
+
+        # 另一个 IP 不受影响
+        self.assertEqual(self.reset('10.0.0.2', 'victim@example.com').status_code, 200)
+
+    def test_ip_throttled_client_cannot_drain_account_bucket(self):
+        with self.settings(THROTTLE_RATES={'password_reset.ip': '2/hour', 'password_reset.account': '3/hour'}):
+            for _ in range(20):
+                self.reset('10.0.0.1', 'victim@example.com')
+            # 账号桶只被扣了 2 次，本人从别的 IP 还能请求
+            self.assertEqual(self.reset('10.0.0.2', 'victim@example.com').status_code, 200)
+
+    def test_endpoint_limit_applies_to_everyone(self):
+        for i in range(10):
+            self.assertEqual(self.reset(f'10.0.1.{i}').status_code, 200)
+        self.assertEqual(self.reset('10.0.2.1').status_code, 429)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """ V242: 进程内的 Token 缓存 """
+
+    def setUp(self):
+        authentication._entries.clear()
+        self.member = Member.objects.create_user('auth@example.com', '91110000', 'pw12345!', nickname='Auth')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.member).key)
+
+    def test_cache_hit_skips_stamp_check_within_ttl(self):
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        with mock.patch.object(caching, 'get_version', wraps=caching.get_version) as get_version:
+            self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        get_version.assert_not_called()
+
+    def test_stamp_change_invalidates_after_ttl(self):
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        Member.objects.filter(pk=self.member.pk).update(is_active=False)
+        authentication.invalidate_member(self.member.pk)
+        with mock.patch.object(authentication, 'AUTH_STAMP_TTL', 0):
+            self.assertEqual(self.client.get('/api/profile/').status_code, 401)
+
+    def test_settlement_invalidates_cached_user(self):
+        yesterday = timezone.localdate() - timezone.timedelta(days=1)
+        Member.objects.filter(pk=self.member.pk).update(balance=Decimal('50'), balanceExpiryDate=yesterday)
+        key = Token.objects.get(user=self.member).key
+        auth = authentication.CachedTokenAuthentication()
+        self.assertEqual(auth.authenticate_credentials(key)[0].balance, Decimal('50'))
+        self.assertEqual(settlement.run(steps=('balances',)), {'balances': 1})
+        with mock.patch.object(authentication, 'AUTH_STAMP_TTL', 0):
+            self.assertEqual(auth.authenticate_credentials(key)[0].balance, Decimal('0'))
+
+
+class DownBackend(BaseEmailBackend):
+    """ SMTP 服务器连不上 """
+
+    def open(self):
+        raise ConnectionRefusedError('smtp down')
+
+    def send_messages(self, messages):
+        raise AssertionError('not connected')
+
+
+class FlakyBackend(LocmemBackend):
+    """ 第一封发送失败，之后正常 (重新连接也正常) """
+    failures = 0
+
+    def send_messages(self, messages):
+        if FlakyBackend.failures == 0:
+            FlakyBackend.failures += 1
+            raise OSError('connection reset')
+        return super().send_messages(messages)
+
+
+class OutboxTests(TestCase):
+    """ V244: 邮件发件箱 """
+
+    def setUp(self):
+        for i in range(3):
+            outbox.enqueue(f'Subject {i}', 'body', [f'user{i}@example.com'])
+
+    def test_connect_failure_reschedules_whole_batch(self):
+        stats = outbox.drain(backend='api.tests.DownBackend', backoff=60)
+        self.assertEqual(stats, {'sent': 0, 'retry': 3, 'dead': 0})
+        for item in OutboundEmail.objects.all():
+            self.assertEqual(item.status, 'PENDING')
+            self.assertEqual(item.attempts, 1)
+            self.assertIn('smtp down', item.lastError)
+            self.assertGreater(item.nextAttemptAt, timezone.now() + timezone.timedelta(seconds=50))
+
+    def test_connect_failure_counts_toward_max_attempts(self):
+        stats = outbox.drain(backend='api.tests.DownBackend', max_attempts=1)
+        self.assertEqual(stats['dead'], 3)
+        self.assertEqual(OutboundEmail.objects.filter(status='DEAD').count(), 3)
+
+    def test_send_failure_reconnects_and_continues(self):
+        FlakyBackend.failures = 0
+        stats = outbox.drain(backend='api.tests.FlakyBackend')
+        self.assertEqual(stats, {'sent': 2, 'retry': 1, 'dead': 0})
+        self.assertEqual(len(mail.outbox), 2)
+
+    def test_body_cleared_after_sent_or_dead(self):
+        outbox.drain(backend='api.tests.DownBackend', max_attempts=1)
+        outbox.enqueue('Reset', 'secret link', ['user9@example.com'])
+        outbox.drain()
+        self.assertEqual(mail.outbox[0].body, 'secret link')
+        self.assertEqual(set(OutboundEmail.objects.values_list('status', 'body')), {('DEAD', ''), ('SENT', '')})
+
+    def test_purge_old_rows(self):
+        outbox.drain(backend='api.tests.DownBackend', max_attempts=1)
+        outbox.enqueue('Later', 'body', ['user9@example.com'])
+        OutboundEmail.objects.update(createdAt=timezone.now() - timezone.timedelta(days=31))
+        self.assertIn('outbox', settlement.all_steps())
+        self.assertEqual(settlement.run(steps=('outbox',)), {'outbox': 3})
+        self.assertEqual(list(OutboundEmail.objects.values_list('status', flat=True)), ['PENDING'])
+
+
+@override_settings(METRICS_BACKEND='cache')
+class MetricsTests(TestCase):
+    """ V251: 接口性能指标 """
+
+    def test_publish_failure_does_not_fail_request(self):
+        metrics.registry._published = 0
+        with mock.patch.object(metrics.cache, 'set', side_effect=ConnectionError('cache down')), \
+                self.assertLogs('api.metrics', 'ERROR'):
+            response = self.client.get('/api/admin/metrics')
+        self.assertEqual(response.status_code, 401)
+
+
+class WalletTests(TestCase):
+    """ V237: 钱包服务 (带条件的 UPDATE / 只写变化的字段) """
+
+    def setUp(self):
+        self.bronze = Level.objects.create(levelName='Bronze', minPoints=0, pointMultiplier=1)
+        self.gold = Level.objects.create(levelName='Gold', minPoints=1500, pointMultiplier='1.5')
+        self.member = Member.objects.create_user('wallet@example.com', '91110001', 'pw12345!', nickname='Old')
+        Member.objects.filter(pk=self.member.pk).update(loyaltyPoints=50)
+
+    def test_adjust_points_insufficient(self):
+        member = Member.objects.get(pk=self.member.pk)
+        with self.assertRaisesMessage(wallet.WalletError, 'Insufficient points. Need 100.'):
+            wallet.adjust_points(member, -100)
+        self.assertEqual(Member.objects.get(pk=member.pk).loyaltyPoints, 50)
+
+        self.assertEqual(wallet.adjust_points(member, -30), 20)
+        self.assertEqual(Member.objects.get(pk=member.pk).loyaltyPoints, 20)
+
+    def test_claim_voucher_twice(self):
+        voucher_type = VoucherType.objects.create(name='Tee', value=0, threshold=0, expiryDays=0, costOfGoods=5)
+        voucher = issue_vouchers(self.member, voucher_type)[0]
+        first, second = Voucher.objects.get(pk=voucher.pk), Voucher.objects.get(pk=voucher.pk)
+
+        wallet.claim_voucher(first)
+        with self.assertRaisesMessage(wallet.WalletError, 'Voucher already used.'):
+            wallet.claim_voucher(second)
+        self.assertEqual(Voucher.objects.get(pk=voucher.pk).status, 'used')
+
+    def test_save_wallet_keeps_unrelated_fields(self):
+        member = Member.objects.get(pk=self.member.pk)
+        # 别的请求在这期间改了昵称和等级
+        Member.objects.filter(pk=member.pk).update(nickname='New', level=self.gold)
+
+        member.balance += Decimal('10')
+        wallet.save_wallet(member, 'balance')
+
+        fresh = Member.objects.get(pk=member.pk)
+        self.assertEqual(fresh.balance, Decimal('10'))
+        self.assertEqual(fresh.nickname, 'New')
+        self.assertEqual(fresh.level_id, self.gold.pk)
+
+    def test_save_wallet_writes_changed_level_fields(self):
+        member = Member.objects.get(pk=self.member.pk)
+        member.lifetimePoints += 1600
+        wallet.save_wallet(member, 'loyaltyPoints')
+
+        fresh = Member.objects.get(pk=member.pk)
+        self.assertEqual(fresh.level_id, self.gold.pk)
+        self.assertEqual(fresh.lifetimePoints, 100)  # 升级扣掉 minPoints
+
+
+class CashierBatchTests(TestCase):
+    """ V254: 批量收银操作 """
+    url = '/api/admin/cashier/batch/'
+
+    def setUp(self):
+        Level.objects.create(levelName='Bronze', minPoints=0, pointMultiplier=1)
+        self.staff = Member.objects.create_user('cashier@example.com', '80000001', 'pw12345!', nickname='Till', role='CASHIER')
+        self.alice = Member.objects.create_user('alice@example.com', '91110002', 'pw12345!', nickname='Alice')
+        self.bob = Member.objects.create_user('bob@example.com', '91110003', 'pw12345!', nickname='Bob')
+        Member.objects.filter(pk=self.alice.pk).update(balance=100)
+        self.discount = VoucherType.objects.create(name='$10 Off', value=10, threshold=50, expiryDays=90, costOfGoods=0)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.staff).key)
+
+    def batch(self, *operations):
+        return self.client.post(self.url, {'operations': list(operations)}, format='json')
+
+    def op(self, op, member=None, **fields):
+        return {'op': op, **({'memberId': str(member.pk)} if member else {}), **fields}
+
+    def test_failed_operation_changes_nothing(self):
+        response = self.batch(
+            self.op('consume', self.alice, amount='30'),
+            self.op('consume', self.alice, amount='1000'),
+            self.op('track', self.bob, amount='20'),
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], [200, 400, 200])
+        self.assertEqual(results[1]['error'], 'Insufficient balance. Need $1000.00.')
+        self.assertEqual((response.json()['succeeded'], response.json()['failed']), (2, 1))
+
+        alice = Member.objects.get(pk=self.alice.pk)
+        self.assertEqual(alice.balance, Decimal('70'))
+        self.assertEqual(alice.loyaltyPoints, 30)
+        self.assertEqual(
+            sorted(Transaction.objects.values_list('type', 'amount')),
+            [('CONSUME_BALANCE', Decimal('-30')), ('CONSUME_CASH', Decimal('-20'))],
+        )
+
+    def test_operations_on_same_member_accumulate(self):
+        response = self.batch(
+            self.op('consume', self.alice, amount='10'),
+            self.op('consume', self.alice, amount='20', ref='second'),
+            self.op('track', self.alice, amount='40'),
+        )
+        results = response.json()['results']
+        self.assertTrue(all(r['ok'] for r in results))
+        self.assertEqual(Decimal(str(results[1]['new_balance'])), Decimal('70'))
+        self.assertEqual(results[1]['ref'], 'second')
+        self.assertEqual(results[2]['new_total_points'], 70)
+
+        alice = Member.objects.get(pk=self.alice.pk)
+        self.assertEqual(alice.balance, Decimal('70'))
+        self.assertEqual(alice.loyaltyPoints, 70)
+        self.assertEqual(alice.lifetimePoints, 70)
+        self.assertEqual(Transaction.objects.filter(member=alice).count(), 3)
+
+    def test_voucher_used_once_per_batch(self):
+        voucher = issue_vouchers(self.alice, self.discount)[0]
+        response = self.batch(
+            self.op('redeem_voucher', voucher_id=str(voucher.pk), bill_amount='60'),
+            self.op('redeem_voucher', voucher_id=str(voucher.pk), bill_amount='60'),
+        )
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], [200, 400])
+        self.assertEqual(results[1]['error'], 'Voucher already used.')
+        self.assertEqual(Voucher.objects.get(pk=voucher.pk).status, 'used')
+        self.assertEqual(Member.objects.get(pk=self.alice.pk).loyaltyPoints, 50)
+
+    def test_expired_voucher_status_is_saved(self):
+        voucher = issue_vouchers(self.alice, self.discount)[0]
+        Voucher.objects.filter(pk=voucher.pk).update(expiryDate=timezone.now() - timezone.timedelta(days=1))
+
+        response = self.batch(self.op('redeem_voucher', voucher_id=str(voucher.pk), bill_amount='60'))
+        result = response.json()['results'][0]
+        self.assertEqual((result['status'], result['error']), (400, 'Voucher is expired.'))
+        self.assertEqual(Voucher.objects.get(pk=voucher.pk).status, 'expired')
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_recharge_grants_vouchers(self):
+        tier = RechargeTier.objects.create(amount=200, grantVoucherType=self.discount, grantVoucherCount=3)
+        response = self.batch(self.op('recharge', self.bob, tier_id=tier.pk), self.op('recharge', self.bob, tier_id=999))
+        self.assertEqual([r['status'] for r in response.json()['results']], [200, 404])
+        self.assertEqual(Member.objects.get(pk=self.bob.pk).balance, Decimal('200'))
+        self.assertEqual(Voucher.objects.filter(member=self.bob).count(), 3)
+
+    def test_daily_rollup_updated(self):
+        self.batch(
+            self.op('consume', self.alice, amount='10'),
+            self.op('consume', self.alice, amount='15.50'),
+            self.op('track', self.bob, amount='20'),
+        )
+        today = timezone.localdate()
+        rollup = DailyFinancialRollup.objects.get(day=today, source='TRANSACTION', type='CONSUME_BALANCE', staff=self.staff)
+        self.assertEqual((rollup.totalAmount, rollup.absAmount, rollup.txnCount, rollup.pointsTotal),
+                         (Decimal('-25.50'), Decimal('25.50'), 2, 25))
+        rollup = DailyFinancialRollup.objects.get(day=today, source='TRANSACTION', type='CONSUME_CASH', staff=self.staff)
+        self.assertEqual((rollup.totalAmount, rollup.txnCount), (Decimal('-20'), 1))
+
+    def test_invalid_operations_reported_individually(self):
+        response = self.batch(self.op('consume', amount='5'), {'op': 'bogus'}, self.op('track', self.bob, amount='5'))
+        results = response.json()['results']
+        self.assertEqual([r['status'] for r in results], [400, 400, 200])
+        self.assertIn('memberId', results[0]['details'])
+
+    def test_operation_cap(self):
+        ops = [self.op('track', self.bob, amount='1')] * cashier.MAX_OPERATIONS
+        response = self.batch(*ops)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['succeeded'], cashier.MAX_OPERATIONS)
+        self.assertEqual(Member.objects.get(pk=self.bob.pk).loyaltyPoints, cashier.MAX_OPERATIONS)
+
+        self.assertEqual(self.batch(*ops, ops[0]).status_code, 400)
+        self.assertEqual(self.batch().status_code, 400)
+
+    def test_staff_only(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.alice).key)
+        response = client.post(self.url, {'operations': [self.op('track', self.alice, amount='5')]}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+class IdempotencyTests(TestCase):
+    """ V255: Idempotency-Key """
+
+    def setUp(self):
+        Level.objects.create(levelName='Bronze', minPoints=0, pointMultiplier=1)
+        self.staff = Member.objects.create_user('till1@example.com', '80000011', 'pw12345!', nickname='Till 1', role='CASHIER')
+        self.other_staff = Member.objects.create_user('till2@example.com', '80000012', 'pw12345!', nickname='Till 2', role='CASHIER')
+        self.member = Member.objects.create_user('carol@example.com', '91110011', 'pw12345!', nickname='Carol')
+        Member.objects.filter(pk=self.member.pk).update(balance=100)
+        self.client = self.client_for(self.staff)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=user).key)
+        return client
+
+    def consume(self, amount='10', key='key-1', client=None, url='consume'):
+        headers = {'HTTP_IDEMPOTENCY_KEY': key} if key else {}
+        return (client or self.client).post(f'/api/admin/{url}/{self.member.pk}/', {'amount': amount}, format='json', **headers)
+
+    def balance(self):
+        return Member.objects.get(pk=self.member.pk).balance
+
+    def test_replay_returns_stored_response_without_changes(self):
+        first = self.consume()
+        second = self.consume()
+        self.assertEqual(first.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', first.headers)
+        self.assertEqual(second.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.assertEqual(self.balance(), Decimal('90'))
+
+    def test_business_errors_are_replayed(self):
+        self.assertEqual(self.consume('1000').status_code, 400)
+        Member.objects.filter(pk=self.member.pk).update(balance=5000)
+        replay = self.consume('1000')
+        self.assertEqual(replay.status_code, 400)
+        self.assertEqual(replay.headers['Idempotent-Replayed'], 'true')
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_different_request_with_same_key(self):
+        self.consume('10')
+        response = self.consume('20')
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_server_error_rolls_back_key(self):
+        with mock.patch.object(cashier, 'run', side_effect=RuntimeError('database down')):
+            self.assertEqual(self.consume().status_code, 500)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        retry = self.consume()
+        self.assertEqual(retry.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', retry.headers)
+        self.assertEqual(self.balance(), Decimal('90'))
+
+    def test_exception_rolls_back_key(self):
+        self.assertEqual(self.consume('not-a-number').status_code, 400)  # ValidationError 从视图里抛出
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_expired_key_is_new(self):
+        self.consume()
+        IdempotencyKey.objects.update(expiresAt=timezone.now())
+        again = self.consume()
+        self.assertEqual(again.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', again.headers)
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_keys_are_scoped_per_user_and_endpoint(self):
+        self.consume()
+        self.assertNotIn('Idempotent-Replayed', self.consume(client=self.client_for(self.other_staff)).headers)
+        self.assertNotIn('Idempotent-Replayed', self.consume(url='track').headers)
+        self.assertEqual(Transaction.objects.count(), 3)
+        self.assertEqual(IdempotencyKey.objects.filter(key='key-1').count(), 3)
+
+    def test_without_header(self):
+        self.consume(key=None)
+        self.consume(key=None)
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    def test_invalid_key(self):
+        self.assertEqual(self.consume(key='x' * 300).status_code, 400)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_batch_endpoint(self):
+        body = {'operations': [
+            {'op': 'consume', 'memberId': str(self.member.pk), 'amount': '10'},
+            {'op': 'track', 'memberId': str(self.member.pk), 'amount': '5'},
+        ]}
+        first = self.client.post('/api/admin/cashier/batch/', body, format='json', HTTP_IDEMPOTENCY_KEY='batch-1')
+        second = self.client.post('/api/admin/cashier/batch/', body, format='json', HTTP_IDEMPOTENCY_KEY='batch-1')
+        self.assertEqual(first.json()['succeeded'], 2)
+        self.assertEqual(second.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(Transaction.objects.count(), 2)
+        self.assertEqual(self.balance(), Decimal('90'))
+
+    def test_purge_expired(self):
+        self.consume()
+        self.consume(key='key-2', amount='5')
+        IdempotencyKey.objects.filter(key='key-1').update(expiresAt=timezone.now())
+        self.assertEqual(idempotency.purge_expired(), 1)
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['key-2'])
+
+    def test_purge_registered_with_nightly_settlement(self):
+        self.consume()
+        IdempotencyKey.objects.update(expiresAt=timezone.now())
+        self.assertIn('idempotency_keys', settlement.all_steps())
+        self.assertEqual(settlement.run(steps=('idempotency_keys',)), {'idempotency_keys': 1})
+
+
+class FinancialReportTests(TestCase):
+    """ V233: 每日财务汇总 + 财务报表 """
+    url = '/api/admin/reports/'
+
+    def setUp(self):
+        self.staff = Member.objects.create_user('report@example.com', '80000021', 'pw12345!', nickname='Boss', role='CASHIER')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION='Token ' + Token.objects.create(user=self.staff).key)
+        for amount in (10, 20, 30):
+            Transaction.objects.create(staff=self.staff, type='RECHARGE', amount=amount)
+
+    def test_delete_updates_rollup(self):
+        Transaction.objects.filter(amount=20).delete()
+        rollup = DailyFinancialRollup.objects.get(source='TRANSACTION', type='RECHARGE')
+        self.assertEqual((rollup.totalAmount, rollup.absAmount, rollup.txnCount), (Decimal('40'), Decimal('40'), 2))
+
+    def test_rows_are_capped(self):
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.data['recharges']), 3)
+        self.assertFalse(response.data['rows_truncated'])
+
+        with mock.patch('api.views.FinancialReportView.MAX_ROWS', 2):
+            response = self.client.get(self.url, {'rows': 100})
+        self.assertEqual([row['amount'] for row in response.data['recharges']], [30.0, 20.0])
+        self.assertTrue(response.data['rows_truncated'])
+        self.assertEqual(response.data['by_type']['RECHARGE']['count'], 3)
+
+        response = self.client.get(self.url, {'rows': 0})
+        self.assertNotIn('recharges', response.data)
@@ -0,0 +1,129 @@
+# 这是 api/throttling.py 文件的内容
+
+"""
+V243 蓝图: 令牌桶限流 (登录 / 重置密码 / 老虎机)
+- 视图设置 throttle_scope (例如 'login')，再挂上 THROTTLE_CLASSES。
+- 三种维度: 按 IP、按账号、按接口 (所有人共用一个桶)，按这个顺序检查，被拒绝的请求不再扣后面的桶。
+- 速率写在 settings.THROTTLE_RATES 里，例如 'login.ip': '20/min'
+  = 桶里最多 20 个令牌，每分钟补满；没配置速率的维度不限流。
+- DRF 在进入视图的 post() 之前检查限流，超限直接 429 (带 Retry-After)，
+  不会再去算密码哈希、发邮件或写数据库。
+- 后端: 'cache' (共享 Django 缓存，所有 worker 共用一个桶，默认) 或 'local' (进程内)。
+  'cache' 在默认的文件缓存上只是尽力而为 (key 可能被随机淘汰)；设置 REDIS_URL 后才是可靠的 (见 settings.CACHES)。
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+KEY_PREFIX = 'lluvia:throttle'
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    """ '20/min' -> (20, 60) ; '5/10min' 也可以 -> (5, 600) """
+    count, period = rate.split('/')
+    digits = ''.join(ch for ch in period if ch.isdigit())
+    unit = period[len(digits):]
+    return int(count), int(digits or 1) * PERIODS[unit]
+
+
+def _take(state, capacity, period, now):
+    """
+    令牌桶: 按经过的时间补充令牌，再取一个。
+    返回 (新的状态, 是否允许, 需要等待的秒数)
+    """
+    tokens, updated = state if state else (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * capacity / period)
+    if tokens >= 1:
+        return (tokens - 1, now), True, 0
+    return (tokens, now), False, (1 - tokens) * period / capacity
+
+
+class LocalBucketStore:
+    """ 进程内的桶 (单进程开发环境 / 测试用) """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, capacity, period):
+        now = time.monotonic()
+        with self._lock:
+            state, allowed, wait = _take(self._buckets.get(key), capacity, period, now)
+            self._buckets[key] = state
+        return allowed, wait
+
+
+class CacheBucketStore:
+    """
+    共享 Django 缓存里的桶 (所有 gunicorn worker 共用)。
+    读-改-写不是原子的，并发时最多多放过几个请求，对限流来说够用了。
+    """
+
+    def take(self, key, capacity, period):
+        now = time.time()
+        state, allowed, wait = _take(cache.get(key), capacity, period, now)
+        cache.set(key, state, period)
+        return allowed, wait
+
+
+_stores = {'local': LocalBucketStore(), 'cache': CacheBucketStore()}
+
+
+def get_store():
+    return _stores[getattr(settings, 'THROTTLE_BACKEND', 'cache')]
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    按 IP -> 账号 -> 接口 的顺序依次检查，第一个超限就停下，后面的桶不扣令牌。
+    (DRF 会调用每个 throttle 类的 allow_request()，即使前面的已经拒绝；
+     如果分成三个类，被 IP 限流的客户端仍然会耗光账号桶和所有人共用的接口桶)
+    """
+    kinds = ('ip', 'account', 'endpoint')
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return True
+
+        rates = getattr(settings, 'THROTTLE_RATES', {})
+        for kind in self.kinds:
+            rate = rates.get(f'{scope}.{kind}')
+            if not rate:
+                continue  # 没配置速率的维度不限流
+            ident = getattr(self, f'get_{kind}_ident')(request)
+            if ident is None:
+                continue
+
+            capacity, period = parse_rate(rate)
+            allowed, wait = get_store().take(f'{KEY_PREFIX}:{scope}.{kind}:{ident}', capacity, period)
+            if not allowed:
+                self.wait_seconds = wait
+                return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+    def get_ip_ident(self, request):
+        """ 按客户端 IP (遵守 NUM_PROXIES 设置，见 DRF BaseThrottle.get_ident) """
+        return self.get_ident(request)
+
+    def get_account_ident(self, request):
+        """ 按账号: 已登录用会员 ID，登录/重置密码用提交的 email """
+        if request.user and request.user.is_authenticated:
+            return str(request.user.pk)
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+    def get_endpoint_ident(self, request):
+        """ 按接口: 所有请求共用一个桶 (保护 SMTP / CPU 的总量) """
+        return 'all'
+
+
+THROTTLE_CLASSES = [TokenBucketThrottle]
@@ -1,14 +1,16 @@
-from django.urls import path
+from django.urls import path, re_path
 from . import views 
 
 urlpatterns = [
     # --- V7/V15 会员门户 API ---
     path('register/', views.RegisterView.as_view(), name='register'),
     path('login/', views.LoginView.as_view(), name='login'),
+    path('logout/', views.LogoutView.as_view(), name='logout'),
     path('profile/', views.ProfileView.as_view(), name='profile'),
     path('profile/avatar/', views.AvatarUploadView.as_view(), name='profile-avatar'),
     path('profile/vouchers/', views.MyVouchersView.as_view(), name='my-vouchers'),
     path('profile/transactions/', views.MyTransactionsView.as_view(), name='my-transactions'),
+    path('me/bootstrap/', views.MemberBootstrapView.as_view(), name='member-bootstrap'),
     
     # 🚩 V12 积分商城 API
     path('store/points/', views.GetPointsStoreView.as_view(), name='store-points-list'),
@@ -28,6 +30,7 @@ urlpatterns = [
     path('admin/consume/<uuid:memberId>/', views.AdminConsumeView.as_view(), name='admin-consume-balance'),
     path('admin/track/<uuid:memberId>/', views.AdminTrackSpendView.as_view(), name='admin-track-cash'),
     path('admin/redeem_voucher/', views.AdminRedeemVoucherView.as_view(), name='admin-redeem-voucher'),
+    path('admin/cashier/batch/', views.AdminCashierBatchView.as_view(), name='admin-cashier-batch'),
 
     # ... V16 后勤 - 商城管理 API ...
     path('admin/store/points/', views.AdminPointsStoreListView.as_view(), name='admin-store-points-list'),
@@ -47,6 +50,9 @@ urlpatterns = [
     path('admin/announcement/upload/', views.AnnouncementImageUploadView.as_view(), name='admin-announcement-upload'),
 
     path('admin/reports/', views.FinancialReportView.as_view(), name='admin-reports'),
+    path('admin/export/<str:kind>/', views.AdminExportView.as_view(), name='admin-export'),
+    path('admin/reconciliation/', views.AdminReconciliationView.as_view(), name='admin-reconciliation'),
+    re_path(r'^admin/metrics/?$', views.AdminMetricsView.as_view(), name='admin-metrics'),  # Prometheus 不跟随重定向
 
     # ==========================================
     # 🚩 核心修复区：密码重置路由
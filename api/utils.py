@@ -0,0 +1,28 @@
+# 这是 api/utils.py 文件的内容 (V233: 通用辅助函数)
+
+import re
+
+from django.utils import timezone
+from rest_framework import serializers
+
+
+def parse_date_param(value, name):
+    """
+    V231: 解析 YYYY-MM-DD 格式的查询参数 (空值返回 None，格式错误返回 400)
+    """
+    if not value:
+        return None
+    try:
+        return timezone.datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise serializers.ValidationError({name: 'Invalid date format. Use YYYY-MM-DD'})
+
+
+def start_of_day(date):
+    """ V231: 当地时区 (Asia/Singapore) 某天 00:00 的 aware datetime """
+    return timezone.make_aware(timezone.datetime.combine(date, timezone.datetime.min.time()))
+
+
+def normalize_phone(phone):
+    """ V238: 电话号码只保留数字 (用于 Member.phoneNormalized 和收银台搜索) """
+    return re.sub(r'\D', '', phone or '')
@@ -1,13 +1,13 @@
 from django.contrib.auth import get_user_model
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token
 from django.utils import timezone
 from django.db import transaction
 from decimal import Decimal
 from django.conf import settings
-from django.core.files.storage import FileSystemStorage
 from .serializers import TransactionSerializer # 确保导入了这个
 import os 
 import uuid 
@@ -17,20 +17,35 @@ from django.contrib.auth import authenticate
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
-from django.core.mail import send_mail
-from django.db.models import Q
+from django.db.models import Q, Sum, Value, DecimalField, Case, When, IntegerField
+from django.db.models.functions import Coalesce
 from django.contrib.auth import get_user_model
 User = get_user_model()
+import json
+import time
 import random
+import re
 # 导入我们所有的模型
 from .models import (
     Member, Level, Voucher, VoucherType, Transaction, RechargeTier,
     Reward_Points_Store, Reward_Balance_Store, Announcement,
-    FinancialLedger
+    FinancialLedger, DailyFinancialRollup
 )
 
 # 导入我们所有的权限
 from .permissions import IsStaffUser
+from .pagination import TransactionCursorPagination
+from .utils import parse_date_param, start_of_day, normalize_phone
+from .vouchers import issue_vouchers, unused_vouchers, voucher_groups
+from .caching import bump_version, cached_data, cached_payload, etag_response, make_entry
+from .wallet import (
+    WalletError, lock_member, save_wallet, adjust_points, update_member_level, get_points_for_spend,
+)
+from .authentication import issue_token, revoke_tokens
+from .throttling import THROTTLE_CLASSES
+from .storage import media_storage
+from . import cashier, exports, images, metrics, outbox, reconciliation
+from .idempotency import idempotent
 
 # 导入我们所有的验证器
 from .serializers import (
@@ -40,38 +55,11 @@ from .serializers import (
     SocialProfileSerializer, AvatarUploadSerializer, PointsStoreItemSerializer, PointsRedeemSerializer, 
     RewardPointsStoreAdminSerializer, VoucherTypeAdminSerializer, RewardBalanceStoreAdminSerializer,
     AnnouncementAdminSerializer,AnnouncementSerializer,RedeemBalanceSerializer,
-    AnnouncementImageUploadSerializer, BalanceStoreItemSerializer
+    AnnouncementImageUploadSerializer, BalanceStoreItemSerializer, VoucherGroupSerializer,
+    CashierBatchSerializer, CashierOperationSerializer,
 )
 
 
-# V11 "辅助"函数 (放在顶部以便所有视图都可以调用它)
-def update_member_level(member):
-    """
-    V11 蓝图 - 核心自动升级逻辑 
-    """
-    possible_levels = Level.objects.filter(minPoints__lte=member.lifetimePoints).order_by('-minPoints')
-
-    if possible_levels.exists():
-        new_level = possible_levels.first()
-        if new_level.levelId > member.level.levelId:
-            member.level = new_level
-
-# --- 积分计算辅助函数 (请确保这段代码存在) ---
-def get_points_for_spend(member, spend_amount):
-    """ 
-    V11 蓝图 - 积分计算逻辑 
-    修复: 强制将 multiplier 转为 float，防止与 Decimal 类型冲突报错
-    """
-    # 1. 如果没有等级，默认 1倍
-    if not member.level:
-         return int(spend_amount) 
-    
-    # 2. 核心修复: 强制转换类型 (Decimal -> float)
-    multiplier = float(member.level.pointMultiplier)
-    
-    # 3. 计算结果
-    points_earned = spend_amount * multiplier
-    return int(points_earned)
 
 
 #
@@ -88,6 +76,9 @@ class LoginView(ObtainAuthToken):
     """ V7 蓝图 - 会员登录 API (POST /api/login) """
     serializer_class = LoginSerializer
     permission_classes = [permissions.AllowAny]
+    # 🚩 V243: 限流 (在检查密码之前)
+    throttle_classes = THROTTLE_CLASSES
+    throttle_scope = 'login'
 
     def post(self, request, *args, **kwargs):
         email = request.data.get('email')
@@ -104,7 +95,7 @@ class LoginView(ObtainAuthToken):
         except Member.DoesNotExist:
             return Response({'error': 'Invalid credentials (Email or Password incorrect)'}, status=401)
 
-        token, created = Token.objects.get_or_create(user=user)
+        token = issue_token(user)  # V242: 过期的 Token 会换新
         return Response({
             'token': token.key,
             'memberId': user.memberId,
@@ -113,20 +104,34 @@ class LoginView(ObtainAuthToken):
         })
 
 
+class LogoutView(APIView):
+    """ V242: 退出登录 (POST /api/logout/)，会员端和后台共用，Token 立即作废 """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        revoke_tokens(request.user)
+        return Response({'success': 'Logged out.'}, status=status.HTTP_200_OK)
+
+
 class ProfileView(generics.RetrieveUpdateAPIView):
     """ V15 蓝图 - 会员资料 API (GET/PUT /api/profile/) """
     serializer_class = MemberProfileSerializer
     permission_classes = [permissions.IsAuthenticated] 
 
     def get_object(self):
-        return self.request.user
+        # V242: request.user 来自认证缓存 (积分/余额可能稍旧)，资料页从数据库读最新的
+        return Member.objects.select_related('level').get(pk=self.request.user.pk)
 
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
+        before = [getattr(instance, f) for f in GALLERY_FIELDS]
         self.perform_update(serializer)
+        # V241: 画廊显示的资料 (或公开设置) 变了，让社交画廊快照失效
+        if [getattr(instance, f) for f in GALLERY_FIELDS] != before:
+            bump_version('gallery')
         return Response(serializer.data)
 
 
@@ -145,15 +150,16 @@ class AvatarUploadView(generics.GenericAPIView):
         avatar_file = serializer.validated_data['avatar']
 
         try:
-            fs = FileSystemStorage(location=settings.MEDIA_ROOT)
-            extension = avatar_file.name.split('.')[-1]
-            file_name = f'avatars/{user.memberId}_{uuid.uuid4()}.{extension}'
-            filename = fs.save(file_name, avatar_file)
+            fs = media_storage()  # V246: 按内容寻址 (重复上传只存一份)
+            # 路径: cas/ab/cd/<sha256>.ext (只保留原文件的扩展名)
+            filename = fs.save(avatar_file.name, avatar_file)
             file_url = fs.url(filename)
             absolute_url = request.build_absolute_uri(file_url) # 包含 http://...:8000
 
             user.avatarUrl = absolute_url
-            user.save()
+            user.save(update_fields=['avatarUrl'])  # V242: 只写头像，不覆盖钱包字段
+            images.enqueue(filename, kind='avatar')  # V245: 后台生成缩略图
+            bump_version('gallery')  # V241: 社交画廊快照失效
         except Exception as e:
             return Response({'error': f'Upload failed: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -164,35 +170,131 @@ class AvatarUploadView(generics.GenericAPIView):
         user = request.user
         # 将数据库中的 url 清空
         user.avatarUrl = ''
-        user.save()
+        user.save(update_fields=['avatarUrl'])
+        bump_version('gallery')  # V241: 社交画廊快照失效
         return Response({'success': 'Avatar removed.'}, status=status.HTTP_200_OK)
 
 class MyVouchersView(generics.ListAPIView):
-    """ V4/V12: 获取"我的"所有代金券 (GET /api/profile/vouchers/) """
+    """
+    V4/V12: 获取"我的"所有代金券 (GET /api/profile/vouchers/)
+    V248: 钱包汇总模式
+      ?group=type           -> 按模板分组 [{voucherType, count, earliestExpiry, nextVoucherId}]
+      ?voucherType=<id>     -> 展开某一组，只返回这个模板的券
+    (已过期但还没被每晚结算标记的券也不再返回)
+    """
     serializer_class = VoucherSerializer
     permission_classes = [permissions.IsAuthenticated] 
 
     def get_queryset(self):
-        user = self.request.user
-        return Voucher.objects.filter(member=user, status='unused').order_by('expiryDate')
+        queryset = unused_vouchers(self.request.user)
+        voucher_type = self.request.query_params.get('voucherType')
+        if voucher_type:
+            if not voucher_type.isdigit():
+                raise serializers.ValidationError({'voucherType': 'Must be an integer id.'})
+            queryset = queryset.filter(voucherType_id=int(voucher_type))
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get('group') == 'type':
+            groups = voucher_groups(request.user)
+            return Response(VoucherGroupSerializer(groups, many=True).data)
+        return super().list(request, *args, **kwargs)
 
 
 class MyTransactionsView(generics.ListAPIView):
-    """ V15: 获取"我的"所有交易记录 (GET /api/profile/transactions/) """
+    """
+    V231 升级: 获取"我的"交易记录 (GET /api/profile/transactions/)
+    - 游标分页: ?cursor=...&limit=20
+    - 可选筛选: ?type=RECHARGE,CONSUME_CASH&from=2025-11-01&to=2025-11-30
+    """
     serializer_class = TransactionSerializer
-    permission_classes = [permissions.IsAuthenticated] 
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TransactionCursorPagination
 
     def get_queryset(self):
         user = self.request.user
-        return Transaction.objects.filter(member=user).order_by('-timestamp')
+        qs = Transaction.objects.filter(member=user)
+
+        # 1. 类型筛选 (支持逗号分隔多个类型)
+        type_param = self.request.query_params.get('type')
+        if type_param:
+            valid_types = {choice[0] for choice in Transaction.TYPE_CHOICES}
+            types = [t.strip() for t in type_param.split(',') if t.strip()]
+            invalid = [t for t in types if t not in valid_types]
+            if invalid:
+                raise serializers.ValidationError({'type': f'Invalid type: {", ".join(invalid)}'})
+            qs = qs.filter(type__in=types)
+
+        # 2. 日期范围 (包含 from 和 to 当天)
+        date_from = parse_date_param(self.request.query_params.get('from'), 'from')
+        date_to = parse_date_param(self.request.query_params.get('to'), 'to')
+        # 🚩 用时间范围而不是 timestamp__date，才能走索引
+        if date_from:
+            qs = qs.filter(timestamp__gte=start_of_day(date_from))
+        if date_to:
+            qs = qs.filter(timestamp__lt=start_of_day(date_to + timezone.timedelta(days=1)))
+
+        # (排序由 TransactionCursorPagination 负责)
+        return qs
+
+
+class MemberBootstrapView(APIView):
+    """
+    V234 蓝图: 会员首页一次性加载 (GET /api/me/bootstrap/?transactions=10)
+    一个请求返回: 资料(含等级) + 未使用代金券 + 最近 N 条交易 + 公告
+    固定查询次数 (不随数据量增加)，代替 Dashboard 的 4 个串行请求。
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    DEFAULT_TRANSACTIONS = 10
+    MAX_TRANSACTIONS = 50
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('transactions', self.DEFAULT_TRANSACTIONS))
+        except ValueError:
+            return Response({'error': 'transactions must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(0, min(limit, self.MAX_TRANSACTIONS))
+
+        # 1. 资料 + 等级 (一次 JOIN)
+        member = Member.objects.select_related('level').get(pk=request.user.pk)
+
+        # 2. 未使用代金券 (带上模板，避免 N+1)
+        #    V248: ?vouchers=grouped 时只返回按模板分组的汇总
+        grouped = request.query_params.get('vouchers') == 'grouped'
+        vouchers = voucher_groups(member) if grouped else unused_vouchers(member)
+
+        # 3. 最近 N 条交易 (走 txn_member_ts_idx 索引)
+        transactions = Transaction.objects.filter(member=member).order_by('-timestamp', '-transactionId')[:limit]
+
+        # 4. 公告 (V240: 与 /api/announcements/ 共用同一份缓存)
+        announcements = json.loads(get_announcement_feed(request)['body'])
+
+        context = {'request': request}
+        voucher_data = (
+            {'voucher_groups': VoucherGroupSerializer(vouchers, many=True).data} if grouped
+            else {'vouchers': VoucherSerializer(vouchers, many=True, context=context).data}
+        )
+        return Response({
+            'profile': MemberProfileSerializer(member, context=context).data,
+            **voucher_data,
+            'transactions': TransactionSerializer(transactions, many=True, context=context).data,
+            'announcements': announcements,
+        }, status=status.HTTP_200_OK)
 
 
 #
 # --- V12 积分商城 API (MEMBER PORTAL) ---
 #
 
+CATALOGUE_CACHE_TIMEOUT = 60 * 60 * 24  # 商城每周才改一次；改动时 signals 会让缓存失效
+
+
 class GetPointsStoreView(generics.ListAPIView):
-    """ V12 蓝图: 获取所有可兑换积分商品 (GET /api/store/points/) """
+    """
+    V12 蓝图: 获取所有可兑换积分商品 (GET /api/store/points/)
+    V239: 返回缓存好的 JSON + ETag (支持 304)，平时不查数据库
+    """
     serializer_class = PointsStoreItemSerializer
     permission_classes = [permissions.IsAuthenticated] 
 
@@ -200,21 +302,45 @@ class GetPointsStoreView(generics.ListAPIView):
         # 仅返回 active=True 的商品
         return Reward_Points_Store.objects.filter(isActive=True).order_by('pointsCost')
 
+    def list(self, request, *args, **kwargs):
+        # 图片是绝对 URL，所以按域名分开缓存
+        entry = cached_payload(
+            'catalogue', f'points:{request.build_absolute_uri("/")}',
+            lambda: self.get_serializer(self.get_queryset(), many=True).data,
+            CATALOGUE_CACHE_TIMEOUT,
+        )
+        return etag_response(request, entry)
+
 class GetBalanceStoreView(generics.ListAPIView):
-    """ V5 蓝图: 获取所有可购买的余额商城商品 (GET /api/store/balance/) """
+    """
+    V5 蓝图: 获取所有可购买的余额商城商品 (GET /api/store/balance/)
+    V239: 返回缓存好的 JSON + ETag (支持 304)，平时不查数据库
+    """
     serializer_class = BalanceStoreItemSerializer
     permission_classes = [permissions.IsAuthenticated] 
 
     def get_queryset(self):
-        # 仅返回 active=True 的商品
-        return Reward_Balance_Store.objects.filter(isActive=True).order_by('balancePrice'
-)
+        # 仅返回 active=True 的商品 (select_related 避免 linkedVoucherType.name 的 N+1)
+        return (
+            Reward_Balance_Store.objects.filter(isActive=True)
+            .select_related('linkedVoucherType')
+            .order_by('balancePrice')
+        )
+
+    def list(self, request, *args, **kwargs):
+        entry = cached_payload(
+            'catalogue', f'balance:{request.build_absolute_uri("/")}',
+            lambda: self.get_serializer(self.get_queryset(), many=True).data,
+            CATALOGUE_CACHE_TIMEOUT,
+        )
+        return etag_response(request, entry)
 
 class RedeemPointsView(generics.GenericAPIView):
     """ V12 蓝图: 积分兑换商品 (POST /api/store/redeem/) """
     serializer_class = PointsRedeemSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent  # V255
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -228,9 +354,8 @@ class RedeemPointsView(generics.GenericAPIView):
         except Reward_Points_Store.DoesNotExist:
             return Response({'error': 'Item not found or unavailable.'}, status=status.HTTP_404_NOT_FOUND)
 
-         # 2. 检查会员积分
-        if member.loyaltyPoints < item.pointsCost:
-            return Response({'error': f'Insufficient points. Need {item.pointsCost}, but only have {member.loyaltyPoints}.'}, status=status.HTTP_400_BAD_REQUEST)
+         # 2. 积分是否足够由下面 adjust_points() 的带条件 UPDATE 判断
+         #    (V242: request.user 来自认证缓存，积分可能稍旧，不能用来预先判断)
 
         # 🚩
         # 🚩 V3 蓝图：开始执行4动作（库存、发券、账本1、账本2）
@@ -249,6 +374,9 @@ class RedeemPointsView(generics.GenericAPIView):
             # 这可以防止我们扣了库存但没发券，或者扣了积分但没扣库存
 
             with transaction.atomic():
+
+                # 动作 0：[积分] 🚩 V237: 一条带条件的 UPDATE 扣积分 (不够就抛 WalletError 回滚)
+                adjust_points(member, -item.pointsCost)
  
                 # 动作 1：[库存] 检查并扣减库存
                 # (我们使用 select_for_update 来“锁定”这一行，防止多人同时兑换)
@@ -259,14 +387,11 @@ class RedeemPointsView(generics.GenericAPIView):
                         raise Exception('Sorry, this item is out of stock.') # 抛出异常来触发“回滚”
 
                     product_to_update.stockCount -= 1
-                    product_to_update.save()
+                    product_to_update.save(update_fields=['stockCount'])
 
                 # 动作 2：[发券] 创建代金券实例 (Voucher)
-                new_voucher = Voucher.objects.create(
-                    member=member,
-                    voucherType=product_to_update
-                    # (status='unused' 和 expiryDate 将由 models.py 自动处理)
-                    )
+                # (V236: 用已锁定的模板直接计算 expiryDate，不再重新查询)
+                new_voucher = issue_vouchers(member, product_to_update)[0]
 
                 # 动作 3：[账本1] 记录会员消费 (Transaction)
                 member_txn = Transaction.objects.create(
@@ -288,10 +413,6 @@ class RedeemPointsView(generics.GenericAPIView):
                         relatedTransaction = member_txn
                         )
 
-                # 最后：扣除会员积分
-                member.loyaltyPoints -= item.pointsCost
-                member.save()
-
         # 捕获我们自己抛出的“库存不足”异常
         except Exception as e:
             # 如果事务失败 (例如 'Out of stock')，所有更改都会被“回滚”
@@ -307,14 +428,86 @@ class RedeemPointsView(generics.GenericAPIView):
 # --- V12 社交 API (MEMBER PORTAL) ---
 #
 
+GALLERY_SNAPSHOT_TIMEOUT = 60 * 5  # 排行快照每 5 分钟重建一次 (积分变化不会马上反映到排名上)
+GALLERY_SNAPSHOT_SIZE = 500  # 只排前 500 名
+GALLERY_PAGE_SIZE = 24
+GALLERY_MAX_PAGE_SIZE = 100
+GALLERY_FIELDS = ('nickname', 'avatarUrl', 'flair', 'socialOptIn')
+
+
+def get_gallery_snapshot():
+    """
+    V241: 社交画廊排行快照
+    - 只包含有头像并且 socialOptIn=True 的会员 (走 member_gallery_rank_idx 部分索引)
+    - 整个排行缓存 GALLERY_SNAPSHOT_TIMEOUT 秒，匿名访问不会每次都排序整张会员表
+    - 会员改资料/头像时由 bump_version('gallery') 让快照失效
+    """
+    def build():
+        # values() 直接带出等级名称，不再每个会员查一次 level (N+1)
+        rows = list(
+            Member.objects.filter(socialOptIn=True).exclude(avatarUrl='')
+            .order_by('-loyaltyPoints', 'memberId')
+            .values('nickname', 'avatarUrl', 'flair', 'level__levelName')[:GALLERY_SNAPSHOT_SIZE]
+        )
+        # V245: 头像缩略图 (一次查询)
+        avatars = images.load_variants(images.source_path_from_url(row['avatarUrl']) for row in rows)
+        return {
+            'built_at': time.time(),
+            'members': [
+                {
+                    'rank': rank,
+                    'nickname': row['nickname'],
+                    'avatarUrl': row['avatarUrl'],
+                    'avatarImages': images.variant_urls(
+                        avatars.get(images.source_path_from_url(row['avatarUrl'])),
+                        origin=images.url_origin(row['avatarUrl']),
+                    ),
+                    'flair': row['flair'],
+                    'levelName': row['level__levelName'],
+                }
+                for rank, row in enumerate(rows, start=1)
+            ],
+        }
+
+    return cached_data('gallery', 'snapshot', build, GALLERY_SNAPSHOT_TIMEOUT)
+
+
 class SocialGalleryView(generics.ListAPIView):
-    """ V12 蓝图: 社交画廊 API (GET /api/social/gallery/) """
+    """
+    V12 蓝图: 社交画廊 API (GET /api/social/gallery/)
+    V241: 分页 (?page=1&limit=24)，数据来自排行快照，带 ETag/Last-Modified
+    返回 { count, page, limit, next, previous, results: [{rank, nickname, ...}] }
+    注意: 快照只有前 GALLERY_SNAPSHOT_SIZE (500) 名，count 最多 500，
+    最后一页之后 next=null (超出的页码返回空 results)
+    """
     serializer_class = SocialProfileSerializer
     permission_classes = [permissions.AllowAny]
 
-    def get_queryset(self):
-        # 获取所有设置了头像的会员
-        return Member.objects.exclude(avatarUrl='').order_by('-loyaltyPoints')
+    def list(self, request, *args, **kwargs):
+        try:
+            page = max(1, int(request.query_params.get('page', 1)))
+            limit = int(request.query_params.get('limit', GALLERY_PAGE_SIZE))
+        except (TypeError, ValueError):
+            return Response({'error': 'page and limit must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, GALLERY_MAX_PAGE_SIZE))
+
+        snapshot = get_gallery_snapshot()
+        members = snapshot['members']
+        start = (page - 1) * limit
+
+        def page_url(number):
+            return request.build_absolute_uri(f'{request.path}?page={number}&limit={limit}')
+
+        data = {
+            'count': len(members),
+            'page': page,
+            'limit': limit,
+            'next': page_url(page + 1) if start + limit < len(members) else None,
+            'previous': page_url(page - 1) if page > 1 else None,
+            'results': members[start:start + limit],
+        }
+        entry = make_entry(data, snapshot['built_at'])
+        return etag_response(request, entry, last_modified=snapshot['built_at'])
 
 
 # 
@@ -324,6 +517,9 @@ class SocialGalleryView(generics.ListAPIView):
 
 class StaffLoginView(APIView):
     permission_classes = [permissions.AllowAny]
+    # 🚩 V243: 限流 (在检查密码之前)
+    throttle_classes = THROTTLE_CLASSES
+    throttle_scope = 'staff_login'
 
     def post(self, request):
         email = request.data.get('email')
@@ -331,7 +527,7 @@ class StaffLoginView(APIView):
         user = authenticate(username=email, password=password)
 
         if user and user.is_staff:
-            token, _ = Token.objects.get_or_create(user=user)
+            token = issue_token(user)  # V242: 过期的 Token 会换新
             
             # 🚩 V77 逻辑: 确定角色
             # 如果是 Django 超级管理员，强制视为 SUPERUSER，否则用数据库里的 role
@@ -368,61 +564,133 @@ class GetRechargeTiersView(generics.ListAPIView):
 
 class AdminMemberSearchView(APIView):
     """
-    V87 修复: 智能搜索 (防止用电话号码搜 UUID 导致崩溃)
+    V238 升级: 收银台会员搜索 (POST /api/admin/search/)
+    - 输入: q (兼容旧版 phone / memberId / email / nickname)，limit (默认 10，最多 50)
+    - 第一轮只走索引: memberId 精确 / 电话精确或前缀 / 邮箱、昵称前缀
+    - 第一轮没有结果才做模糊搜索 ("包含")，Postgres 上由 pg_trgm 索引支持
+    - 返回排好序的 results；profile/vouchers 是第一名 (兼容旧前端)
     """
     permission_classes = [permissions.IsAuthenticated, IsStaffUser]
 
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 50
+    PHONE_PATTERN = re.compile(r'^[\d\s()+\-]+$')
+
+    # 排名越小越靠前
+    MATCH_LABELS = {
+        0: 'memberId',
+        1: 'phone_exact',
+        2: 'phone_prefix',
+        3: 'email_exact',
+        4: 'email_prefix',
+        5: 'nickname_prefix',
+        6: 'phone_contains',
+        7: 'text_contains',
+    }
+
     def post(self, request):
-        query = request.data.get('phone') or request.data.get('memberId')
-        
-        print(f"🔍 Searching for: {query}") # 调试日志
+        query = (
+            request.data.get('q') or request.data.get('phone') or request.data.get('memberId')
+            or request.data.get('email') or request.data.get('nickname') or ''
+        )
+        query = str(query).strip()
 
         if not query:
             return Response({'error': 'Please provide phone or memberId'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            # 🚩 核心修复: 判断 query 是否为有效的 UUID
-            is_uuid = False
-            try:
-                uuid.UUID(str(query))
-                is_uuid = True
-            except ValueError:
-                is_uuid = False
-
-            # 构造查询条件
-            if is_uuid:
-                # 如果长得像 UUID，那就 ID 和 电话都搜
-                search_filter = (Q(phone=query) | Q(memberId=query)) & Q(is_staff=False)
-            else:
-                # 🚩 如果不像 UUID (比如是电话号码)，绝对不要去搜 memberId，否则数据库会崩！
-                # 这里我们使用 "模糊搜索" (contains) 来搜电话
-                search_filter = Q(phone__icontains=query) & Q(is_staff=False)
-
-            # 执行查询
-            members = Member.objects.filter(search_filter)
-
-            if not members.exists():
-                return Response({'error': 'Member not found.'}, status=status.HTTP_404_NOT_FOUND)
-
-            # 取第一个结果
-            member = members.first()
-
-            # 获取关联数据
-            vouchers = Voucher.objects.filter(member=member, status='unused').select_related('voucherType')
-            profile_serializer = MemberProfileSerializer(member)
-            voucher_serializer = VoucherSerializer(vouchers, many=True) 
-
-            return Response({
-                'profile': profile_serializer.data,
-                'vouchers': voucher_serializer.data
-            }, status=status.HTTP_200_OK)
+            limit = int(request.data.get('limit', self.DEFAULT_LIMIT))
+        except (TypeError, ValueError):
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.MAX_LIMIT))
+
+        members = self.search(query, limit)
+        if not members:
+            return Response({'error': 'Member not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        # 第一名的完整资料 + 代金券
+        # (V248: 请求里 vouchers='grouped' 时返回按模板分组的 voucher_groups)
+        best = members[0]
+        if request.data.get('vouchers') == 'grouped':
+            voucher_data = {'voucher_groups': VoucherGroupSerializer(voucher_groups(best), many=True).data}
+        else:
+            voucher_data = {'vouchers': VoucherSerializer(unused_vouchers(best), many=True).data}
 
-        except Exception as e:
-             print(f"🔥 Error: {str(e)}")
-             return Response({'error': f'Database error: {str(e)}'
-}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({
+            'profile': MemberProfileSerializer(best).data,
+            **voucher_data,
+            'results': [self.summarize(m) for m in members],
+            'count': len(members),
+        }, status=status.HTTP_200_OK)
 
+    def search(self, query, limit):
+        base = Member.objects.filter(is_staff=False).select_related('level')
 
+        # 1. 精确 / 前缀 (索引)
+        rules = []
+        try:
+            rules.append((0, Q(memberId=uuid.UUID(query))))
+        except ValueError:
+            pass
+
+        is_phone = bool(self.PHONE_PATTERN.match(query))
+        digits = normalize_phone(query)
+        if is_phone and digits:
+            rules.append((1, Q(phoneNormalized=digits)))
+            rules.append((2, Q(phoneNormalized__startswith=digits)))
+        elif not is_phone:
+            rules.append((3, Q(email__iexact=query)))
+            rules.append((4, Q(email__istartswith=query)))
+            rules.append((5, Q(nickname__istartswith=query)))
+
+        members = self.ranked(base, rules, limit)
+        if members:
+            return members
+
+        # 2. 模糊搜索 ("包含")
+        if is_phone and digits:
+            rules = [(6, Q(phoneNormalized__contains=digits))]
+        elif not is_phone:
+            rules = [(7, Q(email__icontains=query) | Q(nickname__icontains=query))]
+        else:
+            return []
+        return self.ranked(base, rules, limit)
+
+    def ranked(self, base, rules, limit):
+        if not rules:
+            return []
+        condition = Q()
+        for _, rule in rules:
+            condition |= rule
+        rank = Case(
+            *[When(rule, then=Value(score)) for score, rule in rules],
+            default=Value(99),
+            output_field=IntegerField(),
+        )
+        return list(base.filter(condition).annotate(search_rank=rank).order_by('search_rank', 'nickname', 'phone')[:limit])
+
+    def summarize(self, member):
+        return {
+            'memberId': member.memberId,
+            'nickname': member.nickname,
+            'phone': member.phone,
+            'email': member.email,
+            'levelName': member.level.levelName if member.level else None,
+            'balance': member.balance,
+            'loyaltyPoints': member.loyaltyPoints,
+            'match': self.MATCH_LABELS.get(member.search_rank),
+        }
+
+
+
+
+def cashier_response(request, op):
+    """ V254: 单个收银操作也走 cashier.run() (和批量接口同一套规则) """
+    try:
+        status_code, body = cashier.run(request.user, [op])[0]
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response(body, status=status_code)
 
 
 class AdminRechargeView(generics.GenericAPIView):
@@ -434,139 +702,32 @@ class AdminRechargeView(generics.GenericAPIView):
        - $500 -> 升级 Gold
        - $1000 -> 升级 Platinum
        - 并延长有效期 1 年
+    V254: 规则移到 api/cashier.py
     """
     serializer_class = AdminRechargeSerializer
     permission_classes = [IsStaffUser]
 
+    @idempotent  # V255
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-
-        member_id = self.kwargs.get('memberId') 
-        tier_id = serializer.validated_data['tier_id']
-
-        try:
-            member = Member.objects.get(memberId=member_id)
-            tier = RechargeTier.objects.get(id=tier_id) 
-        except (Member.DoesNotExist, RechargeTier.DoesNotExist):
-            return Response({'error': 'Data not found.'}, status=status.HTTP_404_NOT_FOUND)
-
-        # 🚩 1. 判定充值福利等级
-        target_level_name = None
-        if tier.amount >= 1000:
-            target_level_name = 'Platinum'
-        elif tier.amount >= 500:
-            target_level_name = 'Gold'
-        elif tier.amount >= 300:
-            target_level_name = 'Silver'
-
-        promo_message = ""
-
-        try:
-            with transaction.atomic():
-                # 2. 加余额
-                member.balance += tier.amount
-                member.balanceExpiryDate = timezone.now() + timezone.timedelta(days=365)
-
-                # 3. 处理等级跳级 (只升不降)
-                if target_level_name:
-                    try:
-                        target_level = Level.objects.get(levelName=target_level_name)
-                        current_min_points = member.level.minPoints if member.level else 0
-                        
-                        # 只有当目标等级 > 当前等级时，才执行升级
-                        if target_level.minPoints > current_min_points:
-                            member.level = target_level
-                            # 🚩 升级福利：有效期设为 1 年后
-                            member.levelExpiryDate = timezone.now().date() + timezone.timedelta(days=365)
-                            member.lifetimePoints = 0
-                            promo_message = f" (UPGRADED to {target_level_name}!)"
-                    except Level.DoesNotExist:
-                        pass # 如果数据库没配这个等级，就忽略
-
-                # 4. 保存 (models.py 的 update_member_level 会再次运行，但不会覆盖我们的升级)
-                member.save()
-
-                # 5. 记账
-                Transaction.objects.create(
-                    member=member,
-                    staff=request.user,
-                    type='RECHARGE',
-                    amount=tier.amount,
-                    pointsEarned=0 
-                )
-
-                # 6. 发券
-                if tier.grantVoucherType and tier.grantVoucherCount > 0:
-                    for _ in range(tier.grantVoucherCount):
-                        Voucher.objects.create(
-                            member=member,
-                            voucherType=tier.grantVoucherType,
-                        )
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        
-        return Response({'success': f'Successfully recharged ${tier.amount}.{promo_message}'}, status=status.HTTP_200_OK)
+        return cashier_response(request, {'op': 'recharge', 'memberId': self.kwargs.get('memberId'), **serializer.validated_data})
 
 
 
 class AdminConsumeView(generics.GenericAPIView):
     """
     V186 修复: 余额消费 -> 强制类型转换 (解决 Float vs Decimal 报错)
+    V254: 规则移到 api/cashier.py
     """
     serializer_class = AdminConsumeSerializer
     permission_classes = [IsStaffUser]
 
+    @idempotent  # V255
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-
-        member = Member.objects.get(memberId=self.kwargs.get('memberId'))
-        bill_amount = serializer.validated_data['amount']
-
-        # 🚩 核心修复：将金额强制转换为 Decimal 类型，防止与数据库字段冲突
-        try:
-            actual_spend = Decimal(str(bill_amount))
-        except:
-            return Response({'error': 'Invalid amount format'}, status=status.HTTP_400_BAD_REQUEST)
-
-        if member.balance < actual_spend:
-            return Response({'error': f'Insufficient balance. Need ${actual_spend}.'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # 计算积分
-        points_earned = get_points_for_spend(member, float(actual_spend))
-
-        xp_earned = int(actual_spend)
-
-        try:
-            with transaction.atomic():
-                # 1. 扣余额 (现在两个都是 Decimal，不会报错了)
-                member.balance -= actual_spend
-                
-                # 2. 加积分
-                member.loyaltyPoints += points_earned
-                member.lifetimePoints += xp_earned
-
-                update_member_level(member)
-                member.save()
-
-                # 3. 记账
-                Transaction.objects.create(
-                    member=member,
-                    staff=request.user,
-                    type='CONSUME_BALANCE',
-                    amount = -actual_spend,
-                    discountApplied = 0,
-                    pointsEarned = points_earned
-                )
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        return Response({
-            'success': f'Successfully consumed ${actual_spend}', 
-            'points_earned': points_earned,
-            'new_balance': member.balance
-        }, status=status.HTTP_200_OK)
+        return cashier_response(request, {'op': 'consume', 'memberId': self.kwargs.get('memberId'), **serializer.validated_data})
 
 
 # api/views.py
@@ -574,52 +735,16 @@ class AdminConsumeView(generics.GenericAPIView):
 class AdminTrackSpendView(generics.GenericAPIView):
     """
     V188 修复: 现金/刷卡 -> 类型强制转换 -> 解决 500 错误
+    V254: 规则移到 api/cashier.py
     """
     serializer_class = AdminTrackSpendSerializer
     permission_classes = [IsStaffUser]
 
+    @idempotent  # V255
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-
-        member = Member.objects.get(memberId=self.kwargs.get('memberId'))
-        
-        # 1. 获取金额 (确保是数字)
-        try:
-            spend_amount = float(serializer.validated_data['amount'])
-        except:
-            return Response({'error': 'Invalid amount format'}, status=status.HTTP_400_BAD_REQUEST)
-
-        # 2. 计算积分 (调用辅助函数，它已经修好了类型转换)
-        # 确保 get_points_for_spend 函数在文件上方已经定义好了！
-        points_earned = get_points_for_spend(member, spend_amount)
-        xp_earned = int(spend_amount)
-
-        try:
-            with transaction.atomic():
-                # 3. 加积分
-                member.loyaltyPoints += points_earned
-                member.lifetimePoints += xp_earned
-
-                update_member_level(member)
-                member.save()
-
-                # 4. 记账 (转回 Decimal 存入数据库)
-                Transaction.objects.create(
-                    member=member,
-                    staff=request.user,
-                    type='CONSUME_CASH',
-                    amount = -Decimal(str(spend_amount)), # 记录负数
-                    pointsEarned = points_earned
-                )
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        return Response({
-            'success': f'Tracked successfully. Earned {points_earned} pts.', 
-            'points_earned': points_earned,
-            'new_total_points': member.loyaltyPoints
-        }, status=status.HTTP_200_OK)
+        return cashier_response(request, {'op': 'track', 'memberId': self.kwargs.get('memberId'), **serializer.validated_data})
 
 
 # api/views.py 中的 AdminRedeemVoucherView
@@ -627,109 +752,71 @@ class AdminTrackSpendView(generics.GenericAPIView):
 class AdminRedeemVoucherView(generics.GenericAPIView):
     """ 
     V193 修复: 智能核销代金券 (修复类型错误) 
+    V254: 规则移到 api/cashier.py
     """
     serializer_class = AdminRedeemVoucherSerializer
     permission_classes = [IsStaffUser]
 
+    @idempotent  # V255
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
+        return cashier_response(request, {'op': 'redeem_voucher', **serializer.validated_data})
 
-        voucher_id = serializer.validated_data['voucher_id']
-        # 🚩 修复 1: 获取账单金额 (可能是 None)
-        raw_bill_amount = serializer.validated_data.get('bill_amount', 0)
 
-        try:
-            voucher = Voucher.objects.select_related('voucherType', 'member', 'member__level').get(voucherId=voucher_id)
-            member = voucher.member
-            product = voucher.voucherType
-
-            if voucher.status == 'used':
-                return Response({'error': 'Voucher already used.'}, status=status.HTTP_400_BAD_REQUEST)
-            if voucher.expiryDate and voucher.expiryDate < timezone.now():
-                # 顺便更新状态
-                voucher.status = 'expired'
-                voucher.save()
-                return Response({'error': 'Voucher is expired.'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # 判断类型
-            is_product_voucher = (product.value == 0 and product.costOfGoods is not None and product.costOfGoods >= 0)
-
-            if is_product_voucher:
-                # --- A. 产品券 (免费) ---
-                with transaction.atomic():
-                    voucher.status = 'used'
-                    voucher.usedDate = timezone.now()
-                    voucher.save()
-                return Response({'success': f'{product.name} redeemed.', 'points_earned': 0}, status=status.HTTP_200_OK)
+class AdminCashierBatchView(generics.GenericAPIView):
+    """
+    V254: 批量收银操作 (网络断开时前台先排队，恢复后一次提交)
+      POST /api/admin/cashier/batch/
+      {"operations": [
+          {"op": "consume", "memberId": "...", "amount": "12.50", "ref": "pos-1"},
+          {"op": "track", "memberId": "...", "amount": "30"},
+          {"op": "recharge", "memberId": "...", "tier_id": 1},
+          {"op": "redeem_voucher", "voucher_id": "...", "bill_amount": "80"}
+      ]}
+    按顺序执行，每个操作单独报告成功或失败 (格式和单个接口一样)：
+      {"results": [{"index": 0, "op": "consume", "ref": "pos-1", "ok": true, "status": 200, ...}],
+       "succeeded": 1, "failed": 0}
+    """
+    serializer_class = CashierBatchSerializer
+    permission_classes = [IsStaffUser]
 
+    @idempotent  # V255
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        operations = serializer.validated_data['operations']
+
+        # 1. 逐个验证，不合格的操作直接报 400，不影响其他操作
+        results, valid = [None] * len(operations), []
+        for index, raw in enumerate(operations):
+            op_serializer = CashierOperationSerializer(data=raw)
+            if op_serializer.is_valid():
+                valid.append((index, op_serializer.validated_data))
             else:
-                # --- B. 现金券 ($50 Off) ---
-                # 🚩 修复 2: 强制转换 bill_amount 为 Decimal
-                try:
-                    bill_amount = Decimal(str(raw_bill_amount))
-                except:
-                    return Response({'error': 'Invalid bill amount format.'}, status=status.HTTP_400_BAD_REQUEST)
-
-                if bill_amount <= 0:
-                    return Response({'error': 'Bill amount required for discount vouchers.'}, status=status.HTTP_400_BAD_REQUEST)
-                
-                if bill_amount < product.threshold:
-                    return Response({'error': f'Min spend ${product.threshold} required.'}, status=status.HTTP_400_BAD_REQUEST)
-
-                # 计算尾款
-                cash_payment = bill_amount - product.value
-                points_earned = 0
-                xp_earned = 0
-
-                # 🚩 修复 3: 如果有尾款，计算积分 (传入 float)
-                if cash_payment > 0:
-                    points_earned = get_points_for_spend(member, float(cash_payment))
-                    xp_earned = int(cash_payment)
-
-                with transaction.atomic():
-                    voucher.status = 'used'
-                    voucher.usedDate = timezone.now()
-                    voucher.save()
-
-                    # 加积分
-                    member.loyaltyPoints += points_earned
-                    member.lifetimePoints += xp_earned
-                    update_member_level(member)
-                    member.save()
-
-                    # 记账 (券)
-                    Transaction.objects.create(
-                        member=member,
-                        staff=request.user,
-                        type='CONSUME_VOUCHER',
-                        amount = -product.value, # 记录券面值
-                        relatedVoucher = voucher
-                    )
-
-                    # 记账 (尾款)
-                    if cash_payment > 0:
-                        Transaction.objects.create(
-                            member=member,
-                            staff=request.user,
-                            type='CONSUME_CASH',
-                            amount = -cash_payment, # 记录实付现金
-                            pointsEarned = points_earned
-                        )
+                results[index] = (400, {'error': 'Invalid operation.', 'details': op_serializer.errors})
 
-        except Voucher.DoesNotExist:
-            return Response({'error': 'Voucher not found.'}, status=status.HTTP_404_NOT_FOUND)
+        # 2. 一个事务里执行所有合格的操作
+        try:
+            outcomes = cashier.run(request.user, [op for _, op in valid]) if valid else []
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-        return Response({
-            'success': f'Redeemed {product.name}. Paid extra: ${cash_payment}', 
-            'points_earned': points_earned
-        }, status=status.HTTP_200_OK)
-    
-#
-# --- V16 后勤 API (Admin Portal - 商城管理) ---
-#
+        for (index, _), outcome in zip(valid, outcomes):
+            results[index] = outcome
+
+        rows = []
+        for index, (status_code, body) in enumerate(results):
+            raw = operations[index]
+            rows.append({
+                'index': index,
+                'op': raw.get('op'),
+                'ref': raw.get('ref'),
+                'ok': status_code == 200,
+                'status': status_code,
+                **body,
+            })
+        succeeded = sum(1 for row in rows if row['ok'])
+        return Response({'results': rows, 'succeeded': succeeded, 'failed': len(rows) - succeeded})
 
 class AdminPointsStoreListView(generics.ListCreateAPIView):
     """
@@ -833,16 +920,11 @@ class AnnouncementImageUploadView(generics.GenericAPIView):
         image_file = serializer.validated_data['image']
         
         try:
-            fs = FileSystemStorage(location=settings.MEDIA_ROOT)
-
-            # 4. 创建一个唯一的文件名
-            extension = image_file.name.split('.')[-1]
-
-            # 路径: announcements/uuid.ext
-            file_name = f'announcements/{uuid.uuid4()}.{extension}'
+            fs = media_storage()  # V246: 按内容寻址 (重复上传只存一份)
 
-            # 5. 保存文件 
-            filename = fs.save(file_name, image_file)
+            # 4. 保存文件 -> 路径: cas/ab/cd/<sha256>.ext (只保留原文件的扩展名)
+            filename = fs.save(image_file.name, image_file)
+            images.enqueue(filename)  # V245: 后台生成缩略图
 
         except Exception as e:
             return Response({'error': f'文件写入失败。错误信息: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -855,28 +937,72 @@ class AnnouncementImageUploadView(generics.GenericAPIView):
 
 # --- V16 会员 API (Member Portal - 广告) ---
 
+ANNOUNCEMENT_CACHE_TIMEOUT = 60 * 60  # 最长缓存 1 小时 (有横幅快过期时会更短)
+
+
+def get_announcement_feed(request):
+    """
+    V240: 会员公告 (缓存)
+    - 只显示 isActive=True 且未过期的横幅
+    - 缓存时间 = 距离下一个横幅过期的秒数，过期的横幅会自动消失
+    - 后台修改公告时由 signals 让缓存失效
+    """
+    state = {}
+
+    def build():
+        now = timezone.now()
+        items = list(
+            Announcement.objects.filter(isActive=True)
+            .filter(Q(expiryDate__isnull=True) | Q(expiryDate__gt=now))
+            .order_by('displayOrder', '-id')
+        )
+        upcoming = [a.expiryDate for a in items if a.expiryDate]
+        state['next_expiry'] = min(upcoming) if upcoming else None
+        return AnnouncementSerializer(items, many=True, context={'request': request}).data
+
+    def timeout(data):
+        ttl = ANNOUNCEMENT_CACHE_TIMEOUT
+        if state.get('next_expiry'):
+            seconds_left = int((state['next_expiry'] - timezone.now()).total_seconds()) + 1
+            ttl = max(1, min(ttl, seconds_left))
+        return ttl
+
+    # 图片是绝对 URL，所以按域名分开缓存
+    return cached_payload('announcements', f'feed:{request.build_absolute_uri("/")}', build, timeout)
+
+
 class MemberAnnouncementListView(generics.ListAPIView):
     """
     V16/V45 蓝图: 会员获取广告横幅
+    V240: 从缓存读取 + ETag/Last-Modified，过期的横幅不再显示
     """
     permission_classes = [permissions.IsAuthenticated] 
     serializer_class = AnnouncementSerializer 
 
     def get_queryset(self):
-        # 🚩 V45 修复测试：
-        # 我们删除了所有关于 expiryDate 和 timezone 的代码。
-        # 只要你在后台打了钩 (isActive=True)，它就必须显示！
         return Announcement.objects.filter(isActive=True).order_by('displayOrder', '-id')
+
+    def list(self, request, *args, **kwargs):
+        entry = get_announcement_feed(request)
+        return etag_response(request, entry, last_modified=entry['built_at'])
     
 
 
 
 # 🚩 V64: 获取单个公告详情
 class MemberAnnouncementDetailView(generics.RetrieveAPIView):
+    """ V240: 和列表共用同一份缓存 (不在列表里 = 未启用或已过期 = 404) """
     permission_classes = [permissions.IsAuthenticated]
     serializer_class = AnnouncementSerializer
     queryset = Announcement.objects.filter(isActive=True)
 
+    def retrieve(self, request, *args, **kwargs):
+        feed = get_announcement_feed(request)
+        item = next((a for a in json.loads(feed['body']) if a['id'] == self.kwargs['pk']), None)
+        if item is None:
+            return Response({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return etag_response(request, make_entry(item, feed['built_at']), last_modified=feed['built_at'])
+
 
 
 
@@ -888,6 +1014,7 @@ class RedeemBalanceView(generics.GenericAPIView):
     serializer_class = RedeemBalanceSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent  # V255
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
@@ -908,32 +1035,34 @@ class RedeemBalanceView(generics.GenericAPIView):
         # 🚩 核心修改：移除折扣，确保是 Decimal 类型
         # item.balancePrice 本身就是 Decimal，但我们用 Decimal() 包裹一下以防万一
         actual_spend = Decimal(str(item.balancePrice))
-        
-        # 计算积分 (转成 float 传给辅助函数)
-        points_earned = get_points_for_spend(member, float(actual_spend))
-
-        if member.balance < actual_spend:
-             return Response({'error': 'Insufficient balance.'}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             with transaction.atomic():
+                # 🚩 V237: 锁住会员行，用最新余额判断
+                member = lock_member(request.user.pk)
+                if member.balance < actual_spend:
+                    raise WalletError('Insufficient balance.')
+
+                # 计算积分 (转成 float 传给辅助函数)
+                points_earned = get_points_for_spend(member, float(actual_spend))
+
                 # 库存检查
                 product_to_update = VoucherType.objects.select_for_update().get(id=product.id)
                 if product_to_update.stockCount is not None:
                     if product_to_update.stockCount <= 0:
                         raise Exception('Out of stock.')
                     product_to_update.stockCount -= 1
-                    product_to_update.save()
+                    product_to_update.save(update_fields=['stockCount'])
 
                 # 发券
-                new_voucher = Voucher.objects.create(member=member, voucherType=product_to_update)
+                new_voucher = issue_vouchers(member, product_to_update)[0]
 
                 # 扣款 & 加分
                 member.balance -= actual_spend
                 member.loyaltyPoints += points_earned
                 member.lifetimePoints += points_earned
                 update_member_level(member)
-                member.save()
+                save_wallet(member, 'balance', 'loyaltyPoints')
 
                 # 记账
                 member_txn = Transaction.objects.create(
@@ -981,10 +1110,10 @@ class PointsStoreImageUploadView(generics.GenericAPIView):
         image_file = serializer.validated_data['image']
         
         try:
-            fs = FileSystemStorage(location=settings.MEDIA_ROOT)
-            # 路径: store_points/uuid.ext
-            file_name = f'store_points/{uuid.uuid4()}.{image_file.name.split(".")[-1]}'
-            filename = fs.save(file_name, image_file)
+            fs = media_storage()  # V246: 按内容寻址 (重复上传只存一份)
+            # 路径: cas/ab/cd/<sha256>.ext (只保留原文件的扩展名)
+            filename = fs.save(image_file.name, image_file)
+            images.enqueue(filename)  # V245: 后台生成缩略图
         except Exception as e:
             return Response({'error': f'文件写入失败: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -1005,10 +1134,10 @@ class BalanceStoreImageUploadView(generics.GenericAPIView):
         image_file = serializer.validated_data['image']
         
         try:
-            fs = FileSystemStorage(location=settings.MEDIA_ROOT)
-            # 路径: store_balance/uuid.ext
-            file_name = f'store_balance/{uuid.uuid4()}.{image_file.name.split(".")[-1]}'
-            filename = fs.save(file_name, image_file)
+            fs = media_storage()  # V246: 按内容寻址 (重复上传只存一份)
+            # 路径: cas/ab/cd/<sha256>.ext (只保留原文件的扩展名)
+            filename = fs.save(image_file.name, image_file)
+            images.enqueue(filename)  # V245: 后台生成缩略图
         except Exception as e:
             return Response({'error': f'文件写入失败: {e}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
@@ -1019,72 +1148,217 @@ class BalanceStoreImageUploadView(generics.GenericAPIView):
 
 class FinancialReportView(generics.GenericAPIView):
     """
-    V200 升级: 支持按日期筛选财务报表
-    前端调用: GET /api/admin/reports/?date=2025-11-25
+    V233 升级: 汇总数据来自每日财务汇总表 (DailyFinancialRollup)
+    前端调用:
+      GET /api/admin/reports/?date=2025-11-25              (单日，兼容旧版)
+      GET /api/admin/reports/?from=2025-11-01&to=2025-11-30 (日期范围)
+      &rows=0  不返回明细 (适合按月/按年的报表)；&rows=N 最多返回最新的 N 条明细
+    返回: summary + by_type + by_day + by_staff + ledger + 四类明细
+    明细最多 MAX_ROWS 条 (最新的)，超出时 rows_truncated=true，完整明细用 /api/admin/export/
     """
     permission_classes = [permissions.IsAuthenticated, IsStaffUser]
+    MAX_ROWS = 2000
+
+    # 明细分类 (key -> 交易类型)
+    ROW_GROUPS = {
+        'recharges': ['RECHARGE'],
+        'balance_usage': ['CONSUME_BALANCE', 'REDEEM_MERCH'],
+        'voucher_usage': ['CONSUME_VOUCHER'],
+        'cash_income': ['CONSUME_CASH'],
+    }
 
     def get(self, request, *args, **kwargs):
-        # 1. 获取前端传来的日期参数
-        date_str = request.query_params.get('date')
-        
-        # 2. 确定查询日期 (有参数用参数，没参数用今天)
-        if date_str:
-            try:
-                target_date = timezone.datetime.strptime(date_str, '%Y-%m-%d').date()
-            except ValueError:
-                return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        # 1. 确定日期范围 (date 优先；否则 from/to；都没有则今天)
+        try:
+            single_date = parse_date_param(request.query_params.get('date'), 'date')
+            date_from = parse_date_param(request.query_params.get('from'), 'from')
+            date_to = parse_date_param(request.query_params.get('to'), 'to')
+        except serializers.ValidationError:
+            return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if single_date:
+            date_from = date_to = single_date
         else:
-            target_date = timezone.now().date()
-
-        # 3. 数据库查询: 筛选 timestamp 为目标日期的记录
-        # select_related 优化查询速度
-        qs = Transaction.objects.filter(timestamp__date=target_date).select_related('member', 'staff').order_by('-timestamp')
-        
-        # 4. 分类筛选
-        recharge_qs = qs.filter(type='RECHARGE')
-        balance_qs = qs.filter(type__in=['CONSUME_BALANCE', 'REDEEM_MERCH'])
-        voucher_qs = qs.filter(type='CONSUME_VOUCHER')
-        cash_qs = qs.filter(type='CONSUME_CASH')
-
-        # 5. 计算当日总计 (Dashboard 数据)
-        # 充值是正数，直接加
-        total_recharge = sum(t.amount for t in recharge_qs)
-        # 现金消费记录通常是负数(支出)，我们取绝对值来显示"今日收了多少现金"
-        total_cash_income = sum(abs(t.amount) for t in cash_qs) 
-
-        return Response({
-            'date': target_date,
+            today = timezone.localdate()
+            date_from = date_from or date_to or today
+            date_to = date_to or date_from
+        if date_from > date_to:
+            return Response({'error': "'from' must be on or before 'to'"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # 2. 汇总: 读预先计算好的每日汇总行
+        rollup_qs = DailyFinancialRollup.objects.filter(day__gte=date_from, day__lte=date_to)
+        txn_rollup = rollup_qs.filter(source='TRANSACTION')
+        by_type = self.aggregate_by_type(txn_rollup)
+
+        data = {
+            'date': date_from,
+            'from': date_from,
+            'to': date_to,
             'summary': {
-                'total_recharge': total_recharge,
-                'total_cash_income': total_cash_income
+                'total_recharge': by_type.get('RECHARGE', {}).get('total', 0),
+                # 现金消费记录是负数(支出)，我们取绝对值来显示"收了多少现金"
+                'total_cash_income': by_type.get('CONSUME_CASH', {}).get('abs_total', 0),
             },
-            'recharges': self.serialize_transactions(recharge_qs),
-            'balance_usage': self.serialize_transactions(balance_qs),
-            'voucher_usage': self.serialize_transactions(voucher_qs),
-            'cash_income': self.serialize_transactions(cash_qs)
-        })
-
-    def serialize_transactions(self, queryset):
-        data = []
-        for t in queryset:
-            member_name = t.member.nickname if t.member else 'Unknown'
-            member_email = t.member.email if t.member else '-'
-            
-            # 获取操作员工的名字 (如果有)
-            staff_name = t.staff.nickname if t.staff else 'System'
+            'by_type': by_type,
+            'by_day': self.aggregate_by_day(txn_rollup),
+            'by_staff': self.aggregate_by_staff(txn_rollup),
+            'ledger': self.aggregate_by_type(rollup_qs.filter(source='LEDGER')),
+        }
 
-            data.append({
-                'id': str(t.transactionId),
-                'date': t.timestamp,
+        # 3. 明细: 时间范围过滤 (走 timestamp 索引，不用 timestamp__date)
+        try:
+            limit = min(int(request.query_params.get('rows', self.MAX_ROWS)), self.MAX_ROWS)
+        except ValueError:
+            return Response({'error': "'rows' must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+        if limit > 0:
+            qs = Transaction.objects.filter(
+                timestamp__gte=start_of_day(date_from),
+                timestamp__lt=start_of_day(date_to + timezone.timedelta(days=1)),
+            )
+            data.update(self.serialize_rows(qs, limit))
+        return Response(data)
+
+    @staticmethod
+    def totals():
+        """ 每个分组都用的聚合列 (一次 SQL 完成) """
+        return {
+            'total': Coalesce(Sum('totalAmount'), Value(Decimal('0')), output_field=DecimalField()),
+            'abs_total': Coalesce(Sum('absAmount'), Value(Decimal('0')), output_field=DecimalField()),
+            'count': Coalesce(Sum('txnCount'), Value(0)),
+            'points': Coalesce(Sum('pointsTotal'), Value(0)),
+        }
+
+    def aggregate_by_type(self, rollup_qs):
+        # SELECT type, SUM(totalAmount), SUM(txnCount) ... GROUP BY type
+        rows = rollup_qs.order_by().values('type').annotate(**self.totals())
+        return {row.pop('type'): row for row in rows}
+
+    def aggregate_by_day(self, rollup_qs):
+        # 按日期 + 类型分组
+        rows = rollup_qs.order_by().values('day', 'type').annotate(**self.totals()).order_by('day', 'type')
+        days = {}
+        for row in rows:
+            day = days.setdefault(row['day'], {'date': row['day'], 'total_recharge': 0, 'total_cash_income': 0, 'types': {}})
+            if row['type'] == 'RECHARGE':
+                day['total_recharge'] = row['total']
+            elif row['type'] == 'CONSUME_CASH':
+                day['total_cash_income'] = row['abs_total']
+            day['types'][row['type']] = {k: row[k] for k in ('total', 'abs_total', 'count', 'points')}
+        return list(days.values())
+
+    def aggregate_by_staff(self, rollup_qs):
+        # 按操作员工 + 类型分组 (staff 为空 = System)
+        rows = (
+            rollup_qs.order_by()
+            .values('staff', 'staff__nickname', 'type')
+            .annotate(**self.totals())
+            .order_by('staff__nickname', 'type')
+        )
+        staff_map = {}
+        for row in rows:
+            key = str(row['staff']) if row['staff'] else None
+            entry = staff_map.setdefault(key, {
+                'staff_id': key,
+                'staff_name': row['staff__nickname'] if row['staff'] else 'System',
+                'count': 0,
+                'types': {},
+            })
+            entry['count'] += row['count']
+            entry['types'][row['type']] = {k: row[k] for k in ('total', 'abs_total', 'count', 'points')}
+        return list(staff_map.values())
+
+    def serialize_rows(self, qs, limit):
+        """ 明细: 一次 .values() 查询，不实例化模型 (多取一条用来判断是否被截断) """
+        type_to_group = {t: key for key, types in self.ROW_GROUPS.items() for t in types}
+        result = {key: [] for key in self.ROW_GROUPS}
+
+        rows = list(
+            qs.filter(type__in=type_to_group.keys())
+            .order_by('-timestamp')
+            .values(
+                'transactionId', 'timestamp', 'type', 'amount', 'pointsEarned',
+                'member', 'member__nickname', 'member__email', 'staff', 'staff__nickname',
+            )[:limit + 1]
+        )
+        result['rows_truncated'] = len(rows) > limit
+        for t in rows[:limit]:
+            member_name = t['member__nickname'] if t['member'] else 'Unknown'
+            member_email = t['member__email'] if t['member'] else '-'
+            result[type_to_group[t['type']]].append({
+                'id': str(t['transactionId']),
+                'date': t['timestamp'],
                 'member_name': f"{member_name} ({member_email})",
-                'type': t.type,
-                'amount': float(t.amount),
-                'points': t.pointsEarned,
-                'staff_name': staff_name 
+                'type': t['type'],
+                'amount': float(t['amount']),
+                'points': t['pointsEarned'],
+                'staff_name': t['staff__nickname'] if t['staff'] else 'System',
             })
-        return data     
-    
+        return result
+
+
+
+class AdminExportView(APIView):
+    """
+    V249: 流式导出 (会计对账用，代替一天一天地翻 /api/admin/reports/)
+      GET /api/admin/export/transactions/?from=2025-01-01&to=2025-12-31
+      GET /api/admin/export/ledger/?from=...&to=...&output=jsonl&gzip=1
+      可选过滤: type=RECHARGE,CONSUME_CASH  staff=<uuid>  member=<uuid>
+    (用 output 而不是 format，format 是 DRF 保留的参数)
+    """
+    permission_classes = [permissions.IsAuthenticated, IsStaffUser]
+    CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson'}
+
+    def get(self, request, kind):
+        if kind not in exports.EXPORTS:
+            return Response({'error': f'Unknown export: {kind}'}, status=status.HTTP_404_NOT_FOUND)
+        fmt = request.query_params.get('output', 'csv')
+        if fmt not in exports.FORMATS:
+            return Response({'error': "output must be 'csv' or 'jsonl'"}, status=status.HTTP_400_BAD_REQUEST)
+        compress = request.query_params.get('gzip') in ('1', 'true')
+        filters = exports.parse_filters(kind, request.query_params)
+
+        response = StreamingHttpResponse(
+            exports.iter_export(kind, fmt, compress, **filters),
+            content_type='application/gzip' if compress else self.CONTENT_TYPES[fmt],
+        )
+        name = exports.filename(kind, fmt, compress, filters['date_from'], filters['date_to'])
+        response['Content-Disposition'] = f'attachment; filename="{name}"'
+        return response
+
+
+
+class AdminReconciliationView(APIView):
+    """
+    V250: 会员账本 vs 公司账本对账
+      GET /api/admin/reconciliation/?from=2025-11-01&to=2025-11-30   (不传日期 = 全部历史)
+      &all=1  days 里也返回没有问题的日期
+    返回每条规则的 missing / mismatched 汇总、按日期的明细和孤立的公司账本
+    """
+    permission_classes = [permissions.IsAuthenticated, IsStaffUser]
+
+    def get(self, request):
+        date_from = parse_date_param(request.query_params.get('from'), 'from')
+        date_to = parse_date_param(request.query_params.get('to'), 'to')
+        if date_from and date_to and date_from > date_to:
+            return Response({'error': "'from' must be on or before 'to'"}, status=status.HTTP_400_BAD_REQUEST)
+        report = reconciliation.reconcile(
+            date_from, date_to, include_clean=request.query_params.get('all') in ('1', 'true'),
+        )
+        return Response(report)
+
+
+
+class AdminMetricsView(APIView):
+    """
+    V251: Prometheus 抓取地址 (GET /api/admin/metrics)
+    需要员工 Token (Prometheus 配置 authorization: {type: Token, credentials: ...})
+    """
+    permission_classes = [permissions.IsAuthenticated, IsStaffUser]
+
+    def get(self, request):
+        body = metrics.render(metrics.collect())
+        return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
 
 
 class PasswordResetRequestView(APIView):
@@ -1092,6 +1366,9 @@ class PasswordResetRequestView(APIView):
     V74: 请求重置密码 (发送邮件)
     """
     permission_classes = [permissions.AllowAny] # 允许未登录用户访问
+    # 🚩 V243: 限流 (在发邮件之前)
+    throttle_classes = THROTTLE_CLASSES
+    throttle_scope = 'password_reset'
 
     def post(self, request):
         email = request.data.get('email')
@@ -1112,14 +1389,10 @@ class PasswordResetRequestView(APIView):
         # 2. 生成前端重置链接 (注意端口是 3001!)
         reset_link = f"https://lluvia.app/reset/{uid}/{token}"
 
-        # 3. 发送邮件
+        # 3. 放进发件箱 (🚩 V244: 由 `manage.py send_outbox` 在后台发送，请求不再等 SMTP)
         subject = "LLUVIA Password Reset"
         message = f"Click the link to reset your password:\n\n{reset_link}\n\nIf you did not request this, please ignore."
-        
-        try:
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [email], fail_silently=False)
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        outbox.enqueue(subject, message, [user.email])
 
         return Response({'success': 'Email sent'}, status=status.HTTP_200_OK)
 
@@ -1170,6 +1443,8 @@ class PasswordResetConfirmView(APIView):
             # 6. 设置新密码
             user.set_password(new_password)
             user.save()
+            # 🚩 V242: 旧 Token 全部作废 (所有设备需要重新登录)
+            revoke_tokens(user)
             print(f"✅ Password reset success for {user.email}")
             
             return Response({'success': 'Password reset successfully'}, status=status.HTTP_200_OK)
@@ -1183,14 +1458,15 @@ class PasswordResetConfirmView(APIView):
 
 class GamePlayView(generics.GenericAPIView):
     permission_classes = [permissions.IsAuthenticated]
+    # 🚩 V243: 限流 (每次转动写两条 Transaction)
+    throttle_classes = THROTTLE_CLASSES
+    throttle_scope = 'game'
     
     def post(self, request):
         user = request.user
         COST_PER_SPIN = 100 
         
-        # 1. 检查积分
-        if user.loyaltyPoints < COST_PER_SPIN:
-            return Response({'error': 'Not enough points (Need 100 Pts)'}, status=status.HTTP_400_BAD_REQUEST)
+        # 1. 积分是否足够由 adjust_points() 的带条件 UPDATE 判断 (见下面的 WalletError)
             
         # 2. 随机逻辑
         symbols = ['🍸', '💎', '7️⃣', '🔔']
@@ -1216,14 +1492,9 @@ class GamePlayView(generics.GenericAPIView):
             
         try:
             with transaction.atomic():
-                # 扣费
-                user.loyaltyPoints -= COST_PER_SPIN
-                
-                # 发奖
-                if prize > 0: 
-                    user.loyaltyPoints += prize
-                
-                user.save()
+                # 🚩 V237: 扣费 + 发奖合成一条带条件的 UPDATE
+                # (loyaltyPoints = loyaltyPoints - 100 + prize WHERE loyaltyPoints >= 100)
+                adjust_points(user, prize - COST_PER_SPIN, required=COST_PER_SPIN)
                 
                 # 记账 (扣费)
                 Transaction.objects.create(
@@ -1244,6 +1515,8 @@ class GamePlayView(generics.GenericAPIView):
                         staff=None
                     )
                     
+        except WalletError:
+            return Response({'error': 'Not enough points (Need 100 Pts)'}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e: 
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
             
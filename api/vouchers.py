@@ -0,0 +1,67 @@
+# 这是 api/vouchers.py 文件的内容
+
+"""
+V236 蓝图: 批量发券服务
+充值送券、积分商城、余额商城都通过这里发券:
+过期时间每个模板只算一次，所有代金券一次 bulk_create 写入。
+
+V248: 会员的代金券钱包 (未使用、未过期)，可以按模板分组汇总。
+查询都是 member + status='unused' + expiryDate，走 voucher_unused_member_exp_idx 部分索引。
+"""
+from django.db.models import Count, Min, OuterRef, Q, Subquery
+from django.utils import timezone
+
+from .models import Voucher, VoucherType
+
+
+def issue_vouchers(member, voucher_type, count=1):
+    """
+    给会员发 count 张 voucher_type 代金券，返回新建的 Voucher 列表。
+    (不走 Voucher.save()，所以不会为每张券重新查询 VoucherType)
+    """
+    if count <= 0:
+        return []
+
+    expiry_date = voucher_type.get_voucher_expiry(timezone.now())
+    vouchers = [
+        Voucher(member=member, voucherType=voucher_type, expiryDate=expiry_date)
+        for _ in range(count)
+    ]
+    return Voucher.objects.bulk_create(vouchers)
+
+
+def unused_vouchers(member, now=None):
+    """ 会员还能用的代金券 (未使用、未过期)，最早过期的在前 """
+    now = now or timezone.now()
+    return (
+        Voucher.objects.filter(member=member, status='unused')
+        .filter(Q(expiryDate__isnull=True) | Q(expiryDate__gte=now))
+        .select_related('voucherType')
+        .order_by('expiryDate', 'voucherId')
+    )
+
+
+def voucher_groups(member, now=None):
+    """
+    按模板分组: [{voucherTypeId, voucherType, count, earliestExpiry, nextVoucherId}, ...]
+    nextVoucherId = 这一组里最早过期的那张 (收银台直接核销它)
+    """
+    now = now or timezone.now()
+    wallet = unused_vouchers(member, now)
+    next_voucher = wallet.filter(voucherType=OuterRef('voucherType')).values('voucherId')[:1]
+    rows = list(
+        wallet.order_by().values('voucherType')
+        .annotate(count=Count('voucherId'), earliestExpiry=Min('expiryDate'), nextVoucherId=Subquery(next_voucher))
+        .order_by('earliestExpiry', 'voucherType')
+    )
+    types = VoucherType.objects.in_bulk([r['voucherType'] for r in rows if r['voucherType']])
+    return [
+        {
+            'voucherTypeId': r['voucherType'],
+            'voucherType': types.get(r['voucherType']),
+            'count': r['count'],
+            'earliestExpiry': r['earliestExpiry'],
+            'nextVoucherId': r['nextVoucherId'],
+        }
+        for r in rows
+    ]
@@ -0,0 +1,106 @@
+# 这是 api/wallet.py 文件的内容
+
+"""
+V237 蓝图: 会员钱包服务 (余额 / 积分)
+- 只扣/加积分: 一条带条件的 UPDATE (loyaltyPoints = loyaltyPoints - x WHERE loyaltyPoints >= x)
+- 涉及余额或经验值(可能升级): SELECT ... FOR UPDATE 锁住会员行，
+  改完只写变化的字段 (update_fields)
+两种方式都必须在 transaction.atomic() 里调用，避免多台收银机同时操作时互相覆盖。
+"""
+from django.db.models import F
+from django.utils import timezone
+
+from .levels import get_ladder, get_level
+from .models import Member, Voucher
+
+# Member.save() 里的 update_member_level() 可能会改这几个字段，变化了就一起写入
+LEVEL_FIELDS = ('level', 'levelExpiryDate', 'lifetimePoints')
+
+
+class WalletError(Exception):
+    """ 余额/积分不足等业务错误 (视图里转成 400) """
+
+
+def update_member_level(member):
+    """
+    V11 蓝图 - 核心自动升级逻辑 
+    V235: 改用缓存的等级阶梯 (0 次查询)
+    V254: 从 views.py 移到这里 (收银批量操作也要用)
+    """
+    new_level = get_ladder().for_points(member.lifetimePoints)
+    current_level = get_level(member.level_id)
+
+    if new_level and current_level and new_level.levelId > current_level.levelId:
+        member.level = new_level
+
+
+def get_points_for_spend(member, spend_amount):
+    """ 
+    V11 蓝图 - 积分计算逻辑 
+    修复: 强制将 multiplier 转为 float，防止与 Decimal 类型冲突报错
+    V235: 倍率从缓存的等级阶梯读取，不再触发 member.level 查询
+    """
+    level = get_level(member.level_id)
+
+    # 1. 如果没有等级，默认 1倍
+    if not level:
+        return int(spend_amount)
+
+    # 2. 核心修复: 强制转换类型 (Decimal -> float)
+    multiplier = float(level.pointMultiplier)
+    return int(spend_amount * multiplier)
+
+
+def lock_member(member_id):
+    """ 锁住会员行并返回最新数据 (必须在 transaction.atomic() 里) """
+    return Member.objects.select_for_update().get(pk=member_id)
+
+
+def save_wallet(member, *fields):
+    """
+    只写入变化的字段，加上真正变化了的等级字段
+    (不会用旧数据覆盖昵称、等级等别人刚改过的字段)
+    """
+    member.update_member_level()  # Member.save() 里还会再调用一次，不会再改变
+    state = getattr(member, '_level_state', None)
+    if state is None:
+        level_fields = set(LEVEL_FIELDS)  # 不是从数据库读出来的对象，无法比较
+    else:
+        level_fields = {
+            field for field, attname in zip(LEVEL_FIELDS, member.LEVEL_STATE_FIELDS)
+            if getattr(member, attname) != state[attname]
+        }
+    member.save(update_fields=sorted(set(fields) | level_fields))
+    member.remember_level_state()
+
+
+def adjust_points(member, delta, required=None):
+    """
+    原子地调整积分: 一条 UPDATE，余额不足时不更新并抛出 WalletError。
+    required: 执行前至少要有多少积分 (默认 = 扣除的数量)
+    调整后把最新积分写回 member 对象。
+    """
+    if required is None:
+        required = max(-delta, 0)
+
+    updated = Member.objects.filter(pk=member.pk, loyaltyPoints__gte=required).update(
+        loyaltyPoints=F('loyaltyPoints') + delta,
+    )
+    if not updated:
+        raise WalletError(f'Insufficient points. Need {required}.')
+
+    member.loyaltyPoints = Member.objects.values_list('loyaltyPoints', flat=True).get(pk=member.pk)
+    return member.loyaltyPoints
+
+
+def claim_voucher(voucher):
+    """
+    原子地核销代金券: 一条 UPDATE ... WHERE status='unused'，
+    同一张券被两台收银机同时核销时只有一台会成功。
+    """
+    now = timezone.now()
+    claimed = Voucher.objects.filter(pk=voucher.pk, status='unused').update(status='used', usedDate=now)
+    if not claimed:
+        raise WalletError('Voucher already used.')
+    voucher.status = 'used'
+    voucher.usedDate = now
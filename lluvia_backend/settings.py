@@ -4,6 +4,8 @@ Generated by 'django-admin startproject' using Django 5.2.8.
 """
 import os
 from pathlib import Path
+from datetime import timedelta
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,6 +50,7 @@ INSTALLED_APPS = [
 # ----------------------------------------
 
 MIDDLEWARE = [
+    'api.metrics.MetricsMiddleware',  # 🚩 V251: 放在最前面，耗时包含所有中间件
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -156,12 +159,45 @@ REST_FRAMEWORK = {
     # 🚩 激活 Token 认证！
     # (现在，所有 API 默认都需要 Token 才能访问)
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # V242: 带缓存的 Token 认证 (api/authentication.py)，Token 会过期
+        'api.authentication.CachedTokenAuthentication',
     ],
 
     # 🚩 (但我们稍后会为 'login' 和 'register' 开放例外)
 }
 
+# 🚩 V242: Token 过期与认证缓存
+AUTH_TOKEN_TTL = timedelta(days=30)           # 30 天没用过的 Token 过期
+AUTH_TOKEN_REFRESH_AFTER = timedelta(days=1)  # 使用中的 Token 每天续期一次
+AUTH_CACHE_SIZE = 10000                       # 每个 worker 最多缓存多少个 Token
+AUTH_CACHE_TTL = 60                           # 缓存的会员数据最多用多少秒
+AUTH_STAMP_TTL = 5                            # 缓存命中后多久才核对一次认证版本号 (其他 worker 的退出登录最多晚这么多秒生效)
+
+# 🚩 V243: 限流 (api/throttling.py 令牌桶)
+# 'cache' = 共享 Django 缓存 (所有 worker 共用)；'local' = 进程内
+THROTTLE_BACKEND = 'cache'
+# '<throttle_scope>.<ip|account|endpoint>': '次数/时间'，没写的维度不限流
+THROTTLE_RATES = {
+    'login.ip': '20/min',
+    'login.account': '5/min',
+    'login.endpoint': '600/min',
+    'staff_login.ip': '20/min',
+    'staff_login.account': '5/min',
+    'password_reset.ip': '5/hour',
+    'password_reset.account': '3/hour',
+    'password_reset.endpoint': '100/hour',  # SMTP 每小时总量
+    'game.account': '30/min',
+    'game.ip': '120/min',
+}
+
+# 🚩 V251: 接口性能指标 (api/metrics.py)，GET /api/admin/metrics 输出 Prometheus 格式
+METRICS_ENABLED = True
+# 'cache' = 所有 worker 的数据通过共享缓存汇总；'local' = 只看处理这次请求的进程
+METRICS_BACKEND = 'cache'
+
+# 🚩 V255: Idempotency-Key (api/idempotency.py)，保存的响应多久之后可以删除
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
 # 告诉 "drf_spectacular" (文档工具) 关于我们的项目
 SPECTACULAR_SETTINGS = {
     'TITLE': 'LLUVIA Bar API',
@@ -178,6 +214,37 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:3001",     # 🚩 Member Portal (新)
     "http://127.0.0.1:3001",     
 ]
+# 🚩 V255: 浏览器可以发送 Idempotency-Key，并读取 Idempotent-Replayed
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['idempotent-replayed']
+
+
+# 🚩 V239: 缓存 (商城/公告等)
+# 这个缓存同时保存: 限流令牌桶 (每个 IP / 账号一个)、认证版本号 (每个会员一个)、指标快照和版本号。
+# - 设置了 REDIS_URL (推荐生产使用，需要 Redis 服务 + requirements.txt 里的 redis 包):
+#   所有 worker / 服务器共享，incr 是原子的，不会随机淘汰 key。
+# - 没设置 (默认): 文件缓存，只在同一台服务器的 worker 之间共享。
+#   ⚠️ 超过 MAX_ENTRIES 后每次 set 都会随机删掉 1/CULL_FREQUENCY 的文件，incr 也不是原子的，
+#   所以限流和版本号只是"尽力而为"。
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'TIMEOUT': 60 * 60 * 24,
+            'KEY_PREFIX': 'lluvia',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(BASE_DIR, 'django_cache'),
+            'TIMEOUT': 60 * 60 * 24,
+            'OPTIONS': {'MAX_ENTRIES': 100000, 'CULL_FREQUENCY': 10},
+        }
+    }
 
 
 # 🚩 V8 蓝图: 文件存储配置 (Media Settings) 必须在 CORS 列表的外面！
@@ -194,13 +261,20 @@ DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
 # 📧 邮件服务配置 (SendGrid - 生产环境版)
 # ==============================================
 
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
-EMAIL_HOST = 'smtp.sendgrid.net'  # SendGrid 的服务器地址
+# 🚩 V244: 邮件由发件箱 (OutboundEmail) + `manage.py send_outbox` 发送。
+# 本地调试可以用环境变量换成文件/控制台后端或本地 SMTP 测试服务器，例如:
+#   EMAIL_BACKEND=django.core.mail.backends.filebased.EmailBackend
+#   EMAIL_HOST=localhost EMAIL_PORT=1025 EMAIL_USE_TLS=0
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_FILE_PATH = BASE_DIR / 'sent_emails'  # 只有 filebased 后端使用
+EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.sendgrid.net')  # SendGrid 的服务器地址
 
 # 🚩 核心关键：DigitalOcean 封锁了 587，必须用 2525！
-EMAIL_PORT = 2525                 
+EMAIL_PORT = int(os.environ.get('EMAIL_PORT', 2525))
 
-EMAIL_USE_TLS = True
+EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', '1') == '1'
+EMAIL_TIMEOUT = 30  # SMTP 卡住时不要永远等下去
+OUTBOX_RETENTION = timedelta(days=30)  # SENT / DEAD 邮件保留多久 (nightly_settlement 删除)
 
 # 🚩 用户名固定填 'apikey' (这是 SendGrid 的规定，不要填你的邮箱！)
 EMAIL_HOST_USER = 'apikey'
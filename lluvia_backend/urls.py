@@ -1,12 +1,15 @@
 # 这是 lluvia_backend/urls.py 文件的内容 (V3 - 包含 Media 配置)
 
 from django.contrib import admin
-from django.urls import path, include
+import re
+
+from django.urls import path, include, re_path
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
 # 🚩 V8 修复: 导入 settings 和 static
 from django.conf import settings
 from django.conf.urls.static import static
+from api.storage import CAS_DIR, serve_immutable
 
 urlpatterns = [
     # 1. 我们的 V2 Admin 后台
@@ -22,4 +25,12 @@ urlpatterns = [
 
 # 🚩 V8 修复: 在开发环境中服务媒体文件 (如头像)
 if settings.DEBUG:
+    # 🚩 V246: 按内容寻址的文件 (media/cas/) 永远不变 -> Cache-Control: immutable
+    # (用 nginx 时: location /media/cas/ { add_header Cache-Control "public, max-age=31536000, immutable"; })
+    urlpatterns += [
+        re_path(
+            r'^%s(?P<path>%s/.*)$' % (re.escape(settings.MEDIA_URL.lstrip('/')), CAS_DIR),
+            serve_immutable, {'document_root': settings.MEDIA_ROOT},
+        ),
+    ]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
@@ -1,5 +1,5 @@
 // src/components/MemberLayout.js - V132 (汉堡菜单版)
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import { Outlet, Link, useNavigate, useLocation } from 'react-router-dom';
 import { useTranslation } from 'react-i18next';
 
@@ -9,8 +9,10 @@ import LanguageSwitcher from './LanguageSwitcher';
 const API_BASE_URL = 'https://lluvia.app'; // 确保这里是生产环境地址
 
 function MemberLayout() {
-  const [userLevelClass, setUserLevelClass] = useState('level-bronze');
-  const [isLoading, setIsLoading] = useState(true);
+  // 🚩 V234: 等级由首页 bootstrap 数据通过 Outlet context 传上来 (不再单独请求 /api/profile/)，
+  // 记在 localStorage 里，直接打开其他页面时也能显示上次的等级颜色
+  const [levelName, setLevelName] = useState(() => localStorage.getItem('memberLevel') || 'Bronze');
+  const hasToken = !!localStorage.getItem('authToken');
   // 🚩 新增: 控制手机菜单开关
   const [isMobileMenuOpen, setIsMobileMenuOpen] = useState(false);
   
@@ -18,28 +20,16 @@ function MemberLayout() {
   const location = useLocation(); // 用来监听路由变化
   const { t } = useTranslation();
 
-  // 1. 获取会员等级 (保持不变)
+  // 1. 没有 Token 直接去登录页 (Token 失效由各页面的请求发现)
   useEffect(() => {
-    const fetchProfileForLayout = async () => {
-      const token = localStorage.getItem('authToken');
-      if (!token) { navigate('/login'); return; }
-      try {
-        const response = await fetch(`${API_BASE_URL}/api/profile/`, {
-          headers: { 'Authorization': `Token ${token}` }
-        });
-        if (!response.ok) { throw new Error('Session invalid'); }
-        const data = await response.json(); 
-        if (data.level && data.level.levelName) {
-            setUserLevelClass(`level-${data.level.levelName.toLowerCase()}`);
-        }
-      } catch (error) {
-        localStorage.removeItem('authToken'); 
-        navigate('/login'); 
-      }
-      setIsLoading(false);
-    };
-    fetchProfileForLayout();
-  }, [navigate]);
+    if (!hasToken) navigate('/login');
+  }, [hasToken, navigate]);
+
+  const updateLevel = useCallback((name) => {
+    if (!name) return;
+    localStorage.setItem('memberLevel', name);
+    setLevelName(name);
+  }, []);
 
   // 2. 路由跳转时自动关闭菜单
   useEffect(() => {
@@ -47,7 +37,11 @@ function MemberLayout() {
   }, [location]);
 
   const handleLogout = () => {
+    // 🚩 V242: 通知后端作废 Token (失败也照样退出)
+    const token = localStorage.getItem('authToken');
+    fetch(`${API_BASE_URL}/api/logout/`, { method: 'POST', headers: { 'Authorization': `Token ${token}` } }).catch(() => {});
     localStorage.removeItem('authToken');
+    localStorage.removeItem('memberLevel');
     navigate('/login');
   };
 
@@ -56,10 +50,10 @@ function MemberLayout() {
     setIsMobileMenuOpen(!isMobileMenuOpen);
   };
 
-  if (isLoading) return null;
+  if (!hasToken) return null;
 
   return (
-    <div className={`v11-layout ${userLevelClass}`}> 
+    <div className={`v11-layout level-${levelName.toLowerCase()}`}> 
       
       <nav className="v11-navbar">
         
@@ -107,7 +101,7 @@ function MemberLayout() {
       </div>
 
       <main className="v11-content">
-        <Outlet />
+        <Outlet context={{ setLevelName: updateLevel }} />
       </main>
     </div>
   );
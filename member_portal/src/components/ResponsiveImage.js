@@ -0,0 +1,23 @@
+// src/components/ResponsiveImage.js - V245 (按屏幕大小下载缩略图)
+import React from 'react';
+
+// images = 后端返回的 { thumb: {webp, jpeg, width}, card: {...}, full: {...} }
+// 还没生成缩略图时 images 为 null，直接显示原图 src
+const buildSrcSet = (images, format) =>
+  Object.values(images).map((v) => `${v[format]} ${v.width}w`).join(', ');
+
+const ResponsiveImage = ({ images, src, sizes = '100vw', ...imgProps }) => {
+  if (!images) {
+    return <img src={src} {...imgProps} />;
+  }
+
+  return (
+    // display: contents -> <picture> 不影响原来 <img> 的布局和样式
+    <picture style={{ display: 'contents' }}>
+      <source type="image/webp" srcSet={buildSrcSet(images, 'webp')} sizes={sizes} />
+      <img src={src} srcSet={buildSrcSet(images, 'jpeg')} sizes={sizes} {...imgProps} />
+    </picture>
+  );
+};
+
+export default ResponsiveImage;
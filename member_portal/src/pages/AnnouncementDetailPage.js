@@ -4,6 +4,7 @@ import { useParams, useNavigate } from 'react-router-dom';
 import { useTranslation } from 'react-i18next';
 import './AnnouncementDetailPage.css'; 
 import { API_BASE_URL as API_ROOT } from '../config';
+import ResponsiveImage from '../components/ResponsiveImage'; // 🚩 V245
 
 const API_BASE_URL = API_ROOT; 
 
@@ -54,7 +55,8 @@ function AnnouncementDetailPage() {
         {/* 图片区域 */}
         {imagePath && (
           <div className="detail-image-wrapper">
-             <img 
+             <ResponsiveImage 
+               images={announcement.images}
                src={getImageUrl(imagePath)} 
                alt={announcement.title} 
                className="detail-image"
@@ -1,12 +1,13 @@
 // src/pages/DashboardPage.js - V185 (最终完整版：含权益按钮)
 import React, { useState, useEffect, useCallback } from 'react';
-import { Link, useNavigate } from 'react-router-dom';
+import { Link, useNavigate, useOutletContext } from 'react-router-dom';
 import { useTranslation } from 'react-i18next'; 
 import './DashboardPage.css'; 
 
 import defaultAvatar from '../assets/default_avatar.png'; 
 import defaultBanner from '../assets/default_avatar.png'; 
 import { API_BASE_URL as API_ROOT } from '../config';
+import ResponsiveImage from '../components/ResponsiveImage'; // 🚩 V245
 
 const API_BASE_URL = API_ROOT;
 
@@ -20,12 +21,13 @@ function DashboardPage() {
   const [isLoading, setIsLoading] = useState(true);
   const navigate = useNavigate();
   const { t } = useTranslation(); 
+  const { setLevelName } = useOutletContext() || {}; // 🚩 V234: 把等级告诉 MemberLayout (导航栏颜色)
 
   // 弹窗状态
   const [showModal, setShowModal] = useState(false); // 编辑资料
   const [showBenefits, setShowBenefits] = useState(false); // 🚩 权益说明
 
-  const [editForm, setEditForm] = useState({ nickname: '', phone: '', dob: '', email: '', password: '' });
+  const [editForm, setEditForm] = useState({ nickname: '', phone: '', dob: '', email: '', password: '', socialOptIn: false });
   const [avatarFile, setAvatarFile] = useState(null);
   const [previewUrl, setPreviewUrl] = useState(null); 
   const [isSaving, setIsSaving] = useState(false);
@@ -41,24 +43,22 @@ function DashboardPage() {
       if (!token) { navigate('/login'); return; }
       try {
         const headers = { 'Authorization': `Token ${token}` };
-        const profileRes = await fetch(`${API_BASE_URL}/api/profile/`, { headers });
-        if (!profileRes.ok) throw new Error('Session invalid');
-        setUserData(await profileRes.json());
-
-        const vouchersRes = await fetch(`${API_BASE_URL}/api/profile/vouchers/`, { headers });
-        if (vouchersRes.ok) setVouchers(await vouchersRes.json());
-
-        const txnRes = await fetch(`${API_BASE_URL}/api/profile/transactions/`, { headers });
-        if (txnRes.ok) setTransactions(await txnRes.json());
-
-        const annRes = await fetch(`${API_BASE_URL}/api/announcements/`, { headers });
-        if (annRes.ok) setAnnouncements(await annRes.json());
+        // 🚩 V234: 一个请求拿到首页所有数据 (资料、代金券、交易、公告)
+        const res = await fetch(`${API_BASE_URL}/api/me/bootstrap/?transactions=20&vouchers=grouped`, { headers });
+        if (res.status === 401) localStorage.removeItem('authToken'); // Token 已失效
+        if (!res.ok) throw new Error('Session invalid');
+        const data = await res.json();
+        setUserData(data.profile);
+        if (setLevelName && data.profile.level) setLevelName(data.profile.level.levelName);
+        setVouchers(data.voucher_groups || []); // 🚩 V248: 按模板分组
+        setTransactions(data.transactions || []);
+        setAnnouncements(data.announcements || []);
 
         setIsLoading(false);
       } catch (error) {
         navigate('/login');
       }
-  }, [navigate]);
+  }, [navigate, setLevelName]);
 
   useEffect(() => { fetchAllData(); }, [fetchAllData]);
 
@@ -67,7 +67,7 @@ function DashboardPage() {
   const handleSaveProfile = async (e) => { e.preventDefault(); setIsSaving(true); const token = localStorage.getItem('authToken'); const headers = { 'Authorization': `Token ${token}` }; try { if (avatarFile) { const formData = new FormData(); formData.append('avatar', avatarFile); await fetch(`${API_BASE_URL}/api/profile/avatar/`, { method: 'POST', headers: headers, body: formData }); } const textBody = { ...editForm }; if (!textBody.password) delete textBody.password; await fetch(`${API_BASE_URL}/api/profile/`, { method: 'PUT', headers: { 'Content-Type': 'application/json', ...headers }, body: JSON.stringify(textBody) }); setShowModal(false); fetchAllData(); alert("Success"); } catch (error) { alert("Failed"); } setIsSaving(false); };
 
   const openEditModal = () => {
-    setEditForm({ nickname: userData.nickname || '', phone: userData.phone || '', dob: userData.dob || '', email: userData.email || '', password: '' });
+    setEditForm({ nickname: userData.nickname || '', phone: userData.phone || '', dob: userData.dob || '', email: userData.email || '', password: '', socialOptIn: !!userData.socialOptIn });
     setAvatarFile(null);
     setPreviewUrl(userData.avatarUrl || defaultAvatar); 
     setShowModal(true);
@@ -117,12 +117,12 @@ function DashboardPage() {
                <div key={ann.id} className="v11-banner-item">
                  {ann.actionUrl ? (
                    <a href={ann.actionUrl} target="_blank" rel="noopener noreferrer" style={{display: 'block', width: '100%', height: '100%', textDecoration: 'none', position: 'relative'}}>
-                      <img src={getBannerUrl(ann.imageUrl || ann.image)} alt={ann.title} className="v11-banner-img" style={{ width: '100%', height: '100%', objectFit: 'cover' }} />
+                      <ResponsiveImage images={ann.images} sizes="(max-width: 800px) 100vw, 800px" src={getBannerUrl(ann.imageUrl || ann.image)} alt={ann.title} className="v11-banner-img" style={{ width: '100%', height: '100%', objectFit: 'cover' }} />
                       <div className="v11-banner-caption">{ann.title}</div>
                    </a>
                  ) : (
                    <Link to={`/member/announcement/${ann.id}`} style={{display: 'block', width: '100%', height: '100%', textDecoration: 'none', position: 'relative'}}>
-                      <img src={getBannerUrl(ann.imageUrl || ann.image)} alt={ann.title} className="v11-banner-img" style={{ width: '100%', height: '100%', objectFit: 'cover' }} />
+                      <ResponsiveImage images={ann.images} sizes="(max-width: 800px) 100vw, 800px" src={getBannerUrl(ann.imageUrl || ann.image)} alt={ann.title} className="v11-banner-img" style={{ width: '100%', height: '100%', objectFit: 'cover' }} />
                       <div className="v11-banner-caption">{ann.title}</div>
                    </Link>
                  )}
@@ -147,6 +147,7 @@ function DashboardPage() {
               <div className="v11-input-group"><label>{t('Email')}</label><input type="email" value={editForm.email} onChange={(e) => setEditForm({...editForm, email: e.target.value})} /></div>
               <div className="v11-input-group"><label>{t('Phone')}</label><input type="tel" value={editForm.phone} onChange={(e) => setEditForm({...editForm, phone: e.target.value})} /></div>
               <div className="v11-input-group"><label>{t('Birthday')}</label><input type="date" value={editForm.dob} onChange={(e) => setEditForm({...editForm, dob: e.target.value})} /></div>
+              <div className="v11-input-group"><label><input type="checkbox" checked={editForm.socialOptIn} onChange={(e) => setEditForm({...editForm, socialOptIn: e.target.checked})} /> {t('Show me in the Social Gallery')}</label></div>
               <div className="v11-input-group"><label style={{color: '#D4AF37'}}>{t('New Password (optional)')}</label><input type="password" placeholder="******" value={editForm.password} onChange={(e) => setEditForm({...editForm, password: e.target.value})} /></div>
               <div className="v11-modal-actions"><button type="button" className="btn-cancel" onClick={() => setShowModal(false)}>{t('Cancel')}</button><button type="submit" className="btn-pill" disabled={isSaving}>{isSaving ? t('Updating...') : t('Save')}</button></div>
             </form>
@@ -293,22 +294,45 @@ const ProfileTab = ({ userData, t, onEditClick, levelClass, onShowBenefits }) =>
   );
 };
 
+// 🚩 V248: 每种券一张卡片 (×数量)，点开再加载这一组的每张券
 const VouchersTab = ({ vouchers, t, levelClass }) => { 
+  const [expanded, setExpanded] = useState({}); // { voucherTypeId: [vouchers] }
+
+  const toggleGroup = async (typeId) => {
+    if (expanded[typeId]) {
+      setExpanded((prev) => { const next = { ...prev }; delete next[typeId]; return next; });
+      return;
+    }
+    const token = localStorage.getItem('authToken');
+    const res = await fetch(`${API_BASE_URL}/api/profile/vouchers/?voucherType=${typeId}`, {
+      headers: { 'Authorization': `Token ${token}` },
+    });
+    if (res.ok) {
+      const items = await res.json();
+      setExpanded((prev) => ({ ...prev, [typeId]: items }));
+    }
+  };
+
   return (
     <div className={`v11-card level-${levelClass}-frame`}>
       <h4 style={{marginTop:0, marginBottom:'20px', color:'#D4AF37'}}>{t('My Vouchers')}</h4>
       {vouchers && vouchers.length > 0 ? (
         <div className="v11-store-grid v11-scroll-box"> 
-          {vouchers.map((v) => (
-             <div className="v11-voucher-ticket" key={v.voucherId}>
+          {vouchers.map((g) => (
+             <div className="v11-voucher-ticket" key={g.voucherTypeId} onClick={() => toggleGroup(g.voucherTypeId)} style={{cursor:'pointer'}}>
                 <div className="ticket-header">
-                    <h3 className="ticket-title">{v.voucherType.name}</h3>
-                    <div className="ticket-value">{parseFloat(v.voucherType.value) > 0 ? `$${v.voucherType.value}` : 'GIFT'}</div>
+                    <h3 className="ticket-title">{g.voucherType.name} {g.count > 1 && <span>×{g.count}</span>}</h3>
+                    <div className="ticket-value">{parseFloat(g.voucherType.value) > 0 ? `$${g.voucherType.value}` : 'GIFT'}</div>
                 </div>
                 <div className="ticket-divider"></div>
                 <div className="ticket-body">
-                    <p><strong>{t('Expires')}:</strong> {new Date(v.expiryDate).toLocaleDateString()}</p>
-                    <div className={`ticket-status status-${v.status}`}>{v.status === 'unused' ? t('Unused') : v.status}</div>
+                    <p><strong>{t('Expires')}:</strong> {new Date(g.earliestExpiry).toLocaleDateString()}</p>
+                    <div className="ticket-status status-unused">{t('Unused')}</div>
+                    {expanded[g.voucherTypeId] && expanded[g.voucherTypeId].map((v) => (
+                      <p key={v.voucherId} style={{fontSize:'12px', margin:'4px 0'}}>
+                        {t('Expires')}: {new Date(v.expiryDate).toLocaleDateString()}
+                      </p>
+                    ))}
                 </div>
              </div>
           ))}
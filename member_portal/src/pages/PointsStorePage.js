@@ -10,6 +10,7 @@ import ConfirmModal from '../components/ConfirmModal';
 import AlertModal from '../components/AlertModal';
 
 import { API_BASE_URL as API_ROOT } from '../config'; // 🚩 导入根地址
+import ResponsiveImage from '../components/ResponsiveImage'; // 🚩 V245
 
 const API_BASE_URL = API_ROOT; // 🚩 加上 /api/ 变成最终 API 地址
 
@@ -114,7 +115,9 @@ function PointsStorePage() {
           items.map(item => (
             <div className="v11-card v11-store-item" key={item.id}>
               <div className="v11-item-image-wrapper">
-                 <img 
+                 <ResponsiveImage 
+                    images={item.images}
+                    sizes="(max-width: 600px) 50vw, 320px"
                     src={item.imageUrl ? item.imageUrl : defaultProduct} 
                     onError={(e) => { e.target.onerror = null; e.target.src = defaultProduct; }}
                     alt={item.name} 
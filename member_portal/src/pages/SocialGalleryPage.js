@@ -7,30 +7,35 @@ import './SocialGalleryPage.css';
 import defaultAvatar from '../assets/default_avatar.png';
 
 import { API_BASE_URL as API_ROOT } from '../config'; // 🚩 导入根地址
+import ResponsiveImage from '../components/ResponsiveImage'; // 🚩 V245
 
 const API_BASE_URL = API_ROOT; // 🚩 加上 /api/ 变成最终 API 地址
+const firstPageUrl = `${API_BASE_URL}/api/social/gallery/?page=1`;
 
 function SocialGalleryPage() {
   const [members, setMembers] = useState([]);
+  const [nextUrl, setNextUrl] = useState(null); // 🚩 V241: 分页
   const [isLoading, setIsLoading] = useState(true);
   const { t } = useTranslation();
 
-  useEffect(() => {
-    const fetchGallery = async () => {
-      try {
-        // 后端默认已经按积分(loyaltyPoints)从高到低排序了
-        const response = await fetch(`${API_BASE_URL}/api/social/gallery/`);
-        if (response.ok) {
-          const data = await response.json();
-          setMembers(data);
-        }
-      } catch (error) {
-        console.error("Failed to load gallery:", error);
+  // 后端按积分(loyaltyPoints)从高到低排好名次 (rank)，每页 24 个
+  const fetchGallery = async (url) => {
+    try {
+      const response = await fetch(url);
+      if (response.ok) {
+        const data = await response.json();
+        setMembers(prev => (url === firstPageUrl ? data.results : [...prev, ...data.results]));
+        setNextUrl(data.next);
       }
-      setIsLoading(false);
-    };
+    } catch (error) {
+      console.error("Failed to load gallery:", error);
+    }
+    setIsLoading(false);
+  };
 
-    fetchGallery();
+  useEffect(() => {
+    fetchGallery(firstPageUrl);
+    // eslint-disable-next-line react-hooks/exhaustive-deps
   }, []);
 
   if (isLoading) {
@@ -46,17 +51,19 @@ function SocialGalleryPage() {
 
       <div className="v11-gallery-grid">
         {members.length > 0 ? (
-          members.map((member, index) => (
-            <div key={index} className="v11-card v11-member-card">
+          members.map((member) => (
+            <div key={member.rank} className="v11-card v11-member-card">
               <div className="v11-member-avatar-wrapper">
-                <img 
+                <ResponsiveImage 
+                  images={member.avatarImages}
+                  sizes="128px"
                   src={member.avatarUrl ? member.avatarUrl : defaultAvatar} 
                   onError={(e) => { e.target.onerror = null; e.target.src = defaultAvatar; }}
                   alt={member.nickname} 
                   className="v11-member-avatar"
                 />
                 {/* 🏆 排名徽章: #1, #2, #3... */}
-                <div className="v11-rank-badge">#{index + 1}</div>
+                <div className="v11-rank-badge">#{member.rank}</div>
               </div>
               
               <h3 className="v11-member-name">{member.nickname || 'Member'}</h3>
@@ -72,6 +79,12 @@ function SocialGalleryPage() {
           <p className="v11-no-data">{t('No members found.')}</p>
         )}
       </div>
+
+      {nextUrl && (
+        <div style={{textAlign: 'center', marginTop: '20px'}}>
+          <button className="btn-pill" onClick={() => fetchGallery(nextUrl)}>{t('Load more')}</button>
+        </div>
+      )}
     </div>
   );
 }